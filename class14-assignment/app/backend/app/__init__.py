@@ -2,9 +2,10 @@ from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
 from .config import Config
+from .cache import cache
 from .models import db
 from .models.models import Topic, Question, WikiPage
-from .routes import topic_bp, quiz_bp, api_bp, wiki_bp
+from .routes import topic_bp, quiz_bp, api_bp, wiki_bp, search_bp
 import os
 
 migrate = Migrate()
@@ -29,11 +30,13 @@ def create_app(config_class=Config):
     
     db.init_app(app)
     migrate.init_app(app, db)
+    cache.init_app(app)
     
     # Register blueprints
     app.register_blueprint(topic_bp)
     app.register_blueprint(quiz_bp)
     app.register_blueprint(wiki_bp)
+    app.register_blueprint(search_bp)
     app.register_blueprint(api_bp)
     
     # Health check route
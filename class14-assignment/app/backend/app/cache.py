@@ -0,0 +1,160 @@
+"""Read-through response cache for the read-mostly GET endpoints.
+
+Cached entries are the already serialized JSON body plus its ETag, so a hit
+skips both the database and to_dict()/jsonify, and a conditional GET with a
+matching If-None-Match gets a 304 straight from the cache. Entries are
+grouped in namespaces ('topics', 'wiki'); write handlers call
+cache.invalidate(namespace) after they commit.
+
+Backends:
+- memory (default): TTL + LRU dict inside each worker process. Other
+  gunicorn workers only see an invalidation once their entry expires, so
+  keep CACHE_TTL short or use redis when running several workers.
+- redis: any Redis-compatible server at CACHE_REDIS_URL (needs the `redis`
+  package); invalidation is shared by all workers.
+- none: caching disabled.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+
+
+class MemoryBackend:
+    """Thread-safe TTL + LRU store"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generation(self, namespace):
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def bump(self, namespace):
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+
+class RedisBackend:
+    """Redis-compatible store shared by all workers"""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self.client.hmget(key, 'etag', 'body')
+        if value[0] is None:
+            return None
+        return value[0].decode(), value[1]
+
+    def set(self, key, value, ttl):
+        pipe = self.client.pipeline()
+        pipe.hset(key, mapping={'etag': value[0], 'body': value[1]})
+        pipe.expire(key, ttl)
+        pipe.execute()
+
+    def generation(self, namespace):
+        return int(self.client.get(f'cache-generation:{namespace}') or 0)
+
+    def bump(self, namespace):
+        # Old keys are never read again and expire on their own
+        self.client.incr(f'cache-generation:{namespace}')
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+        self.ttl = 60
+
+    def init_app(self, app):
+        cache_type = app.config.get('CACHE_TYPE', 'memory')
+        self.ttl = app.config.get('CACHE_TTL', 60)
+        self.backend = None
+        if cache_type == 'redis':
+            try:
+                self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+                print(f"Response cache: redis at {app.config['CACHE_REDIS_URL']}")
+            except Exception as e:
+                print(f"Redis cache unavailable, using in-process cache: {e}")
+                cache_type = 'memory'
+        if cache_type == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+
+    def invalidate(self, *namespaces):
+        """Drop every cached response in `namespaces`"""
+        if self.backend is None:
+            return
+        for namespace in namespaces:
+            try:
+                self.backend.bump(namespace)
+            except Exception as e:
+                print(f"Error invalidating cache namespace {namespace}: {e}")
+
+    def cached(self, namespace):
+        """Decorator: cache a view's 200 JSON responses, keyed by URL"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return view(*args, **kwargs)
+
+                try:
+                    generation = self.backend.generation(namespace)
+                    key = f'response:{namespace}:{generation}:{request.full_path}'
+                    entry = self.backend.get(key)
+                except Exception as e:
+                    # A broken cache must not take the API down
+                    print(f"Cache read error: {e}")
+                    return view(*args, **kwargs)
+
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    # Streamed (long) lists are not buffered into the cache
+                    if (response.status_code != 200 or response.is_streamed or
+                            response.mimetype != 'application/json'):
+                        return response
+                    body = response.get_data()
+                    entry = (hashlib.sha1(body).hexdigest(), body)
+                    try:
+                        self.backend.set(key, entry, self.ttl)
+                    except Exception as e:
+                        print(f"Cache write error: {e}")
+
+                etag, body = entry
+                if request.if_none_match.contains(etag):
+                    response = make_response('', 304)
+                else:
+                    response = make_response(body)
+                    response.mimetype = 'application/json'
+                response.set_etag(etag)
+                return response
+            return wrapper
+        return decorator
+
+
+cache = ResponseCache()
@@ -8,3 +8,8 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'postgresql://postgres:postgres@db:5432/devops_learning')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     DEBUG = bool(int(os.getenv('FLASK_DEBUG', '0')))
+    # Response cache for topics and wiki pages: memory, redis or none
+    CACHE_TYPE = os.getenv('CACHE_TYPE', 'redis' if os.getenv('CACHE_REDIS_URL') else 'memory')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_TTL = int(os.getenv('CACHE_TTL', '60'))  # seconds
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
@@ -1,7 +1,13 @@
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from . import db
 import random
 
+# Full-text search documents, computed by PostgreSQL on every insert/update
+WIKI_SEARCH_VECTOR = ("setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                      "setweight(to_tsvector('english', coalesce(content, '')), 'B')")
+QUESTION_SEARCH_VECTOR = "to_tsvector('english', coalesce(question_text, ''))"
+
 class Topic(db.Model):
     __tablename__ = 'topics'
 
@@ -10,6 +16,8 @@ class Topic(db.Model):
     description = db.Column(db.Text, nullable=False)
     slug = db.Column(db.String(100), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Kept up to date by triggers on the questions table
+    question_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     questions = db.relationship('Question', backref='topic', lazy=True, cascade='all, delete-orphan')
 
     def to_dict(self):
@@ -21,6 +29,11 @@ class Topic(db.Model):
 
 class Question(db.Model):
     __tablename__ = 'questions'
+    __table_args__ = (
+        # Lets a quiz pick random questions with a few index lookups
+        db.Index('ix_questions_topic_id_random_key', 'topic_id', 'random_key'),
+        db.Index('ix_questions_search_vector', 'search_vector', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     topic_id = db.Column(db.Integer, db.ForeignKey('topics.id'), nullable=False)
@@ -28,6 +41,10 @@ class Question(db.Model):
     options = db.Column(db.JSON, nullable=False)
     correct_answer = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    random_key = db.Column(db.Float, nullable=False, default=random.random,
+                           server_default=db.text('random()'))
+    # Deferred: only the search query needs it
+    search_vector = db.deferred(db.Column(TSVECTOR, db.Computed(QUESTION_SEARCH_VECTOR, persisted=True)))
 
     def shuffle_options(self):
         """Shuffle options and adjust correct answer index accordingly"""
@@ -67,6 +84,9 @@ class Question(db.Model):
 
 class WikiPage(db.Model):
     __tablename__ = 'wiki_pages'
+    __table_args__ = (
+        db.Index('ix_wiki_pages_search_vector', 'search_vector', postgresql_using='gin'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     slug = db.Column(db.String(100), unique=True, nullable=False)
@@ -77,6 +97,8 @@ class WikiPage(db.Model):
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     author = db.Column(db.String(100), nullable=True)
     is_published = db.Column(db.Boolean, default=True)
+    # Deferred: only the search query needs it
+    search_vector = db.deferred(db.Column(TSVECTOR, db.Computed(WIKI_SEARCH_VECTOR, persisted=True)))
     
     def to_dict(self):
         return {
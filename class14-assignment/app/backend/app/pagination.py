@@ -0,0 +1,132 @@
+"""Keyset pagination, field projection and streamed JSON for list endpoints.
+
+A list endpoint answers three kinds of requests:
+- ?fields=a,b      only those columns are read from the database
+- ?limit=&cursor=  one page ordered by id, {"items": [...], "next_cursor": ...};
+                   the cursor is the last id seen, so every page is an index
+                   range scan whatever its position
+- neither          the whole list as before; past STREAM_THRESHOLD rows it is
+                   streamed from a server-side cursor instead of being built
+                   in memory
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from flask import Response, jsonify, request, stream_with_context
+from app.models import db
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+# Full lists longer than this are streamed (and not cached)
+STREAM_THRESHOLD = 500
+
+
+class ListParamError(ValueError):
+    pass
+
+
+def parse_fields(available):
+    """Requested field names (all of `available` by default)"""
+    requested = request.args.get('fields')
+    if not requested:
+        return list(available)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ListParamError(f"Unknown fields: {', '.join(unknown)}. "
+                             f"Available: {', '.join(available)}")
+    return fields
+
+
+def encode_cursor(last_id):
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode()
+
+
+def parse_page():
+    """(limit, after_id) when a page was asked for, otherwise None"""
+    if 'limit' not in request.args and 'cursor' not in request.args:
+        return None
+    try:
+        limit = min(MAX_LIMIT, max(1, int(request.args.get('limit', DEFAULT_LIMIT))))
+    except ValueError:
+        raise ListParamError('limit must be an integer')
+
+    after_id = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_id = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+        except (ValueError, binascii.Error, UnicodeDecodeError):
+            raise ListParamError('Invalid cursor')
+    return limit, after_id
+
+
+def select_fields(id_column, field_columns, fields):
+    """SELECT of the key column plus only the requested fields"""
+    return db.select(id_column.label('_key'),
+                     *[field_columns[name].label(name) for name in fields])
+
+
+def json_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def row_to_dict(row, fields):
+    mapping = row._mapping
+    return {name: json_value(mapping[name]) for name in fields}
+
+
+def page_response(query, id_column, fields, limit, after_id):
+    """One keyset page of `query`"""
+    rows = db.session.execute(
+        query.where(id_column > after_id).order_by(id_column).limit(limit + 1)).all()
+    next_cursor = encode_cursor(rows[limit - 1]._key) if len(rows) > limit else None
+    return jsonify({
+        'items': [row_to_dict(row, fields) for row in rows[:limit]],
+        'next_cursor': next_cursor
+    })
+
+
+def list_response(query, id_column, fields, empty=None):
+    """The whole list of `query`, streamed when it is long
+
+    `empty` is returned (as JSON) instead of [] when there are no rows.
+    """
+    # Its own connection: Flask tears the session down when the view returns,
+    # before a streamed body has been read
+    connection = db.engine.connect()
+    try:
+        result = connection.execution_options(
+            stream_results=True, max_row_buffer=STREAM_THRESHOLD
+        ).execute(query.order_by(id_column))
+        first = result.fetchmany(STREAM_THRESHOLD)
+    except Exception:
+        connection.close()
+        raise
+    if len(first) < STREAM_THRESHOLD:
+        connection.close()
+        if not first and empty is not None:
+            return jsonify(empty)
+        return jsonify([row_to_dict(row, fields) for row in first])
+
+    def encode(rows):
+        return ','.join(json.dumps(row_to_dict(row, fields)) for row in rows).encode('utf-8')
+
+    def generate():
+        yield b'[' + encode(first)
+        while True:
+            rows = result.fetchmany(STREAM_THRESHOLD)
+            if not rows:
+                break
+            yield b',' + encode(rows)
+        yield b']'
+
+    response = Response(stream_with_context(generate()), mimetype='application/json')
+    # The WSGI server closes the response even when the body is never read
+    # (client gone, error before the first chunk), a finally in generate()
+    # would only run once it had started
+    response.call_on_close(connection.close)
+    return response
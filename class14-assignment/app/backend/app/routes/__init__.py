@@ -4,6 +4,7 @@ from flask import Blueprint, jsonify
 topic_bp = Blueprint('topics', __name__, url_prefix='/api/topics')
 quiz_bp = Blueprint('quizzes', __name__, url_prefix='/api/quiz')
 wiki_bp = Blueprint('wiki', __name__, url_prefix='/api/wiki')
+search_bp = Blueprint('search', __name__, url_prefix='/api/search')
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
@@ -13,4 +14,4 @@ def api_health_check():
     return jsonify({"status": "healthy", "message": "API is operational"}), 200
 
 # Import routes after creating blueprints
-from . import topic_routes, quiz_routes, wiki_routes
\ No newline at end of file
+from . import topic_routes, quiz_routes, wiki_routes, search_routes
\ No newline at end of file
@@ -1,20 +1,87 @@
 from flask import jsonify, request
+from sqlalchemy.dialects.postgresql import insert
 from app.models.models import Topic, Question
 from app.models import db
+from app.cache import cache
+from app.pagination import (ListParamError, list_response, page_response,
+                            parse_fields, parse_page, select_fields)
 from . import quiz_bp
+import codecs
+import csv
+import json
 import random
 import string
 
 MAX_QUIZ_QUESTIONS = 15
 
+# Questions are inserted in multi-row INSERTs of this many rows
+BULK_CHUNK_SIZE = 1000
+BULK_FIELDS = ('topic_slug', 'question_text', 'options', 'correct_answer')
+
+# Fields a list request can pick with ?fields=, as in Question.to_dict()
+QUESTION_FIELDS = {
+    'id': Question.id,
+    'question': Question.question_text,
+    'options': Question.options,
+    'correct_answer': Question.correct_answer
+}
+
+# Topics up to this size are sampled with ORDER BY random(); bigger ones
+# with index probes on random_key
+SMALL_TOPIC_SIZE = 1000
+
+# One index lookup per probe: the first question at or after a random point
+SAMPLE_PROBES_SQL = db.text('''
+    SELECT picked.id
+    FROM unnest(CAST(:probes AS double precision[])) AS probe(value)
+    CROSS JOIN LATERAL (
+        SELECT id FROM questions
+        WHERE topic_id = :topic_id AND random_key >= probe.value
+        ORDER BY random_key
+        LIMIT 1
+    ) AS picked
+''')
+
+
+def question_total(topic):
+    """Questions in a topic, from the counter the triggers keep up to date
+
+    Databases made with create_all() (or migrated without the counter
+    migration) have no triggers and the counter stays 0, count for real then.
+    """
+    if topic.question_count:
+        return topic.question_count
+    return Question.query.filter_by(topic_id=topic.id).count()
+
+
+def sample_questions(topic, count, total):
+    """Pick up to `count` random questions of a topic, reading O(count) rows"""
+    if total <= SMALL_TOPIC_SIZE:
+        return (Question.query.filter_by(topic_id=topic.id)
+                .order_by(db.func.random()).limit(count).all())
+
+    # Probe twice as many random points as needed: two probes can land on
+    # the same question, and probes past the largest key find nothing.
+    # A dict keeps the questions in the order they were picked
+    picked = {}
+    for attempt in range(3):
+        probes = [random.random() for _ in range(2 * count)]
+        for question_id in db.session.execute(
+                SAMPLE_PROBES_SQL, {'probes': probes, 'topic_id': topic.id}).scalars():
+            picked[question_id] = None
+        if len(picked) >= count:
+            break
+
+    questions = Question.query.filter(Question.id.in_(list(picked)[:count])).all()
+    random.shuffle(questions)
+    return questions
+
 @quiz_bp.route('/<topic_slug>', methods=['GET'])
 def get_quiz(topic_slug):
     topic = Topic.query.filter_by(slug=topic_slug).first_or_404()
     
-    # Get all questions for the topic
-    all_questions = Question.query.filter_by(topic_id=topic.id).all()
-    
-    if not all_questions:
+    total = question_total(topic)
+    if not total:
         return jsonify({
             'title': topic.name,
             'questions': [],
@@ -22,16 +89,13 @@ def get_quiz(topic_slug):
             'selected_questions': 0
         })
     
-    # Shuffle and limit questions
-    selected_questions = random.sample(
-        all_questions, 
-        min(MAX_QUIZ_QUESTIONS, len(all_questions))
-    )
+    # Random questions, without loading the whole topic
+    selected_questions = sample_questions(topic, MAX_QUIZ_QUESTIONS, total)
     
     return jsonify({
         'title': topic.name,
         'questions': [q.to_dict(shuffle=False) for q in selected_questions],
-        'total_questions': len(all_questions),
+        'total_questions': total,
         'selected_questions': len(selected_questions)
     })
 
@@ -89,6 +153,7 @@ def manage_questions():
             )
             db.session.add(topic)
             db.session.commit()
+            cache.invalidate('topics')
             
         try:
             question = Question(
@@ -107,144 +172,246 @@ def manage_questions():
             print(f"Error adding question: {str(e)}")
             return jsonify({'error': str(e)}), 400
             
-    questions = Question.query.all()
-    return jsonify([q.to_dict(shuffle=False) for q in questions])
+    # ?fields= projection and ?limit= / ?cursor= pagination; the full
+    # list is streamed when it is long
+    try:
+        fields = parse_fields(QUESTION_FIELDS)
+        page = parse_page()
+    except ListParamError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    query = select_fields(Question.id, QUESTION_FIELDS, fields)
+    if page:
+        return page_response(query, Question.id, fields, *page)
+    return list_response(query, Question.id, fields)
+
+def iter_stream_lines(stream, block_size=65536):
+    """Lines (with their newline) from a byte stream, read in large blocks"""
+    pending = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        lines = (pending + block).split(b'\n')
+        pending = lines.pop()
+        for line in lines:
+            yield line + b'\n'
+    if pending:
+        yield pending
+
+
+def iter_bulk_rows():
+    """Yield (row_number, question_data) from the request body
+
+    JSON lists are parsed in one go (as sent by the frontend); NDJSON (one
+    question object per line) and CSV (the bulk_upload_questions.py format)
+    are read from the request stream line by line, so large uploads are
+    never held in memory.
+    """
+    content_type = request.mimetype
+    if content_type in ('application/x-ndjson', 'application/jsonl'):
+        for line_number, line in enumerate(iter_stream_lines(request.stream), 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, json.loads(line)
+            except ValueError:
+                yield line_number, ValueError("Invalid JSON")
+    elif content_type == 'text/csv':
+        lines = codecs.iterdecode(iter_stream_lines(request.stream), 'utf-8-sig')
+        for index, row in enumerate(csv.DictReader(lines)):
+            options = [row[f'option{i}'] for i in range(1, 5) if f'option{i}' in row]
+            if not options and row.get('options'):
+                try:
+                    options = json.loads(row['options'])
+                except ValueError:
+                    options = [opt.strip() for opt in row['options'].split(',')]
+            yield index + 1, {
+                'topic_slug': row.get('topic_slug'),
+                'question_text': row.get('question_text'),
+                'options': options,
+                'correct_answer': row.get('correct_answer')
+            }
+    else:
+        for index, question_data in enumerate(request.get_json()):
+            yield index + 1, question_data
+
+
+def validate_question(question_data):
+    """Return a cleaned question dict, or raise ValueError with the row error"""
+    if isinstance(question_data, Exception):
+        raise question_data
+    if not isinstance(question_data, dict):
+        raise ValueError("Expected a question object")
+
+    # Validate required fields
+    if not all(question_data.get(k) is not None for k in BULK_FIELDS):
+        raise ValueError("Missing required fields")
+
+    # Validate content
+    if not str(question_data['question_text']).strip():
+        raise ValueError("Empty question text")
+
+    # Validate options
+    if not isinstance(question_data['options'], list) or len(question_data['options']) != 4:
+        raise ValueError("Invalid options format")
+
+    if any(opt is None or str(opt).strip() == '' for opt in question_data['options']):
+        raise ValueError("Empty options not allowed")
+
+    # Validate correct_answer
+    try:
+        correct_answer = int(question_data['correct_answer'])
+        if not 0 <= correct_answer <= 3:
+            raise ValueError("Correct answer must be between 0 and 3")
+    except (ValueError, TypeError):
+        raise ValueError("Invalid correct_answer value")
+
+    return {
+        'topic_slug': str(question_data['topic_slug']).strip(),
+        'question_text': str(question_data['question_text']).strip(),
+        'options': [str(opt).strip() for opt in question_data['options']],
+        'correct_answer': correct_answer
+    }
+
+
+def resolve_topics(slugs, topic_ids):
+    """Add the ids of `slugs` to `topic_ids`, creating missing topics
+
+    Known slugs are looked up in one query and the rest are created with a
+    single INSERT ... ON CONFLICT DO NOTHING. Returns the number created.
+    """
+    missing = [slug for slug in slugs if slug not in topic_ids]
+    if not missing:
+        return 0
+
+    topics = Topic.__table__
+    for topic_id, slug in db.session.execute(
+            db.select(topics.c.id, topics.c.slug).where(topics.c.slug.in_(missing))):
+        topic_ids[slug] = topic_id
+
+    new_topics = []
+    for slug in missing:
+        if slug not in topic_ids:
+            # Generate a nice title from the slug
+            topic_name = slug.replace('-', ' ').title()
+            new_topics.append({
+                'name': topic_name,
+                'description': f"Questions about {topic_name}",
+                'slug': slug
+            })
+    if not new_topics:
+        return 0
+
+    # Another upload may create the same topic concurrently: skip the
+    # conflict here and pick up its id below
+    created = db.session.execute(
+        insert(topics).values(new_topics).on_conflict_do_nothing()
+        .returning(topics.c.id, topics.c.slug)).all()
+    for topic_id, slug in created:
+        topic_ids[slug] = topic_id
+        print(f"Created new topic: {slug}")
+
+    if len(created) < len(new_topics):
+        for topic_id, slug in db.session.execute(
+                db.select(topics.c.id, topics.c.slug).where(
+                    topics.c.slug.in_([t['slug'] for t in new_topics]))):
+            topic_ids[slug] = topic_id
+    return len(created)
+
+
+def insert_questions(chunk, topic_ids, errors):
+    """Insert one chunk of validated (row_number, question) pairs
+
+    Returns (inserted, failed, topics_created).
+    """
+    topics_created = resolve_topics({question['topic_slug'] for _, question in chunk}, topic_ids)
+
+    rows = []
+    failed = 0
+    for row_number, question in chunk:
+        topic_id = topic_ids.get(question['topic_slug'])
+        if topic_id is None:
+            # e.g. a topic with the same generated name already exists
+            failed += 1
+            errors.append(f"Row {row_number}: Could not create topic '{question['topic_slug']}'")
+            continue
+        rows.append({
+            'topic_id': topic_id,
+            'question_text': question['question_text'],
+            'options': question['options'],
+            'correct_answer': question['correct_answer']
+        })
+
+    if rows:
+        # executemany, sent by psycopg2 as multi-row INSERT ... VALUES pages
+        db.session.execute(Question.__table__.insert(), rows)
+    return len(rows), failed, topics_created
+
 
 @quiz_bp.route('/questions/bulk', methods=['POST'])
 def bulk_upload_questions():
-    if not request.is_json:
-        return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-    questions_data = request.get_json()
-    if not isinstance(questions_data, list):
+    if request.mimetype not in ('application/json', 'application/x-ndjson',
+                                'application/jsonl', 'text/csv'):
+        return jsonify({'error': 'Content-Type must be application/json, '
+                                 'application/x-ndjson or text/csv'}), 400
+
+    if request.is_json and not isinstance(request.get_json(silent=True), list):
         return jsonify({'error': 'Expected a list of questions'}), 400
-        
+
     success_count = 0
     failed_count = 0
+    topics_created = 0
     errors = []
-    valid_questions = []
-    created_topics = []
-    
-    # First pass: Validate all questions and create topics if needed
-    for index, question_data in enumerate(questions_data):
-        try:
+    # Slug -> topic id, so each distinct topic is resolved once per upload
+    topic_ids = {}
+    chunk = []
+
+    # All chunks go into one transaction: the questions are stored all or nothing
+    try:
+        for row_number, question_data in iter_bulk_rows():
             # Skip empty rows
-            if not question_data or not any(question_data.values()):
+            if isinstance(question_data, dict) and not any(question_data.values()):
                 continue
-
-            # Validate required fields
-            if not all(k in question_data for k in ('topic_slug', 'question_text', 'options', 'correct_answer')):
-                failed_count += 1
-                errors.append(f"Row {index + 1}: Missing required fields")
+            if not question_data:
                 continue
 
-            # Validate content
-            if not question_data['question_text'] or not question_data['question_text'].strip():
+            try:
+                chunk.append((row_number, validate_question(question_data)))
+            except ValueError as e:
                 failed_count += 1
-                errors.append(f"Row {index + 1}: Empty question text")
+                errors.append(f"Row {row_number}: {str(e)}")
                 continue
 
-            # Validate options
-            if not isinstance(question_data['options'], list) or len(question_data['options']) != 4:
-                failed_count += 1
-                errors.append(f"Row {index + 1}: Invalid options format")
-                continue
+            if len(chunk) >= BULK_CHUNK_SIZE:
+                inserted, failed, created = insert_questions(chunk, topic_ids, errors)
+                success_count += inserted
+                failed_count += failed
+                topics_created += created
+                chunk = []
 
-            if any(opt is None or str(opt).strip() == '' for opt in question_data['options']):
-                failed_count += 1
-                errors.append(f"Row {index + 1}: Empty options not allowed")
-                continue
+        if chunk:
+            inserted, failed, created = insert_questions(chunk, topic_ids, errors)
+            success_count += inserted
+            failed_count += failed
+            topics_created += created
 
-            # Validate correct_answer
-            try:
-                correct_answer = int(question_data['correct_answer'])
-                if not 0 <= correct_answer <= 3:
-                    raise ValueError("Correct answer must be between 0 and 3")
-                question_data['correct_answer'] = correct_answer
-            except (ValueError, TypeError):
-                failed_count += 1
-                errors.append(f"Row {index + 1}: Invalid correct_answer value")
-                continue
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'error': 'Failed to commit questions to database',
+            'detail': str(e),
+            'errors': errors
+        }), 400
+
+    if topics_created:
+        cache.invalidate('topics')
+        print(f"Successfully created {topics_created} new topics")
 
-            # Find or create topic
-            topic_slug = question_data['topic_slug'].strip()
-            topic = Topic.query.filter_by(slug=topic_slug).first()
-            
-            if not topic:
-                # Track which topics we've created during this operation
-                if topic_slug not in created_topics:
-                    # Generate a nice title from the slug
-                    topic_name = topic_slug.replace('-', ' ').title()
-                    
-                    # Create new topic
-                    topic = Topic(
-                        name=topic_name,
-                        description=f"Questions about {topic_name}",
-                        slug=topic_slug
-                    )
-                    db.session.add(topic)
-                    created_topics.append(topic_slug)
-                    print(f"Created new topic: {topic_name} ({topic_slug})")
-                else:
-                    # We've created this topic during this batch, but it's not committed yet
-                    topic = Topic.query.filter_by(slug=topic_slug).first()
-
-            # If all validations pass, add to valid questions
-            valid_questions.append({
-                'topic_id': topic.id if topic.id else None,  # Will be set after commit
-                'topic_slug': topic_slug,  # Keep track of slug for topics created in this batch
-                'question_text': question_data['question_text'].strip(),
-                'options': [str(opt).strip() for opt in question_data['options']],
-                'correct_answer': correct_answer
-            })
-            
-        except Exception as e:
-            failed_count += 1
-            errors.append(f"Row {index + 1}: {str(e)}")
-            continue
-    
-    # Commit new topics first if any were created
-    if created_topics:
-        try:
-            db.session.commit()
-            print(f"Successfully created {len(created_topics)} new topics")
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({
-                'error': 'Failed to create new topics',
-                'detail': str(e),
-                'errors': errors
-            }), 400
-    
-    # Second pass: Add valid questions to database
-    if valid_questions:
-        try:
-            for question_data in valid_questions:
-                # If we were tracking by slug for new topics, get the actual topic id now
-                if question_data['topic_id'] is None:
-                    topic = Topic.query.filter_by(slug=question_data['topic_slug']).first()
-                    question_data['topic_id'] = topic.id
-                
-                # Remove the temporary slug field
-                if 'topic_slug' in question_data:
-                    question_data.pop('topic_slug')
-                
-                question = Question(**question_data)
-                db.session.add(question)
-                success_count += 1
-            
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({
-                'error': 'Failed to commit questions to database',
-                'detail': str(e),
-                'errors': errors
-            }), 400
-    
     return jsonify({
         'success': success_count,
         'failed': failed_count,
-        'topics_created': len(created_topics),
+        'topics_created': topics_created,
         'errors': errors if errors else None
-    })
\ No newline at end of file
+    })
@@ -0,0 +1,103 @@
+from flask import jsonify, request
+from app.models import db
+from . import search_bp
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 50
+
+# Matched words are wrapped in markdown bold, which the wiki already renders
+HEADLINE_OPTIONS = 'StartSel=**, StopSel=**, MaxWords=35, MinWords=15, MaxFragments=2'
+
+WIKI_MATCHES = '''
+    SELECT 'wiki' AS type, w.id, w.slug, w.title,
+           ts_rank_cd(w.search_vector, query.q) AS rank
+    FROM wiki_pages w, query
+    WHERE w.search_vector @@ query.q AND w.is_published IS NOT FALSE
+'''
+
+QUESTION_MATCHES = '''
+    SELECT 'question' AS type, qu.id, t.slug, t.name AS title,
+           ts_rank_cd(qu.search_vector, query.q) AS rank
+    FROM questions qu JOIN topics t ON t.id = qu.topic_id, query
+    WHERE qu.search_vector @@ query.q
+'''
+
+# Rank and page first; ts_headline is costly, so it only runs on the
+# rows actually returned
+SEARCH_SQL = '''
+    WITH query AS (SELECT websearch_to_tsquery('english', :q) AS q),
+    matches AS ({matches}),
+    page AS (
+        SELECT * FROM matches
+        ORDER BY rank DESC, type, id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT page.type, page.id, page.slug, page.title, page.rank,
+           ts_headline('english',
+                       CASE WHEN page.type = 'wiki' THEN w.content ELSE qu.question_text END,
+                       query.q, :headline) AS snippet,
+           (SELECT count(*) FROM matches) AS total
+    FROM page
+    CROSS JOIN query
+    LEFT JOIN wiki_pages w ON page.type = 'wiki' AND w.id = page.id
+    LEFT JOIN questions qu ON page.type = 'question' AND qu.id = page.id
+    ORDER BY page.rank DESC, page.type, page.id
+'''
+
+SEARCH_TYPES = {
+    'all': [WIKI_MATCHES, QUESTION_MATCHES],
+    'wiki': [WIKI_MATCHES],
+    'questions': [QUESTION_MATCHES],
+}
+
+
+@search_bp.route('', methods=['GET'])
+def search():
+    """Full-text search over wiki pages and quiz questions"""
+    query = request.args.get('q', '').strip()
+    search_type = request.args.get('type', 'all')
+
+    if not query:
+        return jsonify({'error': 'Missing search query (q)'}), 400
+    if search_type not in SEARCH_TYPES:
+        return jsonify({'error': 'type must be one of: all, wiki, questions'}), 400
+
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(MAX_PER_PAGE, max(1, int(request.args.get('per_page', DEFAULT_PER_PAGE))))
+    except ValueError:
+        return jsonify({'error': 'page and per_page must be integers'}), 400
+
+    sql = SEARCH_SQL.format(matches=' UNION ALL '.join(SEARCH_TYPES[search_type]))
+    rows = db.session.execute(db.text(sql), {
+        'q': query,
+        'limit': per_page,
+        'offset': (page - 1) * per_page,
+        'headline': HEADLINE_OPTIONS
+    }).mappings().all()
+
+    # total comes with every row; past the last page there are none, so count separately
+    if rows:
+        total = rows[0]['total']
+    else:
+        total = db.session.execute(db.text(
+            "WITH query AS (SELECT websearch_to_tsquery('english', :q) AS q) "
+            f"SELECT count(*) FROM ({' UNION ALL '.join(SEARCH_TYPES[search_type])}) AS matches"
+        ), {'q': query}).scalar()
+
+    return jsonify({
+        'query': query,
+        'type': search_type,
+        'page': page,
+        'per_page': per_page,
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'results': [{
+            'type': row['type'],
+            'id': row['id'],
+            'slug': row['slug'],
+            'title': row['title'],
+            'snippet': row['snippet'],
+            'rank': round(row['rank'], 4)
+        } for row in rows]
+    })
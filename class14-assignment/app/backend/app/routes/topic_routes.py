@@ -1,9 +1,11 @@
 from flask import jsonify, request
 from app.models.models import Topic
 from app.models import db
+from app.cache import cache
 from . import topic_bp
 
 @topic_bp.route('', methods=['GET'])
+@cache.cached('topics')
 def get_topics():
     topics = Topic.query.all()
     return jsonify([topic.to_dict() for topic in topics])
@@ -24,6 +26,7 @@ def create_topic():
     try:
         db.session.add(topic)
         db.session.commit()
+        cache.invalidate('topics')
         return jsonify(topic.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -43,6 +46,7 @@ def update_topic(topic_id):
         
     try:
         db.session.commit()
+        cache.invalidate('topics')
         return jsonify(topic.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -54,6 +58,7 @@ def delete_topic(topic_id):
     try:
         db.session.delete(topic)
         db.session.commit()
+        cache.invalidate('topics')
         return '', 204
     except Exception as e:
         db.session.rollback()
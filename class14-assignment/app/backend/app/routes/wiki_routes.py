@@ -1,50 +1,72 @@
 from flask import jsonify, request
 from app.models.models import WikiPage
 from app.models import db
+from app.cache import cache
+from app.pagination import (ListParamError, list_response, page_response,
+                            parse_fields, parse_page, select_fields)
 from slugify import slugify
 from . import wiki_bp
 from datetime import datetime
 
+# Fields a list request can pick with ?fields=, as in WikiPage.to_dict()
+WIKI_FIELDS = {
+    'id': WikiPage.id,
+    'slug': WikiPage.slug,
+    'title': WikiPage.title,
+    'content': WikiPage.content,
+    'category': WikiPage.category,
+    'created_at': WikiPage.created_at,
+    'updated_at': WikiPage.updated_at,
+    'author': WikiPage.author,
+    'is_published': WikiPage.is_published
+}
+
 @wiki_bp.route('', methods=['GET'])
+@cache.cached('wiki')
 def get_all_wiki_pages():
-    """Get all wiki pages or filter by category"""
+    """Get all wiki pages or filter by category
+
+    Supports ?fields= to skip heavy columns like content, and ?limit= /
+    ?cursor= for keyset pagination (see app/pagination.py).
+    """
     category = request.args.get('category')
     
     try:
+        fields = parse_fields(WIKI_FIELDS)
+        page = parse_page()
+    except ListParamError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        query = select_fields(WikiPage.id, WIKI_FIELDS, fields)
         if category:
             print(f"Filtering wiki pages by category: {category}")
-            pages = WikiPage.query.filter_by(category=category).all()
-            if not pages:
-                print(f"No wiki pages found in category: {category}")
-                return jsonify({
-                    "message": f"No wiki pages found in category: {category}",
-                    "pages": []
-                })
+            query = query.where(WikiPage.category == category)
+            message = f"No wiki pages found in category: {category}"
         else:
             print("Retrieving all wiki pages")
-            pages = WikiPage.query.all()
-            if not pages:
-                print("No wiki pages found")
-                return jsonify({
-                    "message": "No wiki pages found",
-                    "pages": []
-                })
+            message = "No wiki pages found"
         
-        result = [page.to_dict() for page in pages]
-        print(f"Returning {len(result)} wiki pages")
-        return jsonify(result)
+        if page:
+            return page_response(query, WikiPage.id, fields, *page)
+        return list_response(query, WikiPage.id, fields, empty={
+            "message": message,
+            "pages": []
+        })
     
     except Exception as e:
         print(f"Error retrieving wiki pages: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
 @wiki_bp.route('/<string:slug>', methods=['GET'])
+@cache.cached('wiki')
 def get_wiki_page(slug):
     """Get a specific wiki page by slug"""
     page = WikiPage.query.filter_by(slug=slug).first_or_404()
     return jsonify(page.to_dict())
 
 @wiki_bp.route('/categories', methods=['GET'])
+@cache.cached('wiki')
 def get_categories():
     """Get all unique wiki categories"""
     categories = db.session.query(WikiPage.category).distinct().all()
@@ -79,6 +101,7 @@ def create_wiki_page():
         
         db.session.add(page)
         db.session.commit()
+        cache.invalidate('wiki')
         return jsonify(page.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -113,6 +136,7 @@ def update_wiki_page(slug):
     
     try:
         db.session.commit()
+        cache.invalidate('wiki')
         return jsonify(page.to_dict())
     except Exception as e:
         db.session.rollback()
@@ -126,6 +150,7 @@ def delete_wiki_page(slug):
     try:
         db.session.delete(page)
         db.session.commit()
+        cache.invalidate('wiki')
         return '', 204
     except Exception as e:
         db.session.rollback()
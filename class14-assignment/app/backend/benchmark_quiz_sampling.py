@@ -0,0 +1,83 @@
+import random
+import sys
+import time
+from app import create_app
+from app.models import db
+from app.models.models import Topic, Question
+from app.routes.quiz_routes import MAX_QUIZ_QUESTIONS, question_total, sample_questions
+
+# Topic sizes to compare: slug -> number of questions
+BENCH_TOPICS = {
+    'bench-100': 100,
+    'bench-10k': 10000,
+    'bench-1m': 1000000,
+}
+
+
+def create_bench_topics():
+    """Create the benchmark topics, filled with generated questions in SQL"""
+    for slug, size in BENCH_TOPICS.items():
+        if Topic.query.filter_by(slug=slug).first():
+            continue
+        topic = Topic(name=f'Benchmark {slug}', description='Sampling benchmark', slug=slug)
+        db.session.add(topic)
+        db.session.flush()
+        print(f"Generating {size} questions for {slug}...")
+        db.session.execute(db.text('''
+            INSERT INTO questions (topic_id, question_text, options, correct_answer, created_at)
+            SELECT :topic_id, 'Benchmark question ' || n, '["a", "b", "c", "d"]', n % 4, now()
+            FROM generate_series(1, :size) AS n
+        '''), {'topic_id': topic.id, 'size': size})
+        db.session.commit()
+    db.session.execute(db.text('ANALYZE questions'))
+    db.session.commit()
+
+
+def drop_bench_topics():
+    for slug in BENCH_TOPICS:
+        topic = Topic.query.filter_by(slug=slug).first()
+        if topic:
+            db.session.execute(db.text('DELETE FROM questions WHERE topic_id = :id'), {'id': topic.id})
+            db.session.delete(topic)
+    db.session.commit()
+
+
+def load_all_and_sample(topic):
+    """The previous get_quiz(): load every question, then random.sample"""
+    all_questions = Question.query.filter_by(topic_id=topic.id).all()
+    return random.sample(all_questions, min(MAX_QUIZ_QUESTIONS, len(all_questions)))
+
+
+def timed(func, topic, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(topic)
+        timings.append(time.perf_counter() - start)
+        # Fresh session each time, so nothing is served from the identity map
+        db.session.remove()
+        topic = db.session.merge(topic)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+def main():
+    keep = '--keep' in sys.argv
+    app = create_app()
+    with app.app_context():
+        create_bench_topics()
+        print(f"\n{'topic':<12} {'questions':>10} {'load all + sample':>18} {'index probes':>13}")
+        for slug, size in BENCH_TOPICS.items():
+            topic = Topic.query.filter_by(slug=slug).first()
+            total = question_total(topic)
+            # The old approach takes tens of seconds per call on 1M rows
+            old_repeat = 3 if size >= 1000000 else 20
+            old_ms = timed(load_all_and_sample, topic, old_repeat)
+            new_ms = timed(lambda t: sample_questions(t, MAX_QUIZ_QUESTIONS, total), topic, 200)
+            print(f"{slug:<12} {total:>10} {old_ms:>15.1f} ms {new_ms:>10.2f} ms")
+        if not keep:
+            drop_bench_topics()
+
+
+if __name__ == "__main__":
+    main()
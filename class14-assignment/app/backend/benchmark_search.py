@@ -0,0 +1,124 @@
+import statistics
+import sys
+import time
+from app import create_app
+from app.models import db
+from app.models.models import Topic
+
+WIKI_PAGES = 20000
+QUESTIONS = 200000
+WORDS_PER_PAGE = 300
+
+VOCABULARY = '''
+docker container image registry volume network bridge overlay compose swarm
+kubernetes pod deployment service ingress namespace node cluster helm chart
+jenkins pipeline stage agent groovy artifact build release rollback canary
+terraform module provider state backend plan apply resource variable output
+ansible playbook role inventory task handler template idempotent facts vault
+aws ec2 s3 rds lambda iam vpc subnet route gateway loadbalancer autoscaling
+linux kernel process thread memory cpu disk filesystem mount permission user
+git branch merge rebase commit tag remote conflict cherry stash hook monorepo
+monitoring prometheus grafana alert metric dashboard latency throughput error
+logging elasticsearch fluentd kibana trace span sampling retention index shard
+security secret certificate tls firewall policy audit vulnerability patch scan
+database postgres mysql replica backup restore migration schema query index
+'''.split()
+
+# Sample searches, from common single words to multi-word phrases. Words are
+# drawn uniformly from a small vocabulary, so most terms match a large share
+# of the corpus: a worst case for ranking, which reads every match
+QUERIES = ['docker', 'kubernetes pod', 'rollback canary release', '"load balancer"',
+           'terraform -aws', 'prometheus alert latency', 'replica backup restore',
+           'nonexistentword']
+
+
+def seed_corpus():
+    """Generate wiki pages and questions from random vocabulary, in SQL"""
+    if db.session.execute(db.text(
+            "SELECT 1 FROM wiki_pages WHERE slug = 'bench-search-1'")).first():
+        return
+    print(f"Generating {WIKI_PAGES} wiki pages and {QUESTIONS} questions...")
+    db.session.execute(db.text('''
+        INSERT INTO wiki_pages (slug, title, content, category, created_at, updated_at, is_published)
+        SELECT 'bench-search-' || n,
+               (SELECT string_agg((CAST(:words AS text[]))[1 + floor(random() * cardinality(:words))::int], ' ')
+                FROM generate_series(1, 5) WHERE n > 0),
+               (SELECT string_agg((CAST(:words AS text[]))[1 + floor(random() * cardinality(:words))::int], ' ')
+                FROM generate_series(1, :words_per_page) WHERE n > 0),
+               'benchmark', now(), now(), true
+        FROM generate_series(1, :pages) AS n
+    '''), {'words': VOCABULARY, 'pages': WIKI_PAGES, 'words_per_page': WORDS_PER_PAGE})
+
+    topic = Topic(name='Benchmark Search', description='Search benchmark', slug='bench-search')
+    db.session.add(topic)
+    db.session.flush()
+    db.session.execute(db.text('''
+        INSERT INTO questions (topic_id, question_text, options, correct_answer, created_at)
+        SELECT :topic_id,
+               (SELECT string_agg((CAST(:words AS text[]))[1 + floor(random() * cardinality(:words))::int], ' ')
+                FROM generate_series(1, 15) WHERE n > 0) || '?',
+               '["a", "b", "c", "d"]', n % 4, now()
+        FROM generate_series(1, :questions) AS n
+    '''), {'words': VOCABULARY, 'topic_id': topic.id, 'questions': QUESTIONS})
+    db.session.commit()
+    db.session.execute(db.text('ANALYZE wiki_pages'))
+    db.session.execute(db.text('ANALYZE questions'))
+    db.session.commit()
+
+
+def drop_corpus():
+    db.session.execute(db.text("DELETE FROM wiki_pages WHERE slug LIKE 'bench-search-%'"))
+    db.session.execute(db.text(
+        "DELETE FROM questions WHERE topic_id IN (SELECT id FROM topics WHERE slug = 'bench-search')"))
+    db.session.execute(db.text("DELETE FROM topics WHERE slug = 'bench-search'"))
+    db.session.commit()
+
+
+def ilike_search(term):
+    """Substring search without an index: every page and question is scanned
+    to count the matches (first word of the query only, no ranking)"""
+    pattern = f'%{term.strip(chr(34)).split()[0]}%'
+    db.session.execute(db.text('''
+        SELECT (SELECT count(*) FROM wiki_pages WHERE title ILIKE :p OR content ILIKE :p) +
+               (SELECT count(*) FROM questions WHERE question_text ILIKE :p)
+    '''), {'p': pattern}).scalar()
+
+
+def percentiles(timings):
+    timings = sorted(timings)
+    return (statistics.median(timings) * 1000,
+            timings[int(len(timings) * 0.95) - 1] * 1000)
+
+
+def main():
+    keep = '--keep' in sys.argv
+    app = create_app()
+    client = app.test_client()
+    with app.app_context():
+        seed_corpus()
+
+        print(f"\n{'query':<28} {'hits':>7} {'search p50':>11} {'p95':>9} {'ILIKE p50':>10}")
+        for query in QUERIES:
+            timings = []
+            for _ in range(30):
+                start = time.perf_counter()
+                response = client.get('/api/search', query_string={'q': query})
+                timings.append(time.perf_counter() - start)
+            total = response.get_json()['total']
+
+            ilike_timings = []
+            for _ in range(3):
+                start = time.perf_counter()
+                ilike_search(query)
+                ilike_timings.append(time.perf_counter() - start)
+
+            p50, p95 = percentiles(timings)
+            print(f"{query:<28} {total:>7} {p50:>8.1f} ms {p95:>6.1f} ms "
+                  f"{statistics.median(ilike_timings) * 1000:>7.1f} ms")
+
+        if not keep:
+            drop_corpus()
+
+
+if __name__ == "__main__":
+    main()
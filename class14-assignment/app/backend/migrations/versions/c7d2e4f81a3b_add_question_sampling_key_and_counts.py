@@ -0,0 +1,95 @@
+"""Add question random_key and topic question_count
+
+Revision ID: c7d2e4f81a3b
+Revises: a05e32811b08
+Create Date: 2026-10-18 10:05:12.418230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2e4f81a3b'
+down_revision = 'a05e32811b08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing rows get their own random() value from the server default
+    op.add_column('questions', sa.Column('random_key', sa.Float(), server_default=sa.text('random()'), nullable=False))
+    op.create_index('ix_questions_topic_id_random_key', 'questions', ['topic_id', 'random_key'], unique=False)
+    op.add_column('topics', sa.Column('question_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.execute("""
+        UPDATE topics SET question_count = counts.total
+        FROM (SELECT topic_id, count(*) AS total FROM questions GROUP BY topic_id) AS counts
+        WHERE topics.id = counts.topic_id
+    """)
+
+    # Statement-level triggers: a bulk insert updates each topic once,
+    # not once per question
+    op.execute("""
+        CREATE FUNCTION questions_count_insert() RETURNS trigger AS $$
+        BEGIN
+            UPDATE topics SET question_count = question_count + changed.total
+            FROM (SELECT topic_id, count(*) AS total FROM new_rows GROUP BY topic_id) AS changed
+            WHERE topics.id = changed.topic_id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION questions_count_delete() RETURNS trigger AS $$
+        BEGIN
+            UPDATE topics SET question_count = question_count - changed.total
+            FROM (SELECT topic_id, count(*) AS total FROM old_rows GROUP BY topic_id) AS changed
+            WHERE topics.id = changed.topic_id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE FUNCTION questions_count_update() RETURNS trigger AS $$
+        BEGIN
+            UPDATE topics SET question_count = question_count + changed.total
+            FROM (
+                SELECT topic_id, sum(delta) AS total FROM (
+                    SELECT topic_id, 1 AS delta FROM new_rows
+                    UNION ALL
+                    SELECT topic_id, -1 AS delta FROM old_rows
+                ) AS deltas GROUP BY topic_id
+            ) AS changed
+            WHERE topics.id = changed.topic_id AND changed.total <> 0;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER questions_count_insert AFTER INSERT ON questions
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION questions_count_insert()
+    """)
+    op.execute("""
+        CREATE TRIGGER questions_count_delete AFTER DELETE ON questions
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION questions_count_delete()
+    """)
+    op.execute("""
+        CREATE TRIGGER questions_count_update AFTER UPDATE ON questions
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION questions_count_update()
+    """)
+
+
+def downgrade():
+    op.execute('DROP TRIGGER IF EXISTS questions_count_update ON questions')
+    op.execute('DROP TRIGGER IF EXISTS questions_count_delete ON questions')
+    op.execute('DROP TRIGGER IF EXISTS questions_count_insert ON questions')
+    op.execute('DROP FUNCTION IF EXISTS questions_count_update()')
+    op.execute('DROP FUNCTION IF EXISTS questions_count_delete()')
+    op.execute('DROP FUNCTION IF EXISTS questions_count_insert()')
+    op.drop_column('topics', 'question_count')
+    op.drop_index('ix_questions_topic_id_random_key', table_name='questions')
+    op.drop_column('questions', 'random_key')
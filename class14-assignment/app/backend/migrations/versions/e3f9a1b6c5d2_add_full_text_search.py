@@ -0,0 +1,33 @@
+"""Add full-text search vectors to wiki pages and questions
+
+Revision ID: e3f9a1b6c5d2
+Revises: c7d2e4f81a3b
+Create Date: 2026-10-18 11:42:37.905114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f9a1b6c5d2'
+down_revision = 'c7d2e4f81a3b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Generated columns: PostgreSQL keeps them current on every write and
+    # fills them for existing rows here
+    op.add_column('wiki_pages', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("setweight(to_tsvector('english', coalesce(title, '')), 'A') || setweight(to_tsvector('english', coalesce(content, '')), 'B')", persisted=True), nullable=True))
+    op.create_index('ix_wiki_pages_search_vector', 'wiki_pages', ['search_vector'], unique=False, postgresql_using='gin')
+    op.add_column('questions', sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed("to_tsvector('english', coalesce(question_text, ''))", persisted=True), nullable=True))
+    op.create_index('ix_questions_search_vector', 'questions', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    op.drop_index('ix_questions_search_vector', table_name='questions', postgresql_using='gin')
+    op.drop_column('questions', 'search_vector')
+    op.drop_index('ix_wiki_pages_search_vector', table_name='wiki_pages', postgresql_using='gin')
+    op.drop_column('wiki_pages', 'search_vector')
@@ -1,10 +1,13 @@
 import API_URL from '../config/api';
 
+// The list only shows these, so don't download every page's content
+const LIST_FIELDS = 'slug,title,category,updated_at';
+
 export const fetchAllWikiPages = async (category = null) => {
   try {
     const url = category 
-      ? `${API_URL}/api/wiki?category=${encodeURIComponent(category)}`
-      : `${API_URL}/api/wiki`;
+      ? `${API_URL}/api/wiki?fields=${LIST_FIELDS}&category=${encodeURIComponent(category)}`
+      : `${API_URL}/api/wiki?fields=${LIST_FIELDS}`;
       
     const response = await fetch(url);
     if (!response.ok) {
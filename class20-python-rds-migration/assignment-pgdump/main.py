@@ -1,15 +1,22 @@
 import subprocess
 import boto3
 import logging
-import psycopg
 from botocore.config import Config
-from psycopg import OperationalError
-import time
 import argparse
 from datetime import datetime, timedelta
 import urllib.parse
 import sys
 from os import getenv
+from pathlib import Path
+
+# pgcopy.py, journal.py, replication.py, validate.py and readiness.py are in
+# ../common, shared with the other migration tools
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "common"))
+from journal import JOURNAL_DIR, MigrationJournal
+from pgcopy import COPY_WORKERS, copy_database, copy_sequences
+from readiness import instance_status, wait_for_connection, wait_for_instance, wait_for_rename
+from replication import Replication, catch_up
+from validate import Validator, log_report, write_report
 
 my_config = Config(
     region_name="ap-south-1",
@@ -169,112 +176,32 @@ def duplicate_rds(dbinstance: str, new_allocated_storage: int) -> dict:
     return response
 
 
-def backup_postgres_db(host, db, port, user, password, dest_file, verbose):
-    """
-    Backup postgres db to a file.
-    """
-    if verbose:
-        try:
-            process = subprocess.Popen(
-                [
-                    "pg_dump",
-                    f"--dbname=postgresql://{user}:{password}@{host}:{port}/{db}",
-                    "-Fc",
-                    "-f",
-                    dest_file,
-                    "-v",
-                ],
-                stdout=subprocess.PIPE,
-            )
-            output = process.communicate()[0]
-            if int(process.returncode) != 0:
-                print(f"Command failed. Return code : {process.returncode}")
-                exit(1)
-            return output
-        except Exception as e:
-            logging.error(e)
-            exit(1)
-    else:
-
-        try:
-            process = subprocess.Popen(
-                [
-                    "pg_dump",
-                    f"--dbname=postgresql://{user}:{password}@{host}:{port}/{db}",
-                    "-f",
-                    dest_file,
-                ],
-                stdout=subprocess.PIPE,
-            )
-            output = process.communicate()[0]
-            if process.returncode != 0:
-                print(f"Command failed. Return code : {process.returncode}")
-                exit(1)
-            return output
-        except Exception as e:
-            print.error(e)
-            exit(1)
-
-
-def restore_postgres_db(host, db, port, user, password, backup_file, verbose):
+def copy_postgres_db(source_db_link, destination_db_link, journal=None, replication=None):
     """
-    Restore postgres db from a file.
+    Copy postgres db to another one, streamed table by table with no dump file.
     """
-    if verbose:
-        try:
-            process = subprocess.Popen(
-                [
-                    "pg_restore",
-                    "--no-owner",
-                    f"--dbname=postgresql://{user}:{password}@{host}:{port}/{db}",
-                    "-v",
-                    backup_file,
-                ],
-                stdout=subprocess.PIPE,
-            )
-            output = process.communicate()[0]
-            if int(process.returncode) != 0:
-                logging.error(f"Command failed. Return code : {process.returncode}")
-
-            return output
-        except Exception as e:
-            logging.error(f"Issue with the db restore : {e}")
-    else:
-        try:
-            process = subprocess.Popen(
-                [
-                    "pg_restore",
-                    "--no-owner",
-                    f"--dbname=postgresql://{user}:{password}@{host}:{port}/{db}",
-                    backup_file,
-                ],
-                stdout=subprocess.PIPE,
-            )
-            output = process.communicate()[0]
-            if int(process.returncode) != 0:
-                logging.error(f"Command failed. Return code : {process.returncode}")
-
-            return output
-        except Exception as e:
-            logging.error(f"Issue with the db restore : {e}")
-
-def check_rds_availability(host, port, dbname, user, password):
-    while True:
-        try:
-            # Attempt to establish a connection to the RDS database
-            conn = psycopg.connect(
-                host=host, port=port, dbname=dbname, user=user, password=password
-            )
+    try:
+        return copy_database(
+            source_db_link,
+            destination_db_link,
+            workers=COPY_WORKERS,
+            journal=journal,
+            replication=replication,
+        )
+    except Exception as e:
+        logging.error(f"Issue with the db copy : {e}")
+        exit(1)
 
-            conn.close()
-            time.sleep(30) # giving additional 30 seconds 
-            return True
 
-        except OperationalError as e:
-            # If an OperationalError occurs (e.g., connection error), print the error
-            logging.error(f"Error connecting to the RDS database {host}: {e}")
-            logging.info("Retrying in 60 seconds...")
-            time.sleep(60) 
+def check_rds_availability(dbinstance, db_link):
+    # Carries on as soon as the instance is available and takes connections,
+    # see readiness.py
+    try:
+        wait_for_instance(rds, dbinstance)
+        wait_for_connection(db_link)
+    except TimeoutError as e:
+        logging.error(e)
+        exit(1)
 
 def evaluate_rds(dbinstance):
     free_storage = get_db_freestorage(dbinstance)
@@ -300,6 +227,7 @@ def rename_rds(old, new):
             output = process.communicate()[0]
             if int(process.returncode) != 0:
                 logging.error(f"Command failed. Return code : {process.returncode}")
+                exit(1)
 
             return output
     except Exception as e:
@@ -307,13 +235,27 @@ def rename_rds(old, new):
         exit(1)
 
 
-def swap_db(old, new):
-    logging.info(f'Renaming db: {old} -> {old}-old ')
-    rename_rds(old, f'{old}-old')
-    logging.info("Sleeping for 5 min")
-    time.sleep(300)
-    logging.info(f'Renaming db: {new} - > {old}')
-    rename_rds(new, old)
+def swap_db(old, new, journal):
+    if not journal.done("old_renamed"):
+        logging.info(f'Renaming db: {old} -> {old}-old ')
+        rename_rds(old, f'{old}-old')
+        journal.mark("old_renamed")
+    # The waits give up after READY_TIMEOUT, a rerun resumes from the journal
+    try:
+        if not journal.done("new_renamed"):
+            # A rerun after the rename was issued finds the new db gone (it is
+            # being renamed to the old identifier) and only waits for it
+            if instance_status(rds, new) is not None:
+                # The old identifier can only be reused once the rename is done
+                wait_for_rename(rds, old, f'{old}-old')
+                logging.info(f'Renaming db: {new} - > {old}')
+                rename_rds(new, old)
+            journal.mark("new_renamed")
+        wait_for_rename(rds, new, old)
+    except TimeoutError as e:
+        logging.error(e)
+        exit(1)
+    journal.mark("swapped")
 
 def stop_rds(dbinstance: str) -> None:
     try:
@@ -325,42 +267,98 @@ def stop_rds(dbinstance: str) -> None:
         logging.error(f"Issue with stopping - {dbinstance} -> {e}")
         exit(1)
 
+def catch_up_replication(old_db, new_db, journal):
+    # Logical replication brings over the writes made during the copy,
+    # without it they are lost (see replication.py)
+    replication = Replication(old_db, new_db)
+    if journal.done("replicating"):
+        return replication
+    if getenv("CATCH_UP", "true").lower() != "true":
+        return None
+    if not replication.supported():
+        logging.warning(
+            "wal_level is not logical on the old db, writes made during the copy "
+            "will not be on the new db (set rds.logical_replication = 1)"
+        )
+        return None
+    return replication
+
+def validate_dbs(validator, dbinstance, chunks=None):
+    # Checksums every chunk of every table on both dbs (see validate.py), or
+    # only `chunks`, those that differed before the writes were fenced
+    if getenv("VALIDATE", "true").lower() != "true":
+        logging.warning("Skipping the validation of the new db")
+        return True
+    report = validator.validate(chunks)
+    log_report(report)
+    write_report(report, f"{JOURNAL_DIR}/{dbinstance}.validation.json")
+    return report["ok"]
+
 def migrate_rds(dbinstance,new_allocated_storage ):
     host, db, user, password, port = get_db_details(dbinstance)
     password = urllib.parse.quote(password)
-    source_rds_data = source_rds_instance(dbinstance)
-    logging.info(f' Taking pg_dump of {dbinstance} ')
-    backup_filename = f'{dbinstance}_dump'
-    try:
-        backup_postgres_db(
-            host, db, port, user, password, backup_filename, verbose=False
-        )
-    except Exception as e:
-        logging.info(e)
+    # Rerunning a failed migration resumes it from the last finished step
+    journal = MigrationJournal.for_instance(dbinstance)
 
-    logging.info(f' Creating the duplicte rds of {dbinstance}')
-    duplicate_rds_instance = duplicate_rds(dbinstance, int(new_allocated_storage))
-
-    new_rds_DBInstanceIdentifier = duplicate_rds_instance["DBInstance"][
-        "DBInstanceIdentifier"
-    ]
-    logging.info(f"Creating {new_rds_DBInstanceIdentifier}")
-    old_db_endpoint = source_rds_data['Endpoint']['Address']
+    if journal.done("instance_created"):
+        new_rds_DBInstanceIdentifier = journal.get("instance_created")["identifier"]
+        old_db_endpoint = journal.get("instance_created")["old_endpoint"]
+        logging.info(f"{new_rds_DBInstanceIdentifier} is already created")
+    else:
+        source_rds_data = source_rds_instance(dbinstance)
+        logging.info(f' Creating the duplicte rds of {dbinstance}')
+        duplicate_rds_instance = duplicate_rds(dbinstance, int(new_allocated_storage))
+
+        new_rds_DBInstanceIdentifier = duplicate_rds_instance["DBInstance"][
+            "DBInstanceIdentifier"
+        ]
+        logging.info(f"Creating {new_rds_DBInstanceIdentifier}")
+        old_db_endpoint = source_rds_data['Endpoint']['Address']
+        journal.mark(
+            "instance_created",
+            identifier=new_rds_DBInstanceIdentifier,
+            old_endpoint=old_db_endpoint,
+        )
     new_db_endpoint = new_rds_DBInstanceIdentifier + "." + ".".join(old_db_endpoint.split(".")[1:])
-    check_rds_availability(new_db_endpoint, port, db, user, password)
 
-    logging.info(f"restoring the new db - {new_rds_DBInstanceIdentifier}")
-    try:
-        restore_postgres_db(
-            new_db_endpoint, db, port, user, password, backup_filename, verbose=False
-        )
-    except Exception as e:
-        print(e)
+    if not journal.done("validated"):
+        source_db_link = f"postgresql://{user}:{password}@{old_db_endpoint}:{port}/{db}"
+        destination_db_link = f"postgresql://{user}:{password}@{new_db_endpoint}:{port}/{db}"
+        check_rds_availability(new_rds_DBInstanceIdentifier, destination_db_link)
+
+        logging.info(f"copying {dbinstance} to the new db - {new_rds_DBInstanceIdentifier}")
+        replication = catch_up_replication(source_db_link, destination_db_link, journal)
+        copy_postgres_db(source_db_link, destination_db_link, journal, replication)
+        validator = Validator(source_db_link, destination_db_link)
+        suspects = None
+        if replication and not journal.done("caught_up"):
+            # The full pass runs before the fence, only the chunks that
+            # differed then are checked again while writes are fenced
+            try:
+                suspects = catch_up(replication, copy_sequences, journal,
+                                    before_fence=validator.mismatched)
+            except TimeoutError as e:
+                logging.error(f"The new db did not catch up with the old one: {e}")
+                exit(1)
+        if not validate_dbs(validator, dbinstance, suspects):
+            logging.error(
+                "The new db doesn't match the old one, not swapping. "
+                "Run migrate again to copy the data again from scratch"
+            )
+            # Once writes are allowed again the new db falls behind for good
+            journal.restart_copy()
+            if replication:
+                replication.unfence_writes()
+            exit(1)
+        journal.mark("validated")
 
-    logging.info("Swapping dbs")
-    swap_db(dbinstance, new_rds_DBInstanceIdentifier)
+    if not journal.done("swapped"):
+        logging.info("Swapping dbs")
+        swap_db(dbinstance, new_rds_DBInstanceIdentifier, journal)
     logging.info(f'Stopping the {dbinstance}-old')
     stop_rds(f'{dbinstance}-old')
+    journal.mark("old_stopped")
+    journal.finish()
 
 
 
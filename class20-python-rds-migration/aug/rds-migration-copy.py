@@ -24,10 +24,32 @@ def parse_db_link(db_link_secret):
 
     return user, password, host, db_identifier, dbname
 
+def wait_for_instance(db_identifier, timeout=3600):
+    # boto3 waiter, returns as soon as the instance is available
+    logging.info(f"Waiting for {db_identifier} to be available")
+    rds_client.get_waiter("db_instance_available").wait(
+        DBInstanceIdentifier=db_identifier,
+        WaiterConfig={"Delay": 15, "MaxAttempts": timeout // 15},
+    )
+
+
+def wait_for_rename(old_db_identifier, new_db_identifier, timeout=3600):
+    # the old identifier is gone and the new one is available once the rename is done
+    config = {"Delay": 15, "MaxAttempts": timeout // 15}
+    rds_client.get_waiter("db_instance_deleted").wait(
+        DBInstanceIdentifier=old_db_identifier, WaiterConfig=config
+    )
+    rds_client.get_waiter("db_instance_available").wait(
+        DBInstanceIdentifier=new_db_identifier, WaiterConfig=config
+    )
+    logging.info(f"{old_db_identifier} renamed to {new_db_identifier}")
+
+
 def check_rds_availability(host, port, dbname, user, password):
     timeout = 600  # 10 minutes
     start_time = time.time()
-    
+    delay = 2
+
     while time.time() - start_time < timeout:
         try:
             conn = psycopg2.connect(
@@ -35,17 +57,18 @@ def check_rds_availability(host, port, dbname, user, password):
                 port=port, 
                 dbname=dbname, 
                 user=user, 
-                password=password
+                password=password,
+                connect_timeout=10,
             )
             conn.close()
             logging.info(f"Connection established successfully with {host}.")
-            time.sleep(90)
             return True
             
-        except:
+        except psycopg2.OperationalError:
             logging.error(f"Error connecting to RDS database {host}: Not ready yet.")
-            logging.info("Retrying in 90 seconds...")
-            time.sleep(90)
+            logging.info(f"Retrying in {delay} seconds...")
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
     
     logging.error("Connection timeout after 10 minutes.")
     return False
@@ -124,11 +147,11 @@ def swap_dbs(db_identifier):
     # rename new db to old db name
     logging.info("Swapping DBs - dev-app-db -> dev-app-db-old")
     rename_dbs(db_identifier, f"{db_identifier}-old")
-    time.sleep(300)
+    wait_for_rename(db_identifier, f"{db_identifier}-old")
     
     logging.info("Swapping DBs - dev-app-db-new -> dev-app-db")
     rename_dbs(f"{db_identifier}-new",db_identifier)
-    time.sleep(300)
+    wait_for_rename(f"{db_identifier}-new", db_identifier)
 
 def stop_rds_instance(db_identifier):
     response = rds_client.stop_db_instance(
@@ -143,7 +166,8 @@ def run():
     new_host= old_host.split(".")[0] + "-new" + "."+ ".".join(old_host.split(".")[1:])
     create_new_rds_instance(db_link, new_storage)
 
-    check_rds_availability(old_host, 5432, dbname, user, password)
+    wait_for_instance(f"{db_identifier}-new")
+    check_rds_availability(new_host, 5432, dbname, user, password)
     
     try:
         sync_dbs(old_host, new_host)
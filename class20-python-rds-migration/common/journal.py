@@ -0,0 +1,132 @@
+# Migration journal, so a failed migrate_rds run can be started again and
+# pick up where it stopped instead of starting over.
+#
+# One JSON file per source instance, rewritten (atomically) after every
+# step and every copied chunk:
+#
+#   {"dbinstance": "mydb", "started": "...",
+#    "steps": {"instance_created": {"at": "...", "identifier": "mydbnew"}, ...},
+#    "chunks": {"public.orders:0": {"table": "public.orders", "low": null,
+#                                   "high": 500001, "done": true, "rows": 499874}, ...}}
+#
+# Steps, in order: instance_created, schema_created, data_copied,
+# indexes_created, replicating, writes_fenced, caught_up, validated,
+# old_renamed, swapped, old_stopped (replicating to caught_up only when the
+# new db catches up with logical replication, see replication.py).
+# Once old_stopped is recorded the file is renamed to <name>.<date>.done.json
+# so the next migration of the same instance starts from scratch.
+# When the new db fails validation the copy steps are forgotten
+# (restart_copy) and the next run copies everything again into an emptied
+# new db.
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from os import getenv
+
+JOURNAL_DIR = getenv("JOURNAL_DIR", ".")
+
+STEPS = [
+    "instance_created",
+    "schema_created",
+    "data_copied",
+    "indexes_created",
+    "replicating",
+    "writes_fenced",
+    "caught_up",
+    "validated",
+    "old_renamed",
+    "new_renamed",
+    "swapped",
+    "old_stopped",
+]
+
+# Forgotten by restart_copy()
+COPY_STEPS = STEPS[STEPS.index("schema_created"):STEPS.index("validated")]
+
+
+def now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class MigrationJournal:
+    def __init__(self, path, dbinstance=None):
+        self.path = path
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.data = json.load(f)
+            logging.info(f"Resuming the migration from {path}, done: {', '.join(self.data['steps']) or 'nothing'}")
+        else:
+            self.data = {"dbinstance": dbinstance, "started": now(), "steps": {}, "chunks": {}}
+            self.save()
+
+    @classmethod
+    def for_instance(cls, dbinstance):
+        return cls(os.path.join(JOURNAL_DIR, f"{dbinstance}.journal.json"), dbinstance)
+
+    def save(self):
+        # Write to a temporary file and rename it, a crash never leaves half a journal
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=1)
+        os.replace(tmp, self.path)
+
+    def done(self, step):
+        return step in self.data["steps"]
+
+    def get(self, step):
+        return self.data["steps"].get(step)
+
+    def mark(self, step, **details):
+        if step not in STEPS:
+            raise ValueError(f"Unknown migration step {step}")
+        with self.lock:
+            self.data["steps"][step] = {"at": now(), **details}
+            self.save()
+        logging.info(f"Journal: {step}")
+
+    def unmark(self, step):
+        with self.lock:
+            self.data["steps"].pop(step, None)
+            self.save()
+
+    def restart_copy(self):
+        """Copy everything again on the next run, into an emptied new db"""
+        with self.lock:
+            for step in COPY_STEPS:
+                self.data["steps"].pop(step, None)
+            self.data["chunks"] = {}
+            self.data["restart_copy"] = True
+            self.save()
+        logging.info("Journal: the copy starts over on the next run")
+
+    def restarting_copy(self):
+        return self.data.get("restart_copy", False)
+
+    def copy_restarted(self):
+        with self.lock:
+            self.data.pop("restart_copy", None)
+            self.save()
+
+    # Copy progress, one entry per table chunk (see pgcopy.py)
+
+    def chunks(self):
+        return self.data["chunks"]
+
+    def plan_chunks(self, chunks):
+        with self.lock:
+            self.data["chunks"] = chunks
+            self.save()
+
+    def chunk_done(self, key, rows):
+        with self.lock:
+            self.data["chunks"][key].update(done=True, rows=rows)
+            self.save()
+
+    def finish(self):
+        """Move the journal of a finished migration out of the way"""
+        finished = self.path.replace(".journal.json", f".{datetime.now():%Y%m%d%H%M%S}.done.json")
+        os.replace(self.path, finished)
+        logging.info(f"Migration finished, journal kept as {finished}")
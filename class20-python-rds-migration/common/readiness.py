@@ -0,0 +1,93 @@
+# Waits for RDS instances to be ready, instead of sleeping a fixed time.
+#
+# The instance status is polled with describe_db_instances, every
+# READY_POLL_MIN seconds at first and less often (up to READY_POLL_MAX) the
+# longer nothing changes. Whenever the status changes the polling is fast
+# again, so the next step starts a few seconds after the instance is ready
+# rather than after minutes of sleep. Everything gives up with a TimeoutError
+# after READY_TIMEOUT seconds.
+#
+# Only boto3 and psycopg calls, no signals, so it works from any thread and
+# can be tested against moto.
+import logging
+import time
+from os import getenv
+
+import psycopg
+
+READY_TIMEOUT = int(getenv("READY_TIMEOUT", 3600))
+READY_POLL_MIN = float(getenv("READY_POLL_MIN", 5))
+READY_POLL_MAX = float(getenv("READY_POLL_MAX", 60))
+# Seconds for one connection attempt
+CONNECT_TIMEOUT = int(getenv("CONNECT_TIMEOUT", 10))
+
+
+def poll(check, what, timeout=READY_TIMEOUT, min_delay=READY_POLL_MIN, max_delay=READY_POLL_MAX):
+    """Call `check` until it returns (True, state), returns the last state
+
+    `check` returns (done, state); the delay between calls doubles up to
+    `max_delay` while the state stays the same and drops back to
+    `min_delay` when it changes.
+    """
+    deadline = time.monotonic() + timeout
+    delay = min_delay
+    last = None
+    while True:
+        done, state = check()
+        if done:
+            return state
+        if state != last:
+            logging.info(f"Waiting for {what}: {state}")
+            delay = min_delay
+            last = state
+        else:
+            delay = min(delay * 2, max_delay)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout}s waiting for {what} ({state})")
+        time.sleep(min(delay, remaining))
+
+
+def instance_status(rds, identifier):
+    """Status of the RDS instance, None if it doesn't exist"""
+    try:
+        instances = rds.describe_db_instances(DBInstanceIdentifier=identifier)["DBInstances"]
+    except rds.exceptions.DBInstanceNotFoundFault:
+        return None
+    return instances[0]["DBInstanceStatus"]
+
+
+def wait_for_instance(rds, identifier, status="available", timeout=READY_TIMEOUT):
+    def check():
+        current = instance_status(rds, identifier)
+        return current == status, current or "not found"
+
+    poll(check, f"{identifier} to be {status}", timeout)
+    logging.info(f"{identifier} is {status}")
+
+
+def wait_for_rename(rds, old, new, timeout=READY_TIMEOUT):
+    """Wait until `old` is renamed to `new` and `new` is available
+
+    The old identifier is free again from then on.
+    """
+    def check():
+        statuses = (instance_status(rds, old), instance_status(rds, new))
+        return statuses == (None, "available"), f"{old}: {statuses[0]}, {new}: {statuses[1]}"
+
+    poll(check, f"{old} to be renamed to {new}", timeout)
+    logging.info(f"{old} is renamed to {new}")
+
+
+def wait_for_connection(db_link, timeout=READY_TIMEOUT):
+    """Wait until the db accepts connections and runs a query"""
+    def check():
+        try:
+            with psycopg.connect(db_link, connect_timeout=CONNECT_TIMEOUT) as conn:
+                conn.execute("SELECT 1")
+            return True, "connected"
+        except psycopg.OperationalError as e:
+            return False, str(e).strip().splitlines()[0]
+
+    poll(check, "the db to take connections", timeout)
+    logging.info("The db takes connections")
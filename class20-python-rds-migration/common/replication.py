@@ -0,0 +1,223 @@
+# Catch-up of the new db with PostgreSQL logical replication, so the writes
+# made on the old db during (and after) the bulk copy are not lost.
+#
+#  1. before the bulk copy, a logical replication slot is created on the old
+#     db; the copy reads the snapshot the slot was created at, so the slot
+#     holds exactly the changes the copy doesn't have
+#  2. once the indexes exist on the new db, a subscription on the new db
+#     streams those changes from the slot
+#  3. when the new db is less than CATCH_UP_LAG_MB behind, writes on the old
+#     db are fenced (new sessions are read only, open ones are disconnected),
+#     the last changes are applied and the sequences are set
+#  4. the subscription, slot and publication are dropped, and the dbs can be
+#     swapped
+#
+# The old db needs wal_level = logical (rds.logical_replication = 1 in its
+# parameter group, then a reboot) and the new db has to reach it on the db
+# port. Schema changes are not replicated, don't run any during a migration.
+import logging
+import time
+from os import getenv
+
+import psycopg
+from psycopg import sql
+
+# Writes are fenced once the new db is less than this far behind
+CATCH_UP_LAG_MB = float(getenv("CATCH_UP_LAG_MB", 16))
+# How long to wait for the new db to catch up, before and after the fence
+CATCH_UP_TIMEOUT = int(getenv("CATCH_UP_TIMEOUT", 3600))
+FENCE_TIMEOUT = int(getenv("FENCE_TIMEOUT", 120))
+
+NAME = "pgcopy_migration"
+
+
+class Replication:
+    def __init__(self, source, target, name=NAME):
+        self.source = source
+        self.target = target
+        self.name = name
+        self.slot_conn = None
+
+    def connect_source(self):
+        # Our own sessions still write once the old db is fenced
+        return psycopg.connect(
+            self.source, autocommit=True, options="-c default_transaction_read_only=off"
+        )
+
+    def supported(self):
+        with psycopg.connect(self.source) as conn:
+            return conn.execute("SHOW wal_level").fetchone()[0] == "logical"
+
+    def publish(self):
+        with self.connect_source() as src:
+            # UPDATEs and DELETEs of a published table without a primary key
+            # fail unless the table has a replica identity
+            tables = src.execute("""
+                SELECT c.oid::regclass::text FROM pg_class c
+                JOIN pg_namespace n ON n.oid = c.relnamespace
+                WHERE c.relkind = 'r' AND c.relreplident = 'd'
+                  AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+                  AND NOT EXISTS (SELECT 1 FROM pg_index i WHERE i.indrelid = c.oid AND i.indisprimary)
+            """).fetchall()
+            for (table,) in tables:
+                logging.info(f"{table} has no primary key, setting REPLICA IDENTITY FULL")
+                src.execute(sql.SQL("ALTER TABLE {} REPLICA IDENTITY FULL").format(sql.SQL(table)))
+            if not src.execute("SELECT 1 FROM pg_publication WHERE pubname = %s", (self.name,)).fetchone():
+                src.execute(sql.SQL("CREATE PUBLICATION {} FOR ALL TABLES").format(sql.Identifier(self.name)))
+
+    def create_slot(self):
+        """Create the replication slot, returns the snapshot it starts at
+
+        The snapshot can be used until release_snapshot() is called.
+        """
+        # The slot decodes changes with the catalog as of its start, so the
+        # publication has to exist before it
+        self.publish()
+        self.drop_slot()
+        self.slot_conn = psycopg.connect(self.source, replication="database", autocommit=True)
+        # Replication commands only work with the simple query protocol
+        result = self.slot_conn.pgconn.exec_(
+            f"CREATE_REPLICATION_SLOT {self.name} LOGICAL pgoutput EXPORT_SNAPSHOT".encode()
+        )
+        if result.status != psycopg.pq.ExecStatus.TUPLES_OK:
+            raise RuntimeError(f"Creating the replication slot failed: {result.error_message.decode()}")
+        logging.info(f"Created replication slot {self.name} at {result.get_value(0, 1).decode()}")
+        return result.get_value(0, 2).decode()
+
+    def release_snapshot(self):
+        if self.slot_conn is not None:
+            self.slot_conn.close()
+            self.slot_conn = None
+
+    def drop_slot(self):
+        with self.connect_source() as conn:
+            conn.execute(
+                "SELECT pg_drop_replication_slot(slot_name) FROM pg_replication_slots "
+                "WHERE slot_name = %s",
+                (self.name,),
+            )
+
+    def subscribe(self):
+        """Start streaming the changes in the slot to the new db"""
+        with psycopg.connect(self.target, autocommit=True) as tgt:
+            if tgt.execute("SELECT 1 FROM pg_subscription WHERE subname = %s", (self.name,)).fetchone():
+                return
+            tgt.execute(sql.SQL(
+                "CREATE SUBSCRIPTION {} CONNECTION {} PUBLICATION {} "
+                "WITH (create_slot = false, slot_name = {}, copy_data = false)"
+            ).format(
+                sql.Identifier(self.name), sql.Literal(self.source),
+                sql.Identifier(self.name), sql.Literal(self.name),
+            ))
+        logging.info(f"Subscribed the new db to {self.name}")
+
+    def lag(self, conn):
+        """Bytes of WAL the new db has not applied yet"""
+        return conn.execute(
+            "SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), confirmed_flush_lsn) "
+            "FROM pg_replication_slots WHERE slot_name = %s",
+            (self.name,),
+        ).fetchone()[0]
+
+    def wait_for_lag(self, max_bytes, timeout):
+        deadline = time.time() + timeout
+        with self.connect_source() as conn:
+            while True:
+                lag = self.lag(conn)
+                if lag <= max_bytes:
+                    return lag
+                if time.time() > deadline:
+                    raise TimeoutError(f"The new db is still {lag / 1024**2:.1f} MB behind")
+                logging.info(f"The new db is {lag / 1024**2:.1f} MB behind")
+                time.sleep(min(10, max(1, deadline - time.time())))
+
+    def fence_writes(self):
+        """Make the old db read only, returns the WAL position of the last write"""
+        with self.connect_source() as conn:
+            conn.execute(sql.SQL("ALTER DATABASE {} SET default_transaction_read_only = on").format(
+                sql.Identifier(conn.info.dbname)
+            ))
+            # Sessions opened before the ALTER can still write, disconnect them
+            terminated = conn.execute("""
+                SELECT count(pg_terminate_backend(pid)) FROM pg_stat_activity
+                WHERE datname = current_database() AND pid <> pg_backend_pid()
+                  AND backend_type = 'client backend'
+            """).fetchone()[0]
+            logging.info(f"Writes to the old db are fenced, {terminated} sessions disconnected")
+            return conn.execute("SELECT pg_current_wal_lsn()").fetchone()[0]
+
+    def unfence_writes(self):
+        with self.connect_source() as conn:
+            conn.execute(sql.SQL("ALTER DATABASE {} RESET default_transaction_read_only").format(
+                sql.Identifier(conn.info.dbname)
+            ))
+        logging.info("Writes to the old db are allowed again")
+
+    def wait_for_lsn(self, lsn, timeout):
+        """Wait until the new db has applied every change up to `lsn`"""
+        deadline = time.time() + timeout
+        with self.connect_source() as conn:
+            while True:
+                applied = conn.execute(
+                    "SELECT confirmed_flush_lsn >= %s::pg_lsn FROM pg_replication_slots "
+                    "WHERE slot_name = %s",
+                    (lsn, self.name),
+                ).fetchone()[0]
+                if applied:
+                    return
+                if time.time() > deadline:
+                    raise TimeoutError(f"The new db did not reach {lsn} in {timeout}s")
+                time.sleep(0.5)
+
+    def drop(self):
+        """Remove the subscription, the slot and the publication"""
+        with psycopg.connect(self.target, autocommit=True) as tgt:
+            if tgt.execute("SELECT 1 FROM pg_subscription WHERE subname = %s", (self.name,)).fetchone():
+                name = sql.Identifier(self.name)
+                # Detach the slot first, it is dropped from the old db below
+                tgt.execute(sql.SQL("ALTER SUBSCRIPTION {} DISABLE").format(name))
+                tgt.execute(sql.SQL("ALTER SUBSCRIPTION {} SET (slot_name = NONE)").format(name))
+                tgt.execute(sql.SQL("DROP SUBSCRIPTION {}").format(name))
+            # pg_dump copied the publication along with the schema
+            tgt.execute(sql.SQL("DROP PUBLICATION IF EXISTS {}").format(sql.Identifier(self.name)))
+        self.drop_slot()
+        with self.connect_source() as src:
+            src.execute(sql.SQL("DROP PUBLICATION IF EXISTS {}").format(sql.Identifier(self.name)))
+
+
+def catch_up(replication, copy_sequences, journal=None, before_fence=None):
+    """Bring the new db level with the old one and leave the old one read only
+
+    `before_fence` is called once the new db is nearly caught up, while the
+    old db still takes writes (e.g. a first validation pass); its result is
+    returned.
+    """
+    result = None
+    if journal is None or not journal.done("writes_fenced"):
+        lag = replication.wait_for_lag(CATCH_UP_LAG_MB * 1024**2, CATCH_UP_TIMEOUT)
+        if before_fence:
+            result = before_fence()
+            # The new db may have fallen behind again in the meantime
+            lag = replication.wait_for_lag(CATCH_UP_LAG_MB * 1024**2, CATCH_UP_TIMEOUT)
+        logging.info(f"The new db is {lag / 1024**2:.1f} MB behind, fencing writes")
+        lsn = replication.fence_writes()
+        if journal:
+            journal.mark("writes_fenced", lsn=lsn)
+    else:
+        lsn = journal.get("writes_fenced")["lsn"]
+
+    start = time.time()
+    try:
+        replication.wait_for_lsn(lsn, FENCE_TIMEOUT)
+    except TimeoutError:
+        replication.unfence_writes()
+        if journal:
+            journal.unmark("writes_fenced")
+        raise
+    # Sequences are not replicated
+    copy_sequences(replication.source, replication.target)
+    replication.drop()
+    logging.info(f"The new db caught up {time.time() - start:.1f}s after the fence")
+    if journal:
+        journal.mark("caught_up")
+    return result
@@ -22,8 +22,9 @@ echo "Docker login to ${AWS_ECR}"
 echo ${ECR_TOKEN} | $docker login --username AWS --password-stdin "${AWS_ECR}"
 
 echo "Building Image"
-echo "docker build --platform=linux/amd64 -t \"${REPO_URL}:${IMAGE_TAG}\" ."
-docker build --quiet --platform=linux/amd64 -t "${REPO_URL}:${IMAGE_TAG}" .
+# the shared modules (pgcopy.py, ...) are in ../../common, outside the image directory
+echo "docker build --platform=linux/amd64 --build-context common=../../common -t \"${REPO_URL}:${IMAGE_TAG}\" ."
+docker build --quiet --platform=linux/amd64 --build-context common=../../common -t "${REPO_URL}:${IMAGE_TAG}" .
 echo "Pushing Image to ${AWS_ECR}"
 echo "docker push \"${REPO_URL}:${IMAGE_TAG}\""
 docker push --quiet "${REPO_URL}:${IMAGE_TAG}"
\ No newline at end of file
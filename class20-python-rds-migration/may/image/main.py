@@ -1,17 +1,23 @@
-import subprocess
 import boto3
 import logging
-import psycopg2
-from psycopg2 import OperationalError
-import time
 import argparse
 import sys
 from os import getenv
 from botocore.exceptions import ClientError
-import signal
-from typing import Tuple, Union
+from typing import Tuple
 from datetime import datetime, timedelta
 import math
+from pathlib import Path
+
+# pgcopy.py, journal.py, replication.py, validate.py and readiness.py are in
+# class20-python-rds-migration/common; the image build copies them next to
+# main.py, this finds them when running from the repo
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent / "common"))
+from journal import JOURNAL_DIR, MigrationJournal
+from pgcopy import COPY_WORKERS, copy_database, copy_sequences
+from readiness import instance_status, wait_for_connection, wait_for_instance, wait_for_rename
+from replication import Replication, catch_up
+from validate import Validator, log_report, write_report
 
 
 # Define type aliases
@@ -135,68 +141,34 @@ def duplicate_rds(db_link: str, new_allocated_storage: int) -> dict:
     return response
 
 
-def sync_dbs(old_db: str, new_db: str) -> bytes:
-    # Create pgsync configuration with source and destination db details
-    logging.info("Creating .pgsync.yml with source and destination db links")
-    with open(".pgsync.yml", "w") as f:
-        f.write(f"from: {old_db}\n")
-        f.write(f"to: {new_db}\n")
-        f.write("to_safe: true\n")
-    # pgsync
+def sync_dbs(
+    old_db: str,
+    new_db: str,
+    journal: MigrationJournal = None,
+    replication: Replication = None,
+) -> int:
+    # Schema first, then the data of all schemas with parallel COPY streams
     logging.info("Syncing DB's")
     try:
-        process = subprocess.Popen(
-            ["pgsync", "--schema-first", "--all-schemas"],
-            stdout=subprocess.PIPE,
+        rows = copy_database(
+            old_db, new_db, workers=COPY_WORKERS, journal=journal, replication=replication
         )
-        output = process.communicate()[0]
-        if int(process.returncode) != 0:
-            logging.error(f"Command failed. Return code : {process.returncode}")
-        else:
-            logging.info("Sync completed ")
-        return output
+        logging.info("Sync completed ")
+        return rows
     except Exception as e:
         logging.error(f"Issue with db sync -> {e}")
         exit(1)
 
 
-def timeout_handler(signum: int, frame) -> None:
-    raise TimeoutError("Timed out after as RDS is not ready to take connection")
-
-
-def check_rds_availability(
-    host: str, port: str, dbname: str, user: str, password: str
-) -> Union[bool, None]:
-    # Set a timeout for the function
-    signal.signal(signal.SIGALRM, timeout_handler)
-    signal.alarm(600)  # 10 minutes in seconds
-
-    while True:
-        try:
-            # Attempt to establish a connection to the RDS database
-            conn = psycopg2.connect(
-                host=host, port=port, dbname=dbname, user=user, password=password
-            )
-            conn.close()
-            logging.info(f"Connection established successfully with {host}.")
-            time.sleep(90)
-            return True
-
-        except OperationalError:
-            # If an OperationalError occurs (e.g., connection error), print the error
-            logging.error(
-                f"Error connecting to the RDS database {host}: Not ready to take connection yet."
-            )
-            logging.info("Retrying in 90 seconds...")
-            time.sleep(90)
-
-        except TimeoutError as e:
-            logging.error(e)
-            return False  # Indicate failure due to timeout
-
-        finally:
-            # Reset the alarm
-            signal.alarm(0)
+def check_rds_availability(dbinstance: str, db_link: str) -> None:
+    # Carries on as soon as the instance is available and takes connections,
+    # see readiness.py
+    try:
+        wait_for_instance(rds, dbinstance)
+        wait_for_connection(db_link)
+    except TimeoutError as e:
+        logging.error(e)
+        exit(1)
 
 
 def rename_rds(old: str, new: str) -> dict:
@@ -210,12 +182,27 @@ def rename_rds(old: str, new: str) -> dict:
         exit(1)
 
 
-def swap_db(old: str, new: str) -> None:
-    logging.info(f"Renaming db: {old} -> {old}-old ")
-    rename_rds(old, f"{old}-old")
-    time.sleep(300)  # Adding time delay to wait for db renaming
-    logging.info(f"Renaming db: {new} - > {old}")
-    rename_rds(new, old)
+def swap_db(old: str, new: str, journal: MigrationJournal) -> None:
+    if not journal.done("old_renamed"):
+        logging.info(f"Renaming db: {old} -> {old}-old ")
+        rename_rds(old, f"{old}-old")
+        journal.mark("old_renamed")
+    # The waits give up after READY_TIMEOUT, a rerun resumes from the journal
+    try:
+        if not journal.done("new_renamed"):
+            # A rerun after the rename was issued finds the new db gone (it is
+            # being renamed to the old identifier) and only waits for it
+            if instance_status(rds, new) is not None:
+                # The old identifier can only be reused once the rename is done
+                wait_for_rename(rds, old, f"{old}-old")
+                logging.info(f"Renaming db: {new} - > {old}")
+                rename_rds(new, old)
+            journal.mark("new_renamed")
+        wait_for_rename(rds, new, old)
+    except TimeoutError as e:
+        logging.error(e)
+        exit(1)
+    journal.mark("swapped")
 
 
 def stop_rds(dbinstance: str) -> None:
@@ -365,44 +352,119 @@ def evaluate_db_storage(dbinstance):
     return math.ceil(new_allocated_storage)
 
 
+def catch_up_replication(old_db: str, new_db: str, journal: MigrationJournal) -> Replication:
+    # Logical replication brings over the writes made during the copy,
+    # without it they are lost (see replication.py)
+    replication = Replication(old_db, new_db)
+    if journal.done("replicating"):
+        return replication
+    if getenv("CATCH_UP", "true").lower() != "true":
+        return None
+    if not replication.supported():
+        logging.warning(
+            "wal_level is not logical on the old db, writes made during the copy "
+            "will not be on the new db (set rds.logical_replication = 1)"
+        )
+        return None
+    return replication
+
+
+def validate_dbs(validator: Validator, dbinstance: str, chunks: list = None) -> bool:
+    # Checksums every chunk of every table on both dbs (see validate.py), or
+    # only `chunks`, those that differed before the writes were fenced
+    if getenv("VALIDATE", "true").lower() != "true":
+        logging.warning("Skipping the validation of the new db")
+        return True
+    report = validator.validate(chunks)
+    log_report(report)
+    write_report(report, f"{JOURNAL_DIR}/{dbinstance}.validation.json")
+    return report["ok"]
+
+
 def migrate_rds(db_link: str) -> None:
     dbinstance, db, user, password, port = get_db_details(db_link)
-    size = evaluate_db_storage(dbinstance)
-    source_rds_data = source_rds_instance(dbinstance)
+    # Rerunning a failed migration resumes it from the last finished step,
+    # set JOURNAL_DIR to a volume that outlives the task (e.g. EFS)
+    journal = MigrationJournal.for_instance(dbinstance)
     from_sg = getenv("SG_ID")
-    to_sg = [
-        items["VpcSecurityGroupId"] for items in source_rds_data["VpcSecurityGroups"]
-    ][0]
-
-    allow_sgs(from_sg, to_sg, int(port))
-    logging.info(f" Creating the duplicte rds of {dbinstance}")
-
-    logging.info(
-        f"Duplicating the RDS instance {dbinstance} with {size} GB storage. \
-        Existing storage -> {source_rds_instance(dbinstance)['AllocatedStorage']}"
-    )
-    new_rds_DBInstanceIdentifier = duplicate_rds(db_link, size)["DBInstance"][
-        "DBInstanceIdentifier"
-    ]
 
-    logging.info(f"Creating {new_rds_DBInstanceIdentifier}")
-    old_db_endpoint = source_rds_data["Endpoint"]["Address"]
+    if journal.done("instance_created"):
+        new_rds_DBInstanceIdentifier = journal.get("instance_created")["identifier"]
+        old_db_endpoint = journal.get("instance_created")["old_endpoint"]
+        to_sg = journal.get("instance_created")["security_group"]
+        logging.info(f"{new_rds_DBInstanceIdentifier} is already created")
+        allow_sgs(from_sg, to_sg, int(port))
+    else:
+        size = evaluate_db_storage(dbinstance)
+        source_rds_data = source_rds_instance(dbinstance)
+        to_sg = [
+            items["VpcSecurityGroupId"] for items in source_rds_data["VpcSecurityGroups"]
+        ][0]
+
+        allow_sgs(from_sg, to_sg, int(port))
+        logging.info(f" Creating the duplicte rds of {dbinstance}")
+
+        logging.info(
+            f"Duplicating the RDS instance {dbinstance} with {size} GB storage. \
+            Existing storage -> {source_rds_data['AllocatedStorage']}"
+        )
+        new_rds_DBInstanceIdentifier = duplicate_rds(db_link, size)["DBInstance"][
+            "DBInstanceIdentifier"
+        ]
+
+        logging.info(f"Creating {new_rds_DBInstanceIdentifier}")
+        old_db_endpoint = source_rds_data["Endpoint"]["Address"]
+        journal.mark(
+            "instance_created",
+            identifier=new_rds_DBInstanceIdentifier,
+            old_endpoint=old_db_endpoint,
+            security_group=to_sg,
+        )
     new_db_endpoint = (
         new_rds_DBInstanceIdentifier + "." + ".".join(old_db_endpoint.split(".")[1:])
     )
-    check_rds_availability(new_db_endpoint, port, db, user, password)
 
-    # DB sync
-    source_db_link = f"postgresql://{user}:{password}@{old_db_endpoint}:{port}/{db}"
-    destination_db_link = (
-        f"postgresql://{user}:{password}@{new_db_endpoint}:{port}/{db}"
-    )
-    sync_dbs(source_db_link, destination_db_link)
-    logging.info("Swapping dbs")
-    swap_db(dbinstance, new_rds_DBInstanceIdentifier)
+    if not journal.done("validated"):
+        source_db_link = f"postgresql://{user}:{password}@{old_db_endpoint}:{port}/{db}"
+        destination_db_link = (
+            f"postgresql://{user}:{password}@{new_db_endpoint}:{port}/{db}"
+        )
+        check_rds_availability(new_rds_DBInstanceIdentifier, destination_db_link)
+
+        # DB sync
+        replication = catch_up_replication(source_db_link, destination_db_link, journal)
+        sync_dbs(source_db_link, destination_db_link, journal, replication)
+        validator = Validator(source_db_link, destination_db_link)
+        suspects = None
+        if replication and not journal.done("caught_up"):
+            # The full pass runs before the fence, only the chunks that
+            # differed then are checked again while writes are fenced
+            try:
+                suspects = catch_up(replication, copy_sequences, journal,
+                                    before_fence=validator.mismatched)
+            except TimeoutError as e:
+                logging.error(f"The new db did not catch up with the old one: {e}")
+                exit(1)
+        if not validate_dbs(validator, dbinstance, suspects):
+            logging.error(
+                "The new db doesn't match the old one, not swapping. "
+                "Run migrate again to copy the data again from scratch"
+            )
+            # Once writes are allowed again the new db falls behind for good
+            journal.restart_copy()
+            if replication:
+                replication.unfence_writes()
+            exit(1)
+        journal.mark("validated")
+
+    if not journal.done("swapped"):
+        logging.info("Swapping dbs")
+        swap_db(dbinstance, new_rds_DBInstanceIdentifier, journal)
     logging.info(f"Stopping the {dbinstance}-old")
     stop_rds(f"{dbinstance}-old")
+    journal.mark("old_stopped")
     revoke_sgs(from_sg, to_sg, int(port))
+    journal.finish()
 
 
 def run() -> None:
@@ -1,11 +1,14 @@
 # Modified app.py with Prometheus metrics support
 
-from flask import Flask, jsonify, render_template, request, g
+from flask import Flask, Response, jsonify, render_template, request, g
 from datetime import datetime
 import socket
 import os
 import json
+import select
+import threading
 import psycopg2
+import psycopg2.pool
 import time
 
 # ============================================================================
@@ -90,24 +93,154 @@ def load_config():
     config_data["db_user"] = os.getenv("DB_USER", config_data.get("db_user", "devops"))
     config_data["db_password"] = os.getenv("DB_PASSWORD", config_data.get("db_password", "devops"))
 
+    # Connection pool size and how often the product index is reloaded
+    config_data["db_pool_min"] = int(os.getenv("DB_POOL_MIN", config_data.get("db_pool_min", 1)))
+    config_data["db_pool_max"] = int(os.getenv("DB_POOL_MAX", config_data.get("db_pool_max", 4)))
+    config_data["products_refresh_seconds"] = float(
+        os.getenv("PRODUCTS_REFRESH_SECONDS", config_data.get("products_refresh_seconds", 30)))
+
     return config_data
 
 config_data = load_config()
 
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(
-            host=config_data.get("db_host"),
-            database=config_data.get("db_name"),
-            user=config_data.get("db_user"),
-            password=config_data.get("db_password")
-        )
-        db_connection_status.set(1)
+# ============================================================================
+# Database Access
+# ============================================================================
+PRODUCT_COLUMNS = ('id', 'description', 'image_url', 'name')
+PRODUCTS_CHANNEL = 'products_changed'
+
+def db_connection_args():
+    return dict(
+        host=config_data.get("db_host"),
+        database=config_data.get("db_name"),
+        user=config_data.get("db_user"),
+        password=config_data.get("db_password"),
+        # Give up quickly when the DB is slow, the last data keeps being served
+        connect_timeout=3,
+        options='-c statement_timeout=5000'
+    )
+
+class ProductPool(psycopg2.pool.ThreadedConnectionPool):
+    """Connection pool whose connections have the product query prepared"""
+
+    def _connect(self, key=None):
+        conn = super()._connect(key)
+        with conn.cursor() as cur:
+            cur.execute('PREPARE select_products AS '
+                        'SELECT id, description, image_url, name FROM products ORDER BY id')
+        conn.commit()
         return conn
+
+db_pool = None
+
+def get_db_pool():
+    # The pool opens db_pool_min connections up front
+    global db_pool
+    if db_pool is None:
+        db_pool = ProductPool(config_data["db_pool_min"], config_data["db_pool_max"],
+                              **db_connection_args())
+    return db_pool
+
+def fetch_db_products():
+    try:
+        pool = get_db_pool()
+        conn = pool.getconn()
+    except Exception as e:
+        db_connection_status.set(0)
+        raise e
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute('EXECUTE select_products')
+            rows = cur.fetchall()
+        conn.commit()
     except Exception as e:
         db_connection_status.set(0)
+        pool.putconn(conn, close=True)
         raise e
 
+    pool.putconn(conn)
+    db_connection_status.set(1)
+    return [dict(zip(PRODUCT_COLUMNS, row)) for row in rows]
+
+# ============================================================================
+# Product Index
+# ============================================================================
+def encode_json(data):
+    # Same output as jsonify()
+    return (app.json.dumps(data) + "\n").encode('utf-8')
+
+class ProductIndex:
+    """All products and each product by id, with their JSON already encoded.
+
+    A refresh builds a new snapshot and swaps it in with one assignment, so
+    requests never wait for the database or see a half-built index.
+    """
+
+    def __init__(self, items):
+        self.set(items)
+
+    def set(self, items):
+        by_id = {int(item['id']): encode_json(item) for item in items}
+        self.snapshot = (encode_json(items), by_id)
+        products_total.set(len(items))
+
+    def all_json(self):
+        return self.snapshot[0]
+
+    def get_json(self, product_id):
+        return self.snapshot[1].get(product_id)
+
+class ProductRefresher(threading.Thread):
+    """Reloads the product index from the DB every products_refresh_seconds,
+    and right away when the products table sends a NOTIFY (see db.create.py).
+
+    When the DB is down or slow the index keeps its last products.
+    """
+
+    def __init__(self, index):
+        super().__init__(daemon=True, name='product-refresher')
+        self.index = index
+        self.interval = config_data["products_refresh_seconds"]
+        self.listener = None
+
+    def refresh(self):
+        try:
+            self.index.set(fetch_db_products())
+            return True
+        except Exception as e:
+            app.logger.error(f"Database error: {str(e)}")
+            app.logger.info("Keeping the current product data")
+            return False
+
+    def listen(self):
+        if self.listener is None:
+            conn = psycopg2.connect(**db_connection_args())
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                cur.execute(f'LISTEN {PRODUCTS_CHANNEL};')
+            self.listener = conn
+        return self.listener
+
+    def wait(self, timeout):
+        """Sleep until a change notification or the timeout"""
+        try:
+            listener = self.listen()
+            if select.select([listener], [], [], timeout)[0]:
+                listener.poll()
+                listener.notifies.clear()
+        except Exception as e:
+            app.logger.error(f"Product change listener error: {str(e)}")
+            if self.listener is not None:
+                self.listener.close()
+                self.listener = None
+            time.sleep(timeout)
+
+    def run(self):
+        while True:
+            self.wait(self.interval)
+            self.refresh()
+
 # ============================================================================
 # Metrics Middleware
 # ============================================================================
@@ -164,30 +297,13 @@ def home():
 
 @app.route('/api/products', methods=['GET'])
 def get_products():
-    if (config_data.get("data_source") == "db"):
-        try:
-            conn = get_db_connection()
-            cur = conn.cursor()
-            cur.execute('SELECT * FROM products;')
-            db_products = cur.fetchall()
-            products_dict = [{'id': curr_product[0], 'description': curr_product[1], 'image_url': curr_product[2], 'name': curr_product[3]} for curr_product in db_products]
-            products_total.set(len(products_dict))
-            cur.close()
-            conn.close()
-            return jsonify(products_dict), 200
-        except Exception as e:
-            app.logger.error(f"Database error: {str(e)}")
-            # Fallback to JSON in case of DB errors
-            app.logger.info("Falling back to JSON data source")
-            return jsonify(products), 200
-    else:
-        return jsonify(products), 200
+    return Response(product_index.all_json(), 200, mimetype='application/json')
 
 @app.route('/api/products/<int:product_id>', methods=['GET'])
 def get_product(product_id):
-    product = next((product for product in products if product['id'] == product_id), None)
+    product = product_index.get_json(product_id)
     if product is not None:
-        return jsonify(product)
+        return Response(product, 200, mimetype='application/json')
     else:
         return jsonify({'message': 'Product not found'}), 404
 
@@ -208,5 +324,15 @@ def get_system_info():
         "db_host": config_data.get("db_host", "N/A") if config_data.get("data_source") == "db" else "N/A"
     }
 
+# Products come from products.json until (and whenever) the DB can't be read
+product_index = ProductIndex(products)
+
+if config_data.get("data_source") == "db":
+    # Load the DB products before serving, then keep them fresh in the background
+    product_refresher = ProductRefresher(product_index)
+    if not product_refresher.refresh():
+        app.logger.info("Falling back to JSON data source")
+    product_refresher.start()
+
 if __name__ == "__main__":
     app.run(debug=True)
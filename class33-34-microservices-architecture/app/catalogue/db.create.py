@@ -51,6 +51,13 @@ cur.execute('INSERT INTO products (description, image_url, name)'
              'Origami Butterfly (DB)')
             )
 
+# Tell the catalogue service to reload its product index on every change
+cur.execute('CREATE OR REPLACE FUNCTION notify_products_changed() RETURNS trigger AS $$'
+            ' BEGIN PERFORM pg_notify(\'products_changed\', \'\'); RETURN NULL; END'
+            ' $$ LANGUAGE plpgsql;')
+cur.execute('CREATE TRIGGER products_changed AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE'
+            ' ON products FOR EACH STATEMENT EXECUTE FUNCTION notify_products_changed();')
+
 conn.commit()
 cur.close()
 conn.close()
@@ -1,5 +1,5 @@
 import unittest
-from app import app  # assuming your Flask app is named app.py and has an app object
+from app import app, product_index, products  # assuming your Flask app is named app.py and has an app object
 import logging
 
 logging.basicConfig(level=logging.INFO)
@@ -35,5 +35,33 @@ class FlaskTest(unittest.TestCase):
         self.assertTrue(b'name' in response.data)
         self.assertTrue(b'image_url' in response.data)
 
+    # Ensure that a single product is served by id
+    def test_product_by_id(self):
+        logging.info("TEST-05: Checking if a single product is returned by id...")
+        tester = app.test_client(self)
+        response = tester.get('/api/products/1', content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['name'], products[0]['name'])
+
+    # Ensure that an unknown product id returns 404
+    def test_product_not_found(self):
+        logging.info("TEST-06: Checking that an unknown product returns 404...")
+        tester = app.test_client(self)
+        response = tester.get('/api/products/9999', content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    # Ensure that both endpoints serve the refreshed index
+    def test_product_index_refresh(self):
+        logging.info("TEST-07: Checking that a refreshed product index is served...")
+        tester = app.test_client(self)
+        refreshed = [{'id': 7, 'name': 'Origami Swan (DB)', 'description': 'A swan', 'image_url': '/static/swan.png'}]
+        try:
+            product_index.set(refreshed)
+            self.assertEqual(tester.get('/api/products').get_json(), refreshed)
+            self.assertEqual(tester.get('/api/products/7').get_json(), refreshed[0])
+            self.assertEqual(tester.get('/api/products/1').status_code, 404)
+        finally:
+            product_index.set(products)
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,11 +1,13 @@
 #!/usr/bin/env python3
 import os
 import time
-import json
 import boto3
-from datetime import datetime, timedelta
-import threading
-from collections import defaultdict
+from datetime import datetime
+from alert_window import AlertAggregator
+from email_queue import EmailQueue, send_rate_quota
+from log_follower import LogFollower
+
+CRITICAL_ALERT_TYPES = ['Container Down', 'Application Unhealthy']
 
 class AlertService:
     def __init__(self):
@@ -14,7 +16,9 @@ class AlertService:
             'ses',
             region_name=os.getenv('AWS_REGION', 'us-east-1'),
             aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+            # Point at a local SES stand-in (e.g. moto_server) for testing
+            endpoint_url=os.getenv('SES_ENDPOINT_URL') or None
         )
         
         # Email configuration
@@ -27,39 +31,37 @@ class AlertService:
         # State directory for writable files
         self.state_dir = '/app/state'
         os.makedirs(self.state_dir, exist_ok=True)
-        self.processed_alerts_file = os.path.join(self.state_dir, 'processed_alerts.json')
+        self.cursor_file = os.path.join(self.state_dir, 'alert_log_cursor.json')
         
         self.check_interval = int(os.getenv('CHECK_INTERVAL', '30'))  # seconds
         
         # Rate limiting
         self.alert_cooldown = int(os.getenv('ALERT_COOLDOWN', '300'))  # 5 minutes
-        self.last_alert_times = defaultdict(lambda: datetime.min)
-        self.alert_counts = defaultdict(int)
         
         # Alert aggregation
-        self.alert_buffer = defaultdict(list)
         self.buffer_timeout = int(os.getenv('BUFFER_TIMEOUT', '60'))  # seconds
         
-        # Load processed alerts
-        self.processed_alerts = self.load_processed_alerts()
-    
-    def load_processed_alerts(self):
-        """Load already processed alerts to avoid duplicates"""
-        if os.path.exists(self.processed_alerts_file):
-            try:
-                with open(self.processed_alerts_file, 'r') as f:
-                    return set(json.load(f))
-            except:
-                return set()
-        return set()
-    
-    def save_processed_alerts(self):
-        """Save processed alerts to file"""
-        try:
-            with open(self.processed_alerts_file, 'w') as f:
-                json.dump(list(self.processed_alerts), f)
-        except Exception as e:
-            print(f"Warning: Could not save processed alerts: {e}")
+        # Buffers, cooldowns and hourly counts, kept across restarts
+        self.aggregator = AlertAggregator(
+            os.path.join(self.state_dir, 'alert_state.json'),
+            cooldown=self.alert_cooldown,
+            buffer_timeout=self.buffer_timeout,
+            critical_types=CRITICAL_ALERT_TYPES
+        )
+        
+        # Follow the log from the saved offset instead of re-reading it
+        self.follower = LogFollower(self.alert_log, self.cursor_file)
+        
+        # Emails are sent by background workers, paced to the SES quota
+        send_rate = float(os.getenv('SES_MAX_SEND_RATE', '0')) or \
+            send_rate_quota(self.ses_client, default=1.0)
+        self.email_queue = EmailQueue(
+            self.ses_client,
+            self.sender_email,
+            os.path.join(self.state_dir, 'outbox'),
+            workers=int(os.getenv('EMAIL_WORKERS', '2')),
+            send_rate=send_rate
+        )
     
     def parse_alert_line(self, line):
         """Parse alert line from log file"""
@@ -87,17 +89,7 @@ class AlertService:
             print(f"Error parsing alert line: {e}")
             return None
     
-    def should_send_alert(self, alert_type):
-        """Check if alert should be sent based on rate limiting"""
-        now = datetime.now()
-        last_sent = self.last_alert_times[alert_type]
-        
-        if (now - last_sent).total_seconds() < self.alert_cooldown:
-            return False
-        
-        return True
-    
-    def format_email_body(self, alerts):
+    def format_email_body(self, batches):
         """Format email body with alert details"""
         body = f"""
 Container Monitoring Alert Summary
@@ -110,17 +102,13 @@ Alerts Detected:
 ---------------
 """
         
-        # Group alerts by type
-        alerts_by_type = defaultdict(list)
-        for alert in alerts:
-            alerts_by_type[alert['alert_type']].append(alert)
-        
-        for alert_type, type_alerts in alerts_by_type.items():
-            body += f"\n{alert_type} ({len(type_alerts)} occurrences):\n"
-            for alert in type_alerts[-5:]:  # Show last 5 of each type
+        # One batch per alert type, holding its last 5 alerts
+        for batch in batches:
+            body += f"\n{batch.alert_type} ({batch.count} occurrences):\n"
+            for alert in batch.recent:
                 body += f"  - [{alert['timestamp']}] {alert['message']}\n"
-            if len(type_alerts) > 5:
-                body += f"  ... and {len(type_alerts) - 5} more\n"
+            if batch.count > len(batch.recent):
+                body += f"  ... and {batch.count - len(batch.recent)} more\n"
         
         body += f"""
 Action Required:
@@ -133,131 +121,89 @@ Application: http://localhost:8080
 Alert Frequency:
 ---------------
 """
-        for alert_type, count in self.alert_counts.items():
+        for alert_type, count in self.aggregator.counts().items():
             body += f"  - {alert_type}: {count} alerts in last hour\n"
         
         return body
     
-    def send_email(self, subject, body):
-        """Send email using AWS SES"""
+    def send_email(self, subject, body, critical=False):
+        """Queue an email for sending through AWS SES"""
         try:
-            response = self.ses_client.send_email(
-                Source=self.sender_email,
-                Destination={
-                    'ToAddresses': self.recipient_emails
-                },
-                Message={
-                    'Subject': {
-                        'Data': subject,
-                        'Charset': 'UTF-8'
-                    },
-                    'Body': {
-                        'Text': {
-                            'Data': body,
-                            'Charset': 'UTF-8'
-                        }
-                    }
-                }
-            )
-            print(f"Email sent successfully: {response['MessageId']}")
+            email_id = self.email_queue.enqueue(self.recipient_emails, subject, body, critical)
+            print(f"Email queued: {email_id}")
             return True
         except Exception as e:
-            print(f"Error sending email: {e}")
+            print(f"Error queueing email: {e}")
             return False
     
     def process_alerts(self):
-        """Process new alerts from log file"""
-        if not os.path.exists(self.alert_log):
-            return
-        
-        new_alerts = []
-        
+        """Process alerts appended to the log since the last call"""
         try:
-            with open(self.alert_log, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and line not in self.processed_alerts:
-                        alert = self.parse_alert_line(line)
-                        if alert:
-                            new_alerts.append(alert)
-                            self.processed_alerts.add(line)
-                            
-                            # Update alert counts
-                            self.alert_counts[alert['alert_type']] += 1
+            lines = self.follower.read_lines()
         except Exception as e:
             print(f"Error reading alert log: {e}")
             return
         
-        # Buffer alerts for aggregation
-        for alert in new_alerts:
-            self.alert_buffer[alert['alert_type']].append(alert)
+        # Buffer alerts for aggregation (this also updates the counts)
+        now = time.time()
+        for line in lines:
+            alert = self.parse_alert_line(line)
+            if alert:
+                self.aggregator.add(alert, now)
         
         # Check if we should send buffered alerts
-        self.check_and_send_buffered_alerts()
-        
-        # Save processed alerts
-        self.save_processed_alerts()
+        email = self.take_buffered_alerts()
+        
+        # Spool the email before saving the state that marks its alerts as
+        # sent: a crash in between re-sends them after the restart instead of
+        # losing them. The buffers are saved before moving the cursor past
+        # the lines in them
+        if email:
+            self.send_email(*email)
+        self.aggregator.save()
+        self.follower.save_cursor()
     
-    def check_and_send_buffered_alerts(self):
-        """Check and send buffered alerts"""
-        now = datetime.now()
-        alerts_to_send = []
+    def take_buffered_alerts(self):
+        """(subject, body, critical) of the buffered alerts due now, or None"""
+        # Types out of cooldown whose buffer timed out, filled up or is critical
+        batches = self.aggregator.due()
+        if not batches:
+            return None
         
-        for alert_type, alerts in list(self.alert_buffer.items()):
-            if not alerts:
-                continue
-            
-            # Check if we should send this alert type
-            if not self.should_send_alert(alert_type):
-                continue
-            
-            # Check if buffer timeout reached or critical alert
-            first_alert_time = datetime.strptime(alerts[0]['timestamp'], '%Y-%m-%d %H:%M:%S')
-            time_diff = (now - first_alert_time).total_seconds()
-            
-            if (time_diff >= self.buffer_timeout or 
-                alert_type in ['Container Down', 'Application Unhealthy'] or 
-                len(alerts) >= 5):
-                
-                alerts_to_send.extend(alerts)
-                self.last_alert_times[alert_type] = now
-                self.alert_buffer[alert_type] = []
+        # Determine email subject based on severity
+        critical_alerts = [b for b in batches if b.alert_type in CRITICAL_ALERT_TYPES]
+        if critical_alerts:
+            subject = f"🚨 CRITICAL: {os.getenv('CONTAINER_NAME', 'Container')} Alert"
+        else:
+            subject = f"⚠️ WARNING: {os.getenv('CONTAINER_NAME', 'Container')} Alert"
         
-        if alerts_to_send:
-            # Determine email subject based on severity
-            critical_alerts = [a for a in alerts_to_send if a['alert_type'] in ['Container Down', 'Application Unhealthy']]
-            if critical_alerts:
-                subject = f"🚨 CRITICAL: {os.getenv('CONTAINER_NAME', 'Container')} Alert"
-            else:
-                subject = f"⚠️ WARNING: {os.getenv('CONTAINER_NAME', 'Container')} Alert"
-            
-            body = self.format_email_body(alerts_to_send)
-            self.send_email(subject, body)
+        body = self.format_email_body(batches)
+        return subject, body, bool(critical_alerts)
     
     def cleanup_old_counts(self):
-        """Clean up old alert counts (keep last hour only)"""
-        one_hour_ago = datetime.now() - timedelta(hours=1)
-        # This is simplified - in production you'd track timestamps for each alert
-        # For now, we'll just reset counts periodically
-        if hasattr(self, 'last_cleanup') and (datetime.now() - self.last_cleanup).total_seconds() > 3600:
-            self.alert_counts.clear()
-            self.last_cleanup = datetime.now()
-        elif not hasattr(self, 'last_cleanup'):
-            self.last_cleanup = datetime.now()
+        """Drop alert types with nothing left in the last hour"""
+        # Counts expire minute by minute inside the sliding windows, this
+        # only forgets types that have gone quiet
+        self.aggregator.cleanup()
     
     def run(self):
         """Main service loop"""
         print(f"Alert Service started. Monitoring {self.alert_log}")
         print(f"Sending alerts to: {', '.join(self.recipient_emails)}")
         print(f"State directory: {self.state_dir}")
+        print(f"SES send rate: {self.email_queue.bucket.rate:g} emails/s")
         
+        self.email_queue.start()
         while True:
             try:
                 self.process_alerts()
                 self.cleanup_old_counts()
-                time.sleep(self.check_interval)
+                # Wakes as soon as the log is written to; the timeout still
+                # flushes buffered alerts when nothing new arrives
+                self.follower.wait(self.check_interval)
             except KeyboardInterrupt:
                 print("Alert service stopped")
+                self.email_queue.stop()
                 break
             except Exception as e:
                 print(f"Error in main loop: {e}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Time-windowed alert aggregation.
+
+Alert counts per type are kept in bucketed sliding windows (one slot per
+minute for the last hour by default), so adding an alert and reading the
+"alerts in last hour" figure are both O(1) amortized and the numbers are
+exact to one bucket. Buffered alerts keep only a count and the few most
+recent lines, so memory stays flat during an alert storm. Cooldowns,
+buffers and counters are saved to a small JSON file and survive restarts.
+"""
+import json
+import os
+import time
+from collections import deque
+
+WINDOW = 3600
+BUCKET = 60
+# Alerts kept per type for the email body; the rest are only counted
+RECENT_PER_TYPE = 5
+
+
+class SlidingWindowCounter:
+    """Number of events in the last `window` seconds, in `bucket`-second slots"""
+
+    def __init__(self, window=WINDOW, bucket=BUCKET):
+        self.bucket = bucket
+        self.slots = max(1, window // bucket)
+        self.counts = [0] * self.slots
+        self.total = 0
+        # Absolute bucket number (epoch // bucket) of the newest slot
+        self.current = None
+
+    def _advance(self, index):
+        if self.current is None:
+            self.current = index
+            return
+        if index <= self.current:
+            return
+        if index - self.current >= self.slots:
+            self.counts = [0] * self.slots
+            self.total = 0
+        else:
+            # Expire the slots that fell out of the window
+            for expired in range(self.current + 1, index + 1):
+                slot = expired % self.slots
+                self.total -= self.counts[slot]
+                self.counts[slot] = 0
+        self.current = index
+
+    def add(self, now, amount=1):
+        index = int(now // self.bucket)
+        self._advance(index)
+        # Late events still count if their bucket is inside the window
+        if index > self.current - self.slots:
+            self.counts[index % self.slots] += amount
+            self.total += amount
+
+    def count(self, now):
+        self._advance(int(now // self.bucket))
+        return self.total
+
+    def to_dict(self):
+        return {'current': self.current, 'counts': self.counts}
+
+    @classmethod
+    def from_dict(cls, data, window=WINDOW, bucket=BUCKET):
+        counter = cls(window, bucket)
+        counts = data.get('counts') or []
+        if len(counts) == counter.slots:
+            counter.counts = [int(value) for value in counts]
+            counter.total = sum(counter.counts)
+            counter.current = data.get('current')
+        return counter
+
+
+class AlertBatch:
+    """Alerts of one type waiting to be sent"""
+
+    def __init__(self, alert_type, first_seen, count=0, recent=()):
+        self.alert_type = alert_type
+        self.first_seen = first_seen
+        self.count = count
+        self.recent = deque(recent, maxlen=RECENT_PER_TYPE)
+
+    def add(self, alert):
+        self.count += 1
+        self.recent.append(alert)
+
+    def to_dict(self):
+        return {'first_seen': self.first_seen, 'count': self.count,
+                'recent': list(self.recent)}
+
+
+class AlertAggregator:
+    """Buffers, rate-limits and counts alerts per type
+
+    `add()` is called for every parsed alert line; `due()` returns the
+    batches whose cooldown has passed and which are old enough, large enough
+    or critical, and starts a new cooldown for them.
+    """
+
+    def __init__(self, state_file, cooldown=300, buffer_timeout=60,
+                 critical_types=(), batch_size=5, window=WINDOW, bucket=BUCKET):
+        self.state_file = state_file
+        self.cooldown = cooldown
+        self.buffer_timeout = buffer_timeout
+        self.critical_types = set(critical_types)
+        self.batch_size = batch_size
+        self.window = window
+        self.bucket = bucket
+
+        self.counters = {}
+        self.batches = {}
+        self.last_sent = {}
+        self._dirty = False
+        self._load()
+
+    def add(self, alert, now=None):
+        now = time.time() if now is None else now
+        alert_type = alert['alert_type']
+
+        counter = self.counters.get(alert_type)
+        if counter is None:
+            counter = self.counters[alert_type] = SlidingWindowCounter(self.window, self.bucket)
+        counter.add(now)
+
+        batch = self.batches.get(alert_type)
+        if batch is None:
+            batch = self.batches[alert_type] = AlertBatch(alert_type, now)
+        batch.add(alert)
+        self._dirty = True
+
+    def in_cooldown(self, alert_type, now=None):
+        now = time.time() if now is None else now
+        return now - self.last_sent.get(alert_type, 0) < self.cooldown
+
+    def due(self, now=None):
+        """Batches ready to send now, removed from the buffer"""
+        now = time.time() if now is None else now
+        ready = []
+        for alert_type, batch in list(self.batches.items()):
+            if self.in_cooldown(alert_type, now):
+                continue
+            if (now - batch.first_seen >= self.buffer_timeout or
+                    alert_type in self.critical_types or
+                    batch.count >= self.batch_size):
+                ready.append(batch)
+                del self.batches[alert_type]
+                self.last_sent[alert_type] = now
+        if ready:
+            self._dirty = True
+        return ready
+
+    def counts(self, now=None):
+        """Alerts per type in the last window, skipping types with none"""
+        now = time.time() if now is None else now
+        result = {}
+        for alert_type, counter in self.counters.items():
+            count = counter.count(now)
+            if count:
+                result[alert_type] = count
+        return result
+
+    def cleanup(self, now=None):
+        """Forget types with no alerts left in the window"""
+        now = time.time() if now is None else now
+        for alert_type, counter in list(self.counters.items()):
+            if not counter.count(now) and alert_type not in self.batches:
+                del self.counters[alert_type]
+                self._dirty = True
+        for alert_type, sent in list(self.last_sent.items()):
+            if now - sent >= self.cooldown:
+                del self.last_sent[alert_type]
+                self._dirty = True
+
+    def _load(self):
+        if not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r') as f:
+                state = json.load(f)
+            self.last_sent = {key: float(value)
+                              for key, value in state.get('last_sent', {}).items()}
+            self.counters = {key: SlidingWindowCounter.from_dict(value, self.window, self.bucket)
+                             for key, value in state.get('counters', {}).items()}
+            self.batches = {key: AlertBatch(key, value['first_seen'], value['count'],
+                                            value['recent'])
+                            for key, value in state.get('batches', {}).items()}
+        except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+            print(f"Warning: Could not load alert state, starting fresh: {e}")
+
+    def save(self):
+        """Write the state file (atomically) if anything changed"""
+        if not self._dirty:
+            return
+        state = {
+            'last_sent': self.last_sent,
+            'counters': {key: counter.to_dict() for key, counter in self.counters.items()},
+            'batches': {key: batch.to_dict() for key, batch in self.batches.items()},
+        }
+        tmp_file = self.state_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump(state, f)
+            os.replace(tmp_file, self.state_file)
+            self._dirty = False
+        except OSError as e:
+            print(f"Warning: Could not save alert state: {e}")
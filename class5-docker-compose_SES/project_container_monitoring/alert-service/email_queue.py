@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Outbound email queue for the alert service.
+
+Emails are spooled to disk and sent by a small pool of worker threads, so a
+slow or throttled SES call never blocks alert processing. Sends are paced
+by a token bucket sized from the SES send-rate quota (one token per
+recipient, the way SES counts). Emails waiting for the same recipient list
+are coalesced into one message. Failed sends are retried with exponential
+backoff, and survive restarts because every pending email is a file in the
+spool directory until SES accepts it.
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+MAX_ATTEMPTS = 8
+BACKOFF_BASE = 2
+BACKOFF_MAX = 600
+# Upper bound on emails merged into one message
+MAX_COALESCE = 20
+
+
+class TokenBucket:
+    """Allows `rate` tokens per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` are available and take them"""
+        # A request bigger than the bucket goes once the bucket is full and
+        # leaves it in debt, so the next callers wait the extra tokens/rate
+        # and the average rate still holds
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with full jitter, capped at BACKOFF_MAX"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE ** attempts))
+
+
+def send_rate_quota(ses_client, default):
+    """SES MaxSendRate for the account, or `default` if it can't be read"""
+    try:
+        return float(ses_client.get_send_quota()['MaxSendRate']) or default
+    except Exception as e:
+        print(f"Could not read SES send quota, using {default}/s: {e}")
+        return default
+
+
+class EmailQueue:
+    """Disk-backed SES send queue with a worker pool"""
+
+    def __init__(self, ses_client, sender_email, spool_dir, workers=2, send_rate=1.0):
+        self.ses_client = ses_client
+        self.sender_email = sender_email
+        self.spool_dir = spool_dir
+        os.makedirs(spool_dir, exist_ok=True)
+        self.bucket = TokenBucket(send_rate)
+        self.workers = workers
+
+        self._cond = threading.Condition()
+        # Recipient list (tuple) -> pending emails, oldest first
+        self._pending = {}
+        # Recipient list -> time.time() before which it must not be retried
+        self._retry_at = {}
+        # Recipient lists a worker is currently sending to
+        self._in_flight = set()
+        self._stopped = False
+        self._threads = []
+        self._load_spool()
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f'email-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def __len__(self):
+        with self._cond:
+            return sum(len(emails) for emails in self._pending.values())
+
+    def enqueue(self, recipients, subject, body, critical=False):
+        """Spool an email and hand it to the workers; returns immediately"""
+        email = {
+            'id': uuid.uuid4().hex,
+            'recipients': list(recipients),
+            'subject': subject,
+            'body': body,
+            'critical': critical,
+            'attempts': 0,
+            'created': time.time(),
+        }
+        self._write(email)
+        with self._cond:
+            self._pending.setdefault(tuple(email['recipients']), []).append(email)
+            self._cond.notify()
+        return email['id']
+
+    def _path(self, email):
+        return os.path.join(self.spool_dir, email['id'] + '.json')
+
+    def _write(self, email):
+        tmp_file = self._path(email) + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(email, f)
+        os.replace(tmp_file, self._path(email))
+
+    def _remove(self, email):
+        try:
+            os.remove(self._path(email))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            # Sent anyway; it is sent again after a restart at worst
+            print(f"Warning: Could not remove spooled email {email['id']}: {e}")
+
+    def _load_spool(self):
+        emails = []
+        for name in os.listdir(self.spool_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.spool_dir, name), 'r') as f:
+                    emails.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Warning: Skipping unreadable spooled email {name}: {e}")
+        for email in sorted(emails, key=lambda email: email['created']):
+            self._pending.setdefault(tuple(email['recipients']), []).append(email)
+        if emails:
+            print(f"Loaded {len(emails)} unsent emails from {self.spool_dir}")
+
+    def _next_batch(self):
+        """Pick a ready recipient list and take its emails (lock held)
+
+        Returns (key, emails, None) or (None, None, seconds to wait).
+        """
+        now = time.time()
+        wait = None
+        for key, emails in self._pending.items():
+            if key in self._in_flight or not emails:
+                continue
+            retry_at = self._retry_at.get(key, 0)
+            if retry_at <= now:
+                batch = emails[:MAX_COALESCE]
+                del emails[:MAX_COALESCE]
+                self._in_flight.add(key)
+                return key, batch, None
+            wait = retry_at - now if wait is None else min(wait, retry_at - now)
+        return None, None, wait
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while True:
+                    if self._stopped:
+                        return
+                    key, batch, wait = self._next_batch()
+                    if batch:
+                        break
+                    self._cond.wait(wait)
+
+            self.bucket.acquire(len(key))
+            ok, retryable = self._send(key, batch)
+
+            with self._cond:
+                self._in_flight.discard(key)
+                if ok:
+                    self._retry_at.pop(key, None)
+                    for email in batch:
+                        self._remove(email)
+                else:
+                    self._reschedule(key, batch, retryable)
+                if not self._pending.get(key):
+                    self._pending.pop(key, None)
+                self._cond.notify_all()
+
+    def _reschedule(self, key, batch, retryable):
+        """Put a failed batch back in front of the queue (lock held)"""
+        kept = []
+        for email in batch:
+            email['attempts'] += 1
+            if not retryable or email['attempts'] >= MAX_ATTEMPTS:
+                print(f"Giving up on email '{email['subject']}' after "
+                      f"{email['attempts']} attempts")
+                try:
+                    os.replace(self._path(email), self._path(email) + '.failed')
+                except OSError as e:
+                    print(f"Warning: Could not mark spooled email {email['id']} failed: {e}")
+                continue
+            try:
+                self._write(email)
+            except OSError as e:
+                # Still retried from memory, only the attempt count on disk is stale
+                print(f"Warning: Could not update spooled email {email['id']}: {e}")
+            kept.append(email)
+        if kept:
+            attempts = max(email['attempts'] for email in kept)
+            delay = backoff_delay(attempts)
+            self._retry_at[key] = time.time() + delay
+            self._pending[key] = kept + self._pending.get(key, [])
+            print(f"Retrying {len(kept)} email(s) to {', '.join(key)} in {delay:.1f}s")
+
+    @staticmethod
+    def coalesce(batch):
+        """Merge several emails to the same recipients into one subject/body"""
+        if len(batch) == 1:
+            return batch[0]['subject'], batch[0]['body']
+        lead = next((email for email in batch if email['critical']), batch[0])
+        subject = f"{lead['subject']} (+{len(batch) - 1} more)"
+        separator = '\n' + '=' * 60 + '\n'
+        return subject, separator.join(email['body'] for email in batch)
+
+    def _send(self, key, batch):
+        """Returns (sent, worth retrying)"""
+        subject, body = self.coalesce(batch)
+        try:
+            response = self.ses_client.send_email(
+                Source=self.sender_email,
+                Destination={
+                    'ToAddresses': list(key)
+                },
+                Message={
+                    'Subject': {
+                        'Data': subject,
+                        'Charset': 'UTF-8'
+                    },
+                    'Body': {
+                        'Text': {
+                            'Data': body,
+                            'Charset': 'UTF-8'
+                        }
+                    }
+                }
+            )
+            print(f"Email sent successfully: {response['MessageId']} "
+                  f"({len(batch)} alert email(s))")
+            return True, True
+        except Exception as e:
+            print(f"Error sending email: {e}")
+            # Rejected content or an unverified sender will not fix itself
+            code = getattr(e, 'response', {}).get('Error', {}).get('Code')
+            return False, code not in ('MessageRejected', 'MailFromDomainNotVerified',
+                                       'InvalidParameterValue')
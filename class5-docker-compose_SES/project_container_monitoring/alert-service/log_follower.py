@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Follow an append-only log file with a small persistent cursor.
+
+Only the inode and byte offset of the last processed line are saved, so
+memory and state size stay constant however long the log grows. Waiting for
+new data uses inotify on Linux and falls back to polling os.stat() elsewhere
+(or when the log lives on a filesystem that does not deliver events).
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import time
+
+POLL_INTERVAL = 0.5
+
+# inotify(7) event masks
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+# struct inotify_event header: wd, mask, cookie, len (the name follows)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """Minimal ctypes wrapper around inotify, watching one file's directory"""
+
+    def __init__(self, directory, name, mask=IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE):
+        self.name = os.fsencode(name)
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # Watch the directory, not the file, so rotation and re-creation are seen
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f'inotify_add_watch failed for {directory}')
+
+    def wait(self, timeout):
+        """Block until `name` changes or `timeout` passes; True on change"""
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return False
+            # Drain everything queued; other files in the directory (all of
+            # /var/log by default) do not count as a change
+            if self.name in self._read_names():
+                return True
+
+    def _read_names(self):
+        names = set()
+        try:
+            while True:
+                data = os.read(self.fd, 65536)
+                offset = 0
+                while offset < len(data):
+                    _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+                    offset += EVENT_HEADER.size
+                    names.add(data[offset:offset + length].rstrip(b'\0'))
+                    offset += length
+        except BlockingIOError:
+            pass
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+
+class LogFollower:
+    """Reads lines appended to `path` since the last saved cursor"""
+
+    def __init__(self, path, cursor_file):
+        self.path = path
+        self.cursor_file = cursor_file
+        self.inode, self.offset = self._load_cursor()
+        self._saved = (self.inode, self.offset)
+        self._inotify = None
+        try:
+            self._inotify = Inotify(*os.path.split(os.path.abspath(path)))
+        except (OSError, AttributeError, TypeError) as e:
+            print(f"inotify unavailable, polling {path} instead: {e}")
+
+    def _load_cursor(self):
+        try:
+            with open(self.cursor_file, 'r') as f:
+                cursor = json.load(f)
+            return cursor['inode'], cursor['offset']
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        # No cursor yet: start at the current end instead of re-sending
+        # every alert already in the log
+        try:
+            stat = os.stat(self.path)
+            return stat.st_ino, stat.st_size
+        except OSError:
+            return None, 0
+
+    def save_cursor(self):
+        """Persist the cursor (atomically) if it moved since the last save"""
+        if (self.inode, self.offset) == self._saved:
+            return
+        tmp_file = self.cursor_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as f:
+                json.dump({'inode': self.inode, 'offset': self.offset}, f)
+            os.replace(tmp_file, self.cursor_file)
+            self._saved = (self.inode, self.offset)
+        except OSError as e:
+            print(f"Warning: Could not save log cursor: {e}")
+
+    def read_lines(self):
+        """Complete lines appended since the last call (partial lines wait)"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+
+        if stat.st_ino != self.inode:
+            # Rotated or re-created: the new file is all new
+            self.inode, self.offset = stat.st_ino, 0
+        elif stat.st_size < self.offset:
+            # Truncated in place
+            self.offset = 0
+
+        if stat.st_size == self.offset:
+            return []
+
+        with open(self.path, 'rb') as f:
+            # The cursor always sits just after a newline; anything else means
+            # the file was truncated and has already grown past the old offset
+            if self.offset:
+                f.seek(self.offset - 1)
+                if f.read(1) != b'\n':
+                    self.offset = 0
+            f.seek(self.offset)
+            data = f.read(stat.st_size - self.offset)
+
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return []
+        self.offset += end
+        lines = data[:end].decode('utf-8', errors='replace').splitlines()
+        return [line.strip() for line in lines if line.strip()]
+
+    def wait(self, timeout):
+        """Sleep until the log changes or `timeout` seconds pass"""
+        if self._inotify is not None:
+            self._inotify.wait(timeout)
+            return
+
+        deadline = time.monotonic() + timeout
+        try:
+            before = os.stat(self.path)
+            before = (before.st_ino, before.st_size)
+        except OSError:
+            before = None
+        while time.monotonic() < deadline:
+            time.sleep(min(POLL_INTERVAL, max(0, deadline - time.monotonic())))
+            try:
+                now = os.stat(self.path)
+                now = (now.st_ino, now.st_size)
+            except OSError:
+                now = None
+            if now != before:
+                return
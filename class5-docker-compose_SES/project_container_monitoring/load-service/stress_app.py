@@ -1,71 +1,315 @@
 #!/usr/bin/env python3
 import os
+import json
+import math
 import time
 import random
 import requests
 import threading
+from requests.adapters import HTTPAdapter
 from concurrent.futures import ThreadPoolExecutor
 
 TARGET_URL = os.getenv('TARGET_URL', 'http://web-app')
 STRESS_LEVEL = os.getenv('STRESS_LEVEL', 'low')
 
+# open: requests start at a fixed rate whatever the response times
+# closed: each thread waits for its response (plus a delay) before the next
+LOAD_MODE = os.getenv('LOAD_MODE', 'open')
+DURATION = int(os.getenv('DURATION', '60'))  # seconds per open-loop cycle
+CYCLES = int(os.getenv('CYCLES', '0'))  # 0 = repeat forever
+RATE = os.getenv('RATE')  # override the preset's requests per second
+SUMMARY_FILE = os.getenv('SUMMARY_FILE')  # append one JSON summary per cycle
+SEED = os.getenv('SEED')  # fixed seed = same endpoint sequence every run
+
 # Stress level configurations
+# rate is the open-loop arrival rate (requests/second), threads caps the
+# requests in flight (a request due while all of them are busy is dropped
+# and counted); the rest drives the closed-loop mode
 STRESS_CONFIGS = {
-    'low': {'threads': 5, 'requests_per_thread': 10, 'delay': 0.5},
-    'medium': {'threads': 20, 'requests_per_thread': 100, 'delay': 0.1},
-    'high': {'threads': 50, 'requests_per_thread': 200, 'delay': 0.05},
-    'extreme': {'threads': 100, 'requests_per_thread': 500, 'delay': 0.001},
-    'cpu-intensive': {'threads': 10, 'requests_per_thread': 50, 'delay': 0.1, 'cpu_focus': True},
-    'memory-intensive': {'threads': 10, 'requests_per_thread': 50, 'delay': 0.1, 'memory_focus': True}
+    'low': {'threads': 5, 'requests_per_thread': 10, 'delay': 0.5, 'rate': 10},
+    'medium': {'threads': 20, 'requests_per_thread': 100, 'delay': 0.1, 'rate': 50},
+    'high': {'threads': 50, 'requests_per_thread': 200, 'delay': 0.05, 'rate': 200},
+    'extreme': {'threads': 100, 'requests_per_thread': 500, 'delay': 0.001, 'rate': 1000},
+    'cpu-intensive': {'threads': 10, 'requests_per_thread': 50, 'delay': 0.1, 'rate': 5, 'cpu_focus': True},
+    'memory-intensive': {'threads': 10, 'requests_per_thread': 50, 'delay': 0.1, 'rate': 5, 'memory_focus': True}
 }
 
-def generate_load(thread_id, config):
-    """Generate load on the target application"""
+PERCENTILES = [50, 95, 99, 99.9]
+
+
+def get_endpoints(config):
+    """Choose endpoints based on stress configuration"""
+    if config.get('cpu_focus'):
+        return ['/api/cpu-intensive?iterations=500000']
+    if config.get('memory_focus'):
+        return ['/api/memory-intensive?size_mb=20']
+    return [
+        '/',
+        '/api/stats',
+        '/health',
+        '/api/cpu-intensive?iterations=100000',
+        '/api/memory-intensive?size_mb=5',
+        '/api/database-intensive?operations=50',
+        '/api/combined-stress?duration=5'
+    ]
+
+
+class LatencyHistogram:
+    """Log-linear latency histogram in microseconds (HDR histogram style)
+
+    Values under 128us are kept exactly; above that each power of two is
+    split into 64 buckets, so every percentile is within 1.6% of the true
+    value while recording is O(1) and memory is fixed.
+    """
+    SIZE = 2048
+
+    def __init__(self):
+        self.counts = [0] * self.SIZE
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    @staticmethod
+    def index(value):
+        if value < 128:
+            return value
+        shift = value.bit_length() - 7
+        return min(128 + (shift - 1) * 64 + (value >> shift) - 64, LatencyHistogram.SIZE - 1)
+
+    @staticmethod
+    def highest_value(index):
+        """Largest value that lands in bucket `index`"""
+        if index < 128:
+            return index
+        shift = (index - 128) // 64 + 1
+        sub_bucket = (index - 128) % 64 + 64
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, seconds):
+        value = int(seconds * 1000000)
+        self.counts[self.index(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def percentile(self, percent):
+        """Latency in microseconds below which `percent` of requests fall"""
+        if not self.total:
+            return 0
+        rank = max(1, math.ceil(percent / 100 * self.total))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.highest_value(index), self.max)
+        return self.max
+
+    def summary(self):
+        """Percentiles, mean and max in milliseconds"""
+        result = {f'p{p:g}'.replace('.', ''): round(self.percentile(p) / 1000, 3)
+                  for p in PERCENTILES}
+        result['mean'] = round(self.sum / self.total / 1000, 3) if self.total else 0
+        result['max'] = round(self.max / 1000, 3)
+        return result
+
+
+class LoadStats:
+    """Per-endpoint latency histograms and status counts, shared by all threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.statuses = {}
+        self.errors = {}
+        # Open-loop requests not sent because every thread was busy
+        self.dropped = {}
+
+    def record(self, endpoint, latency, status):
+        """status is the HTTP status code, or None if the request failed"""
+        with self.lock:
+            statuses = self.statuses.setdefault(endpoint, {})
+            key = str(status) if status is not None else 'error'
+            statuses[key] = statuses.get(key, 0) + 1
+            if status is None or status >= 400:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+            if status is not None:
+                self.histograms.setdefault(endpoint, LatencyHistogram()).record(latency)
+
+    def record_dropped(self, endpoint):
+        with self.lock:
+            self.dropped[endpoint] = self.dropped.get(endpoint, 0) + 1
+
+    def summary(self, elapsed, config):
+        with self.lock:
+            overall = LatencyHistogram()
+            endpoints = {}
+            for endpoint in sorted(set(self.statuses) | set(self.dropped)):
+                statuses = self.statuses.get(endpoint, {})
+                histogram = self.histograms.get(endpoint, LatencyHistogram())
+                overall.merge(histogram)
+                endpoints[endpoint] = {
+                    'requests': sum(statuses.values()),
+                    'errors': self.errors.get(endpoint, 0),
+                    'dropped': self.dropped.get(endpoint, 0),
+                    'status': statuses,
+                    'latency_ms': histogram.summary()
+                }
+            requests_done = sum(e['requests'] for e in endpoints.values())
+            return {
+                'level': STRESS_LEVEL,
+                'mode': LOAD_MODE,
+                'target': TARGET_URL,
+                'rate': config['rate'] if LOAD_MODE == 'open' else None,
+                'threads': config['threads'],
+                'elapsed_s': round(elapsed, 3),
+                'requests': requests_done,
+                'errors': sum(e['errors'] for e in endpoints.values()),
+                'dropped': sum(e['dropped'] for e in endpoints.values()),
+                'throughput_rps': round(requests_done / elapsed, 2) if elapsed else 0,
+                'latency_ms': overall.summary(),
+                'endpoints': endpoints
+            }
+
+
+# One keep-alive session per worker thread instead of a new connection per request
+thread_local = threading.local()
+
+
+def get_session():
+    session = getattr(thread_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=1)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        thread_local.session = session
+    return session
+
+
+def send_request(endpoint, stats, scheduled=None):
+    """Send one request and record its latency
+
+    In open-loop mode latency is measured from the time the request was
+    scheduled, not when a thread got to it, so queueing delay under
+    overload is counted (avoids coordinated omission).
+    """
+    started = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        response = get_session().get(f"{TARGET_URL}{endpoint}", timeout=30)
+        # Read the whole body so the connection can be reused
+        response.content
+        stats.record(endpoint, time.perf_counter() - started, response.status_code)
+    except Exception as e:
+        stats.record(endpoint, time.perf_counter() - started, None)
+        print(f"Error - {endpoint}: {str(e)}")
+
+
+def run_open_loop(config, stats, rng):
+    """Start requests at a constant rate for DURATION seconds"""
+    interval = 1.0 / config['rate']
+    endpoints = get_endpoints(config)
+    # One slot per thread, so nothing waits in the executor's (unbounded)
+    # queue: when the target is slower than the rate the backlog would grow
+    # for the whole cycle and the latencies would measure that queue
+    slots = threading.BoundedSemaphore(config['threads'])
+    with ThreadPoolExecutor(max_workers=config['threads']) as executor:
+        start = time.perf_counter()
+        sent = 0
+        while True:
+            scheduled = start + sent * interval
+            if scheduled - start >= DURATION:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            # If the loop fell behind it catches up without sleeping
+            endpoint = rng.choice(endpoints)
+            if slots.acquire(blocking=False):
+                future = executor.submit(send_request, endpoint, stats, scheduled)
+                future.add_done_callback(lambda future: slots.release())
+            else:
+                stats.record_dropped(endpoint)
+            sent += 1
+
+
+def generate_load(thread_id, config, stats, rng):
+    """Generate load on the target application (closed loop)"""
+    endpoints = get_endpoints(config)
     for i in range(config['requests_per_thread']):
+        send_request(rng.choice(endpoints), stats)
+        time.sleep(config['delay'])
+
+
+def run_closed_loop(config, stats, rng):
+    with ThreadPoolExecutor(max_workers=config['threads']) as executor:
+        futures = []
+        for i in range(config['threads']):
+            thread_rng = random.Random(rng.random())
+            future = executor.submit(generate_load, i, config, stats, thread_rng)
+            futures.append(future)
+
+        # Wait for all threads to complete
+        for future in futures:
+            future.result()
+
+
+def print_report(summary):
+    print(f"\n{summary['requests']} requests in {summary['elapsed_s']}s "
+          f"({summary['throughput_rps']} req/s), {summary['errors']} errors, "
+          f"{summary['dropped']} dropped (all threads busy)")
+    columns = ['p50', 'p95', 'p99', 'p999', 'max']
+    print(f"{'endpoint':<45} {'count':>7} {'errors':>6} " +
+          ' '.join(f"{c + ' ms':>9}" for c in columns))
+    rows = list(summary['endpoints'].items()) + [('TOTAL', summary)]
+    for endpoint, data in rows:
+        latency = data['latency_ms']
+        print(f"{endpoint:<45} {data['requests']:>7} {data['errors']:>6} " +
+              ' '.join(f"{latency[c]:>9.1f}" for c in columns))
+
+
+def emit_summary(summary):
+    """Machine-readable summary: one JSON line on stdout and in SUMMARY_FILE"""
+    line = json.dumps(summary, sort_keys=True)
+    print(f"SUMMARY {line}")
+    if SUMMARY_FILE:
         try:
-            # Choose endpoint based on stress configuration
-            if config.get('cpu_focus'):
-                endpoints = ['/api/cpu-intensive?iterations=500000']
-            elif config.get('memory_focus'):
-                endpoints = ['/api/memory-intensive?size_mb=20']
-            else:
-                endpoints = [
-                    '/',
-                    '/api/stats',
-                    '/health',
-                    '/api/cpu-intensive?iterations=100000',
-                    '/api/memory-intensive?size_mb=5',
-                    '/api/database-intensive?operations=50',
-                    '/api/combined-stress?duration=5'
-                ]
-            
-            endpoint = random.choice(endpoints)
-            
-            response = requests.get(f"{TARGET_URL}{endpoint}", timeout=30)
-            print(f"Thread {thread_id}: Request {i+1} to {endpoint} - Status: {response.status_code}")
-            
-            time.sleep(config['delay'])
-        except Exception as e:
-            print(f"Thread {thread_id}: Error - {str(e)}")
+            with open(SUMMARY_FILE, 'a') as f:
+                f.write(line + '\n')
+        except OSError as e:
+            print(f"Warning: Could not write summary file: {e}")
+
 
 def main():
-    config = STRESS_CONFIGS.get(STRESS_LEVEL, STRESS_CONFIGS['low'])
-    print(f"Starting stress test - Level: {STRESS_LEVEL}")
+    config = dict(STRESS_CONFIGS.get(STRESS_LEVEL, STRESS_CONFIGS['low']))
+    if RATE:
+        config['rate'] = float(RATE)
+    print(f"Starting stress test - Level: {STRESS_LEVEL}, Mode: {LOAD_MODE}")
     print(f"Configuration: {config}")
-    
-    while True:
-        with ThreadPoolExecutor(max_workers=config['threads']) as executor:
-            futures = []
-            for i in range(config['threads']):
-                future = executor.submit(generate_load, i, config)
-                futures.append(future)
-            
-            # Wait for all threads to complete
-            for future in futures:
-                future.result()
-        
-        print(f"Completed cycle. Waiting 10 seconds before next cycle...")
-        time.sleep(10)
+    rng = random.Random(SEED)
+
+    cycle = 0
+    while CYCLES == 0 or cycle < CYCLES:
+        stats = LoadStats()
+        start = time.perf_counter()
+        if LOAD_MODE == 'closed':
+            run_closed_loop(config, stats, rng)
+        else:
+            run_open_loop(config, stats, rng)
+        summary = stats.summary(time.perf_counter() - start, config)
+        print_report(summary)
+        emit_summary(summary)
+
+        cycle += 1
+        if CYCLES == 0 or cycle < CYCLES:
+            print(f"Completed cycle. Waiting 10 seconds before next cycle...")
+            time.sleep(10)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark: one dashboard process watching many containers.
+
+Starts a fake Docker Engine API on a unix socket in a child process that
+streams one stats sample per second for every container, the same rate as
+the real daemon. The dashboard side then runs its collector, sampler rounds
+and API calls, and only that side's CPU time is measured.
+
+Health probes are replaced by a constant because they are network bound
+and would measure the test network, not the dashboard.
+
+Usage: python3 bench_multi_container.py [containers] [seconds]
+"""
+import http.server
+import json
+import multiprocessing
+import os
+import socketserver
+import sys
+import tempfile
+import time
+
+
+def fake_docker_daemon(socket_path, count):
+    """Serve just enough of the Engine API for the collector"""
+    names = [f'bench-{i:03d}' for i in range(count)]
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, data):
+            body = json.dumps(data).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.startswith('/containers/json'):
+                return self.send_json([{'Names': ['/' + name]} for name in names])
+            if self.path.endswith('/json'):
+                return self.send_json({'State': {'Status': 'running',
+                                                 'StartedAt': '2024-01-01T00:00:00.000000000Z'}})
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            total = 0
+            tick = 0
+            try:
+                while True:
+                    sample = {
+                        'read': '2024-01-01T00:00:00Z',
+                        'cpu_stats': {'cpu_usage': {'total_usage': total + 5 * 10 ** 7},
+                                      'system_cpu_usage': (tick + 1) * 10 ** 9,
+                                      'online_cpus': 2},
+                        'precpu_stats': {'cpu_usage': {'total_usage': total},
+                                         'system_cpu_usage': tick * 10 ** 9},
+                        'memory_stats': {'usage': 200 * 2 ** 20, 'limit': 2 ** 30,
+                                         'stats': {'inactive_file': 20 * 2 ** 20}},
+                    }
+                    total += 5 * 10 ** 7
+                    tick += 1
+                    data = (json.dumps(sample) + '\n').encode()
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+                    self.wfile.flush()
+                    time.sleep(1)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+        # All collector threads connect at once on startup
+        request_queue_size = 1024
+
+        def get_request(self):
+            request, _ = super().get_request()
+            return request, ('local', 0)
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    Server(socket_path, Handler).serve_forever()
+
+
+def timed(func, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seconds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    workdir = tempfile.mkdtemp(prefix='dashboard-bench-')
+    socket_path = os.path.join(workdir, 'docker.sock')
+
+    daemon = multiprocessing.Process(target=fake_docker_daemon,
+                                     args=(socket_path, count), daemon=True)
+    daemon.start()
+    while not os.path.exists(socket_path):
+        time.sleep(0.05)
+
+    # Configure the dashboard before importing it
+    os.environ['DOCKER_SOCKET'] = socket_path
+    os.environ['CONTAINER_LABEL'] = 'bench'
+    os.environ.pop('CONTAINER_NAMES', None)
+    import dashboard
+    from history_store import HistoryStore
+
+    dashboard.check_app_response_time = lambda container: 12.5
+    dashboard.history_store = HistoryStore(os.path.join(workdir, 'history.db'))
+
+    dashboard.refresh_containers()
+    containers = dashboard.monitored_containers()
+    print(f"Watching {len(containers)} containers")
+
+    # Let every stream deliver its first samples
+    time.sleep(3)
+
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    rounds = []
+    while time.perf_counter() - wall_start < seconds:
+        round_start = time.perf_counter()
+        dashboard.take_sample()
+        rounds.append(time.perf_counter() - round_start)
+        time.sleep(1)
+    cpu_used = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    client = dashboard.app.test_client()
+    target = containers[0]
+    stats_time = timed(lambda: client.get(f'/api/stats?container={target}'), 500)
+    uptime_time = timed(lambda: client.get(f'/api/uptime?container={target}'), 200)
+    list_time = timed(lambda: client.get('/api/containers'), 50)
+
+    running = sum(1 for name in containers
+                  if dashboard.get_container_stats(name)['status'] == 'running')
+    print(f"Containers reporting running: {running}/{len(containers)}")
+    print(f"Dashboard CPU: {cpu_used / wall * 100:.1f}% of one core "
+          f"({cpu_used:.2f}s CPU over {wall:.1f}s, {count} stats streams at 1 sample/s)")
+    print(f"Sampler round ({len(containers)} containers, incl. history write): "
+          f"avg {sum(rounds) / len(rounds) * 1000:.1f} ms, max {max(rounds) * 1000:.1f} ms")
+    print(f"/api/stats:      {stats_time * 1e6:.0f} us per request")
+    print(f"/api/uptime:     {uptime_time * 1e6:.0f} us per request")
+    print(f"/api/containers: {list_time * 1000:.2f} ms per request")
+
+    dashboard.stats_collector.stop()
+    daemon.terminate()
+
+
+if __name__ == '__main__':
+    main()
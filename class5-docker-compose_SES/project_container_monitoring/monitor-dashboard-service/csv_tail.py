@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Incremental tail reader for the metrics CSV written by monitor_container.sh.
+
+The reader remembers the byte offset and inode of the file. Each refresh only
+parses rows appended since the last one, and the most recent rows are kept in
+a bounded window. A cold start seeks backwards from the end of the file, so a
+multi-GB file costs the same as a small one. Truncation and rotation are
+detected and the reader starts again from the top of the new file.
+`last_lines()` does the same backwards seek for a one-off read of any log.
+
+When the file holds rows for several containers, a window is kept per
+container (rows written before the container column existed belong to
+`default_key`).
+"""
+import csv
+import os
+import threading
+from collections import defaultdict, deque
+
+FIELDS = ('timestamp', 'cpu_percent', 'memory_used', 'memory_percent',
+          'response_time', 'status', 'container')
+BLOCK_SIZE = 8192
+# Past this much unread data it is cheaper to seek back from EOF than to parse
+# everything in between and throw most of it away
+MAX_CATCHUP_BYTES = 1024 * 1024
+
+
+def tail_offset(f, size, lines):
+    """Offset of a line start in binary file `f` with at least `lines` lines after it"""
+    position = size
+    newlines = 0
+    while position > 0 and newlines <= lines:
+        step = min(BLOCK_SIZE, position)
+        position -= step
+        f.seek(position)
+        newlines += f.read(step).count(b'\n')
+    if position == 0:
+        return 0
+    # The seek most likely landed mid-line, skip to the next one
+    f.seek(position)
+    f.readline()
+    return f.tell()
+
+
+def last_lines(path, count):
+    """The last `count` lines of a text file, reading only its tail"""
+    with open(path, 'rb') as f:
+        size = f.seek(0, os.SEEK_END)
+        f.seek(tail_offset(f, size, count))
+        data = f.read()
+    return data.decode('utf-8', errors='replace').splitlines()[-count:]
+
+
+class CsvTailReader:
+    """Keeps the last `window` rows per container of an append-only CSV file"""
+
+    def __init__(self, path, window=50, default_key=None):
+        self.path = path
+        self.window = window
+        self.default_key = default_key
+        # Lines read back from EOF on a cold start; raise it when the file
+        # interleaves many containers so each one still fills its window
+        self.tail_lines = window
+        self._rows = defaultdict(lambda: deque(maxlen=self.window))
+        self._offset = None     # byte offset of the first unparsed byte
+        self._inode = None
+        self._lock = threading.Lock()
+
+    def rows(self, key=None):
+        """Most recent rows for a container as dicts, oldest first"""
+        with self._lock:
+            self._refresh()
+            return list(self._rows.get(key if key is not None else self.default_key, ()))
+
+    def _refresh(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+
+        if stat.st_ino != self._inode:
+            # First read, or the file was rotated: start from the tail
+            self._reset()
+            self._inode = stat.st_ino
+            self._offset = self._tail_offset(stat.st_size)
+        elif stat.st_size < self._offset:
+            # Truncated in place: everything left is new
+            self._rows.clear()
+            self._offset = 0
+        elif stat.st_size - self._offset > MAX_CATCHUP_BYTES:
+            self._rows.clear()
+            self._offset = self._tail_offset(stat.st_size)
+
+        if stat.st_size > self._offset:
+            self._read_from(self._offset)
+
+    def _reset(self):
+        self._rows.clear()
+        self._offset = None
+        self._inode = None
+
+    def _tail_offset(self, size):
+        """Offset of a line start with at least `tail_lines` lines after it"""
+        with open(self.path, 'rb') as f:
+            return tail_offset(f, size, self.tail_lines)
+
+    def _read_from(self, offset):
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+
+        # Leave a half-written last line for the next refresh
+        end = data.rfind(b'\n') + 1
+        if end == 0:
+            return
+        self._offset = offset + end
+
+        lines = data[:end].decode('utf-8', errors='replace').splitlines()
+        for row in csv.reader(lines):
+            if len(row) >= 6 and row[0] != 'timestamp':
+                record = dict(zip(FIELDS, row))
+                self._rows[record.get('container', self.default_key)].append(record)
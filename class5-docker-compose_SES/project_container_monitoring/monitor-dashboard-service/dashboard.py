@@ -1,221 +1,322 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, jsonify, request
-import subprocess
+from flask import Flask, Response, render_template, jsonify, request
+from concurrent.futures import ThreadPoolExecutor
+import html
 import json
-import csv
 import os
+import threading
 import time
-from datetime import datetime, timedelta
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from csv_tail import CsvTailReader, last_lines
+from docker_stats import DockerStatsCollector, list_containers
+from event_stream import Broadcaster, format_event
+from history_store import HistoryStore
+from ring_buffer import MetricsRingBuffer
 
 app = Flask(__name__)
 
 # Configuration
 CONTAINER_NAME = os.getenv('CONTAINER_NAME', 'monitored-app')
+# Optional Docker label selector, e.g. "monitor=true"; matching containers are
+# picked up (and dropped) automatically
+CONTAINER_LABEL = os.getenv('CONTAINER_LABEL', '')
+# Comma-separated list of containers to monitor; defaults to CONTAINER_NAME
+# unless a label selector is used
+CONTAINER_NAMES = [name.strip() for name in
+                   os.getenv('CONTAINER_NAMES', '' if CONTAINER_LABEL else CONTAINER_NAME).split(',')
+                   if name.strip()]
+DISCOVERY_INTERVAL = int(os.getenv('DISCOVERY_INTERVAL', '30'))
 METRICS_FILE = '/var/log/container_metrics.csv'
 ALERTS_FILE = '/var/log/container_alerts.log'
+# Rolled-up long term history lives next to the metrics CSV
+HISTORY_DB = os.getenv('HISTORY_DB', os.path.splitext(METRICS_FILE)[0] + '.db')
 # Default collection frequency in seconds
 DEFAULT_COLLECTION_FREQUENCY = int(os.getenv('COLLECTION_FREQUENCY', '30'))
 collection_frequency = DEFAULT_COLLECTION_FREQUENCY
 
-# Store uptime data - initialize with some default values
-uptime_data = []
-latency_data = []
+# Number of samples kept in memory per container for the live charts
+SAMPLE_CAPACITY = int(os.getenv('SAMPLE_CAPACITY', '100'))
+# Health endpoints are probed concurrently so one slow container does not
+# hold up the whole sampling round
+PROBE_WORKERS = int(os.getenv('PROBE_WORKERS', '16'))
+PROBE_TIMEOUT = 5
+
+# Container stats are streamed from the Docker Engine API in the background
+stats_collector = DockerStatsCollector(CONTAINER_NAMES)
+# One ring buffer per container, filled by a single sampler thread and read
+# by every API request
+samples = {}
+samples_lock = threading.Lock()
+probe_pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS)
+# Follows the CSV written by monitor_container.sh, parsing only new rows
+metrics_reader = CsvTailReader(METRICS_FILE, window=50,
+                               default_key=CONTAINER_NAMES[0] if CONTAINER_NAMES else None)
+metrics_reader.tail_lines = 50 * max(1, len(CONTAINER_NAMES))
+# Opened when the sampler starts so importing the module has no side effects
+history_store = None
+# One /api/stream channel per container
+broadcasters = {}
+# What the previous delta already told the browsers, per container
+last_published = {}
+# Last alerts read from ALERTS_FILE, re-read only when the file changes
+alerts_cache = {'key': None, 'alerts': []}
+alerts_lock = threading.Lock()
+
+def get_samples(container):
+    """Ring buffer for a container, created on first use"""
+    with samples_lock:
+        if container not in samples:
+            samples[container] = MetricsRingBuffer(SAMPLE_CAPACITY)
+        return samples[container]
+
+def get_broadcaster(container):
+    with samples_lock:
+        if container not in broadcasters:
+            broadcasters[container] = Broadcaster()
+        return broadcasters[container]
+
+def monitored_containers():
+    return stats_collector.names()
 
-def get_container_stats():
-    """Get current container statistics"""
+def default_container():
+    names = monitored_containers()
+    if CONTAINER_NAMES and CONTAINER_NAMES[0] in names:
+        return CONTAINER_NAMES[0]
+    return names[0] if names else CONTAINER_NAME
+
+def resolve_container():
+    """Container named by the ?container= argument, or None if unknown"""
+    container = request.args.get('container') or default_container()
+    return container if container in monitored_containers() else None
+
+def unknown_container():
+    return jsonify({'status': 'error', 'message': 'Unknown container'}), 404
+
+def refresh_containers():
+    """Re-run the label selector and watch exactly the matching containers"""
+    if not CONTAINER_LABEL:
+        return
     try:
-        # Get container stats
-        cmd = f"docker stats --no-stream --format '{{{{json .}}}}' {CONTAINER_NAME}"
-        result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-        
-        if result.returncode == 0 and result.stdout:
-            stats = json.loads(result.stdout)
-            
-            # Parse CPU percentage
-            cpu = float(stats.get('CPUPerc', '0%').rstrip('%'))
-            
-            # Parse memory
-            mem_usage = stats.get('MemUsage', '0MiB / 0MiB')
-            mem_parts = mem_usage.split(' / ')
-            
-            # Handle different memory units (MiB, GiB)
-            mem_used = mem_parts[0]
-            mem_limit = mem_parts[1]
-            
-            # Convert to MB for consistent units
-            mem_used_mb = convert_to_mb(mem_used)
-            mem_limit_mb = convert_to_mb(mem_limit)
-            
-            # Calculate memory percentage correctly
-            mem_percent = 0
-            if mem_limit_mb > 0:
-                mem_percent = (mem_used_mb / mem_limit_mb) * 100
-            
-            # Check if container is running
-            status_cmd = f"docker inspect --format='{{{{.State.Status}}}}' {CONTAINER_NAME}"
-            status_result = subprocess.run(status_cmd, shell=True, capture_output=True, text=True)
-            
-            if status_result.returncode == 0 and "running" in status_result.stdout:
-                status = "running"
-                # Get container uptime
-                uptime_cmd = f"docker inspect --format='{{{{.State.StartedAt}}}}' {CONTAINER_NAME}"
-                uptime_result = subprocess.run(uptime_cmd, shell=True, capture_output=True, text=True)
-                
-                if uptime_result.returncode == 0 and uptime_result.stdout:
-                    # Parse the start time
-                    start_time_str = uptime_result.stdout.strip()
-                    try:
-                        start_time = datetime.strptime(start_time_str[:19], '%Y-%m-%dT%H:%M:%S')
-                        # Calculate uptime value based on how long the container has been running
-                        now = datetime.now()
-                        uptime_seconds = (now - start_time).total_seconds()
-                        # If recently started (less than 2 minutes), set lower uptime
-                        if uptime_seconds < 120:
-                            uptime_value = 70  # 70% uptime if recently restarted
-                        else:
-                            uptime_value = 100  # 100% uptime if running for a while
-                    except:
-                        uptime_value = 100  # Default to 100% if parsing fails
-                else:
-                    uptime_value = 90  # Default to 90% if we couldn't get start time
-            else:
-                status = "stopped"
-                uptime_value = 0  # 0% uptime if stopped
-            
-            # Calculate response time
-            response_time = check_app_response_time()
-            
-            # Update uptime and latency data
-            update_uptime_data(uptime_value, status)
-            update_latency_data(response_time)
-            
-            return {
-                'cpu': cpu,
-                'memory_percent': mem_percent,
-                'memory_used': f"{mem_used_mb:.2f}",
-                'memory_limit': f"{mem_limit_mb:.2f}",
-                'status': status,
-                'response_time': response_time
-            }
+        names = set(list_containers(CONTAINER_LABEL)) | set(CONTAINER_NAMES)
     except Exception as e:
-        print(f"Error getting stats: {e}")
-        # Update uptime data with downtime
-        update_uptime_data(0, "error")  # 0% uptime if error
-    
-    return {
-        'cpu': 0,
-        'memory_percent': 0,
-        'memory_used': 0,
-        'memory_limit': 0,
-        'status': 'error',
-        'response_time': 0
+        print(f"Error discovering containers: {e}")
+        return
+    stats_collector.sync(names)
+    metrics_reader.tail_lines = 50 * max(1, len(names))
+    # Forget buffers of containers that went away so memory stays bounded
+    with samples_lock:
+        for container in set(samples) - names:
+            del samples[container]
+
+def get_uptime_value(snapshot):
+    """Uptime value (0-100) shown on the dashboard for a collector snapshot"""
+    if snapshot['status'] != 'running':
+        return 0  # 0% uptime if stopped
+    start_time = snapshot['started_at']
+    if start_time is None:
+        return 90  # Default to 90% if we couldn't get start time
+    # Calculate uptime value based on how long the container has been running
+    uptime_seconds = (datetime.now() - start_time).total_seconds()
+    # If recently started (less than 2 minutes), set lower uptime
+    if uptime_seconds < 120:
+        return 70  # 70% uptime if recently restarted
+    return 100  # 100% uptime if running for a while
+
+def take_sample():
+    """Record one sample of every container into its ring buffer and history"""
+    timestamp = time.time()
+    containers = monitored_containers()
+    snapshots = {}
+    for container in containers:
+        snapshot = stats_collector.get(container)
+        if snapshot['status'] not in ('running', 'error'):
+            snapshot['status'] = 'stopped'
+        snapshots[container] = snapshot
+
+    # Probe all running containers at once
+    probes = {container: probe_pool.submit(check_app_response_time, container)
+              for container, snapshot in snapshots.items()
+              if snapshot['status'] == 'running'}
+
+    rows = []
+    for container, snapshot in snapshots.items():
+        try:
+            latency = probes[container].result() if container in probes else 0
+            status = snapshot['status']
+            get_samples(container).append(timestamp,
+                                          snapshot['cpu'],
+                                          snapshot['memory_percent'],
+                                          snapshot['memory_used_mb'],
+                                          snapshot['memory_limit_mb'],
+                                          latency,
+                                          get_uptime_value(snapshot),
+                                          status)
+        except Exception as e:
+            print(f"Error sampling {container}: {e}")
+            latency = 0
+            status = 'error'
+            get_samples(container).append(timestamp, 0, 0, 0, 0, 0, 0, status)
+        rows.append((container, snapshot['cpu'], snapshot['memory_percent'], latency, status))
+
+    if history_store is not None and rows:
+        try:
+            history_store.record(timestamp, rows)
+        except Exception as e:
+            print(f"Error writing history: {e}")
+
+def build_snapshot(container):
+    """Full state for a new /api/stream subscriber"""
+    return format_event('snapshot', {
+        'container': container,
+        'capacity': SAMPLE_CAPACITY,
+        'stats': get_container_stats(container),
+        'alerts': get_recent_alerts(),
+        'history': get_metrics_history(container),
+        'uptime': get_uptime_data(container),
+        'latency': get_latency_data(container),
+    })
+
+def publish_sample(container):
+    """Send the latest sample to stream subscribers as one compact delta"""
+    broadcaster = get_broadcaster(container)
+    # Nobody is watching: skip the work, a new subscriber builds its own snapshot
+    if not len(broadcaster):
+        broadcaster.clear_snapshot()
+        return
+
+    sample = get_samples(container).latest()
+    if sample is None:
+        return
+    stats = get_container_stats(container)
+    alerts = get_recent_alerts()
+    history = get_metrics_history(container)
+    published = last_published.setdefault(container, {'alerts': None, 'history_timestamp': None})
+
+    delta = {
+        'timestamp': format_timestamp(sample['timestamp']),
+        'stats': stats,
+        'uptime': sample['uptime'],
     }
+    if alerts != published['alerts']:
+        delta['alerts'] = alerts
+        published['alerts'] = alerts
 
-def convert_to_mb(mem_str):
-    """Convert memory string to MB regardless of unit (MiB, GiB)"""
-    try:
-        if 'MiB' in mem_str:
-            return float(mem_str.replace('MiB', '').strip())
-        elif 'GiB' in mem_str:
-            return float(mem_str.replace('GiB', '').strip()) * 1024
-        else:
-            # Try to parse as a plain number
-            return float(mem_str.strip())
-    except:
-        return 0
+    # Only CSV rows written since the previous delta
+    timestamps = [row['timestamp'] for row in history]
+    last_timestamp = published['history_timestamp']
+    if last_timestamp in timestamps:
+        new_rows = history[timestamps.index(last_timestamp) + 1:]
+    else:
+        new_rows = history
+    if new_rows:
+        delta['history'] = new_rows
+        delta['history_window'] = metrics_reader.window
+        published['history_timestamp'] = new_rows[-1]['timestamp']
+
+    # The next subscriber builds a fresh snapshot, so none is built per sample
+    broadcaster.publish(format_event('sample', delta))
 
-def check_app_response_time():
+def sampler_loop():
+    """Sample every container each collection_frequency seconds"""
+    last_discovery = 0
+    while True:
+        if time.time() - last_discovery >= DISCOVERY_INTERVAL:
+            refresh_containers()
+            last_discovery = time.time()
+        take_sample()
+        for container in monitored_containers():
+            try:
+                publish_sample(container)
+            except Exception as e:
+                print(f"Error publishing sample for {container}: {e}")
+        time.sleep(collection_frequency)
+
+def format_timestamp(epoch):
+    return datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S')
+
+def get_container_stats(container):
+    """Get current container statistics from the latest sample"""
+    sample = get_samples(container).latest()
+    if sample is None:
+        return {
+            'cpu': 0,
+            'memory_percent': 0,
+            'memory_used': 0,
+            'memory_limit': 0,
+            'status': 'error',
+            'response_time': 0
+        }
+    return {
+        'cpu': sample['cpu'],
+        'memory_percent': sample['memory_percent'],
+        'memory_used': f"{sample['memory_used']:.2f}",
+        'memory_limit': f"{sample['memory_limit']:.2f}",
+        'status': sample['status'],
+        'response_time': sample['latency']
+    }
+
+def check_app_response_time(container):
     """Check application response time in milliseconds"""
+    url = f"http://{container}/health"
+    start_time = time.perf_counter()
     try:
-        # Record start time in milliseconds
-        start_time = time.time() * 1000
-        
-        # Make HTTP request to health endpoint
-        url = f"http://{CONTAINER_NAME}/health"
-        cmd = ["curl", "-s", "-o", "/dev/null", "-w", "%{time_total}", "-m", "5", url]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            # Convert to milliseconds
-            response_time = float(result.stdout) * 1000
-            return response_time
-        else:
-            return 0
+        with urllib.request.urlopen(url, timeout=PROBE_TIMEOUT) as response:
+            response.read()
+    except urllib.error.HTTPError:
+        # The app answered, just not with a 2xx - still a valid timing
+        pass
     except Exception as e:
-        print(f"Error checking response time: {e}")
+        print(f"Error checking response time for {container}: {e}")
         return 0
+    # Convert to milliseconds
+    return (time.perf_counter() - start_time) * 1000
 
-def update_uptime_data(uptime_value, status):
-    """Update uptime data array with timestamp and status"""
-    global uptime_data
-    
-    # Add current uptime value with timestamp
-    timestamp = datetime.now()
-    uptime_data.append({
-        'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-        'value': uptime_value,
-        'status': status
-    })
-    
-    # Keep only the last 100 data points
-    if len(uptime_data) > 100:
-        uptime_data = uptime_data[-100:]
+def get_uptime_data(container):
+    """Uptime series for the uptime chart"""
+    return [{
+        'timestamp': format_timestamp(sample['timestamp']),
+        'value': sample['uptime'],
+        'status': sample['status']
+    } for sample in get_samples(container).rows()]
 
-def update_latency_data(latency_value):
-    """Update latency data array with timestamp"""
-    global latency_data
-    
-    # Add current latency value with timestamp
-    timestamp = datetime.now()
-    latency_data.append({
-        'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-        'value': latency_value
-    })
-    
-    # Keep only the last 100 data points
-    if len(latency_data) > 100:
-        latency_data = latency_data[-100:]
-
-def get_metrics_history():
-    """Get historical metrics from CSV file"""
-    metrics = []
-    if os.path.exists(METRICS_FILE):
-        try:
-            with open(METRICS_FILE, 'r') as f:
-                reader = csv.reader(f)
-                # Skip header
-                next(reader, None)
-                for row in reader:
-                    if len(row) >= 6:
-                        metrics.append({
-                            'timestamp': row[0],
-                            'cpu_percent': row[1],
-                            'memory_used': row[2],
-                            'memory_percent': row[3],
-                            'response_time': row[4],
-                            'status': row[5]
-                        })
-            # Return last 50 entries
-            return metrics[-50:] if len(metrics) > 50 else metrics
-        except Exception as e:
-            print(f"Error reading metrics file: {e}")
+def get_latency_data(container):
+    """Latency series for the latency chart"""
+    return [{
+        'timestamp': format_timestamp(sample['timestamp']),
+        'value': sample['latency']
+    } for sample in get_samples(container).rows()]
+
+def get_metrics_history(container):
+    """Get the most recent metrics rows for a container from the CSV file"""
+    try:
+        return metrics_reader.rows(container)
+    except Exception as e:
+        print(f"Error reading metrics file: {e}")
     return []
 
 def get_recent_alerts():
-    """Get recent alerts"""
-    alerts = []
-    if os.path.exists(ALERTS_FILE):
-        try:
-            with open(ALERTS_FILE, 'r') as f:
-                lines = f.readlines()
-            # Return last 10 alerts
-            return [line.strip() for line in lines[-10:]]
-        except:
-            pass
-    return []
+    """Get the last 10 alerts, reading only the end of the alert log"""
+    try:
+        stat = os.stat(ALERTS_FILE)
+    except OSError:
+        return []
+    key = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with alerts_lock:
+        if key != alerts_cache['key']:
+            try:
+                alerts_cache['alerts'] = [line.strip() for line in last_lines(ALERTS_FILE, 10)]
+                alerts_cache['key'] = key
+            except OSError as e:
+                print(f"Error reading alerts file: {e}")
+                return []
+        return list(alerts_cache['alerts'])
 
 @app.route('/')
 def dashboard():
+    container = resolve_container() or default_container()
     return '''
 <!DOCTYPE html>
 <html>
@@ -402,9 +503,10 @@ def dashboard():
         <div class="header">
             <div>
                 <h1>Container Monitor Dashboard</h1>
-                <p>Real-time monitoring for ''' + CONTAINER_NAME + '''</p>
+                <p>Real-time monitoring for ''' + html.escape(container) + '''</p>
             </div>
             <div>
+                <select id="container-select" onchange="selectContainer(this.value)" style="display: none;"></select>
                 <button onclick="toggleSettings()">⚙️ Settings</button>
             </div>
         </div>
@@ -472,9 +574,54 @@ def dashboard():
                 <div id="alerts-list">No alerts</div>
             </div>
         </div>
+        
+        <!-- Hourly rollups for the last 24 hours from the history store -->
+        <div class="hourly-stats-container">
+            <h3 class="chart-title">Hourly Statistics (last 24h)</h3>
+            <table class="hourly-stats-table">
+                <thead>
+                    <tr>
+                        <th>Hour</th>
+                        <th>Avg CPU</th>
+                        <th>Max CPU</th>
+                        <th>Avg Memory</th>
+                        <th>p95 Response Time</th>
+                        <th>Uptime</th>
+                    </tr>
+                </thead>
+                <tbody id="hourly-stats-body">
+                    <tr><td colspan="6">No data yet</td></tr>
+                </tbody>
+            </table>
+        </div>
     </div>
     
     <script>
+        // Container shown on this page, passed to every API call
+        const CONTAINER = ''' + json.dumps(container) + ''';
+        const containerQuery = 'container=' + encodeURIComponent(CONTAINER);
+        
+        // Fill the container picker when more than one container is monitored
+        function loadContainers() {
+            fetch('/api/containers')
+                .then(response => response.json())
+                .then(containers => {
+                    const select = document.getElementById('container-select');
+                    select.innerHTML = containers.map(item => {
+                        const option = document.createElement('option');
+                        option.value = item.name;
+                        option.textContent = `${item.name} (${item.status})`;
+                        option.selected = item.name === CONTAINER;
+                        return option.outerHTML;
+                    }).join('');
+                    select.style.display = containers.length > 1 ? 'inline-block' : 'none';
+                });
+        }
+        
+        function selectContainer(name) {
+            window.location.search = '?container=' + encodeURIComponent(name);
+        }
+        
         // Initialize Charts
         const metricsCtx = document.getElementById('metrics-chart').getContext('2d');
         const metricsChart = new Chart(metricsCtx, {
@@ -582,117 +729,211 @@ def dashboard():
             .then(data => {
                 alert('Settings updated successfully!');
                 updateInterval = data.collection_frequency * 1000;
-                clearInterval(dashboardInterval);
-                dashboardInterval = setInterval(updateDashboard, updateInterval);
+                // The stream is paced by the server, only polling needs a new timer
+                if (dashboardInterval !== null) {
+                    clearInterval(dashboardInterval);
+                    dashboardInterval = setInterval(updateDashboard, updateInterval);
+                }
             });
         }
         
-        // Update dashboard
+        // Render the metric cards
+        function renderStats(data) {
+            // Update status
+            const statusIndicator = document.getElementById('status-indicator');
+            const statusText = document.getElementById('container-status');
+            
+            if (data.status === 'running') {
+                statusIndicator.className = 'status-indicator status-running';
+                statusText.textContent = 'Running';
+            } else {
+                statusIndicator.className = 'status-indicator status-stopped';
+                statusText.textContent = 'Stopped';
+            }
+            
+            // Update CPU
+            document.getElementById('cpu-value').textContent = data.cpu.toFixed(1) + '%';
+            document.getElementById('cpu-gauge').style.width = Math.min(data.cpu, 100) + '%';
+            
+            // Update Memory - ensure percentage is between 0-100%
+            const memoryPercent = Math.min(Math.max(data.memory_percent, 0), 100);
+            document.getElementById('memory-value').textContent = memoryPercent.toFixed(1) + '%';
+            document.getElementById('memory-gauge').style.width = memoryPercent + '%';
+            document.getElementById('memory-details').textContent = 
+                `${data.memory_used} MB / ${data.memory_limit} MB`;
+                
+            // Update Response Time
+            document.getElementById('response-time').textContent = 
+                `${Math.round(data.response_time)} ms`;
+        }
+        
+        // Render alerts in the 4th quadrant
+        function renderAlerts(alerts) {
+            const alertsList = document.getElementById('alerts-list');
+            if (alerts.length === 0) {
+                alertsList.innerHTML = 'No recent alerts';
+            } else {
+                alertsList.innerHTML = alerts.map(alert => 
+                    `<div class="alert-item">${alert}</div>`
+                ).join('');
+            }
+        }
+        
+        // Render resource metrics chart
+        function renderHistory(history) {
+            const timestamps = history.map(item => 
+                new Date(item.timestamp).toLocaleTimeString());
+            const cpuData = history.map(item => parseFloat(item.cpu_percent));
+            const memoryData = history.map(item => parseFloat(item.memory_percent));
+            
+            metricsChart.data.labels = timestamps;
+            metricsChart.data.datasets[0].data = cpuData;
+            metricsChart.data.datasets[1].data = memoryData;
+            metricsChart.update();
+        }
+        
+        // Render uptime chart - with binary up/down status
+        function renderUptime(uptimeData) {
+            const timestamps = uptimeData.map(item => 
+                new Date(item.timestamp).toLocaleTimeString());
+            
+            // Convert status to binary (1 for running, 0 for any other status)
+            const statusData = uptimeData.map(item => 
+                item.status === 'running' ? 1 : 0);
+            
+            uptimeChart.data.labels = timestamps;
+            uptimeChart.data.datasets[0].data = statusData;
+            uptimeChart.update();
+        }
+        
+        // Render latency chart
+        function renderLatency(latencyData) {
+            const timestamps = latencyData.map(item => 
+                new Date(item.timestamp).toLocaleTimeString());
+            const values = latencyData.map(item => parseFloat(item.value));
+            
+            latencyChart.data.labels = timestamps;
+            latencyChart.data.datasets[0].data = values;
+            latencyChart.update();
+        }
+        
+        // Poll every endpoint (fallback for browsers without EventSource)
         function updateDashboard() {
-            fetch('/api/stats')
-                .then(response => response.json())
-                .then(data => {
-                    // Update status
-                    const statusIndicator = document.getElementById('status-indicator');
-                    const statusText = document.getElementById('container-status');
-                    
-                    if (data.status === 'running') {
-                        statusIndicator.className = 'status-indicator status-running';
-                        statusText.textContent = 'Running';
-                    } else {
-                        statusIndicator.className = 'status-indicator status-stopped';
-                        statusText.textContent = 'Stopped';
-                    }
-                    
-                    // Update CPU
-                    document.getElementById('cpu-value').textContent = data.cpu.toFixed(1) + '%';
-                    document.getElementById('cpu-gauge').style.width = Math.min(data.cpu, 100) + '%';
-                    
-                    // Update Memory - ensure percentage is between 0-100%
-                    const memoryPercent = Math.min(Math.max(data.memory_percent, 0), 100);
-                    document.getElementById('memory-value').textContent = memoryPercent.toFixed(1) + '%';
-                    document.getElementById('memory-gauge').style.width = memoryPercent + '%';
-                    document.getElementById('memory-details').textContent = 
-                        `${data.memory_used} MB / ${data.memory_limit} MB`;
-                        
-                    // Update Response Time
-                    document.getElementById('response-time').textContent = 
-                        `${Math.round(data.response_time)} ms`;
-                });
+            fetch(`/api/stats?${containerQuery}`).then(response => response.json()).then(renderStats);
+            fetch('/api/alerts').then(response => response.json()).then(renderAlerts);
+            fetch(`/api/history?${containerQuery}`).then(response => response.json()).then(renderHistory);
+            fetch(`/api/uptime?${containerQuery}`).then(response => response.json()).then(renderUptime);
+            fetch(`/api/latency?${containerQuery}`).then(response => response.json()).then(renderLatency);
+        }
+        
+        // Live state kept in the page while streaming
+        let sampleCapacity = 100;
+        let historyRows = [];
+        let uptimeRows = [];
+        let latencyRows = [];
+        
+        // Receive one snapshot on connect, then one small delta per sample
+        function startStream() {
+            const source = new EventSource(`/api/stream?${containerQuery}`);
             
-            // Update alerts in the 4th quadrant
-            fetch('/api/alerts')
-                .then(response => response.json())
-                .then(alerts => {
-                    const alertsList = document.getElementById('alerts-list');
-                    if (alerts.length === 0) {
-                        alertsList.innerHTML = 'No recent alerts';
-                    } else {
-                        alertsList.innerHTML = alerts.map(alert => 
-                            `<div class="alert-item">${alert}</div>`
-                        ).join('');
-                    }
-                });
+            source.addEventListener('snapshot', event => {
+                const snapshot = JSON.parse(event.data);
+                sampleCapacity = snapshot.capacity;
+                historyRows = snapshot.history;
+                uptimeRows = snapshot.uptime;
+                latencyRows = snapshot.latency;
+                renderStats(snapshot.stats);
+                renderAlerts(snapshot.alerts);
+                renderHistory(historyRows);
+                renderUptime(uptimeRows);
+                renderLatency(latencyRows);
+            });
             
-            // Update resource metrics chart
-            fetch('/api/history')
-                .then(response => response.json())
-                .then(history => {
-                    const timestamps = history.map(item => 
-                        new Date(item.timestamp).toLocaleTimeString());
-                    const cpuData = history.map(item => parseFloat(item.cpu_percent));
-                    const memoryData = history.map(item => parseFloat(item.memory_percent));
-                    
-                    metricsChart.data.labels = timestamps;
-                    metricsChart.data.datasets[0].data = cpuData;
-                    metricsChart.data.datasets[1].data = memoryData;
-                    metricsChart.update();
-                });
+            source.addEventListener('sample', event => {
+                const sample = JSON.parse(event.data);
+                renderStats(sample.stats);
                 
-            // Update uptime chart - with binary up/down status
-            fetch('/api/uptime')
-                .then(response => response.json())
-                .then(uptimeData => {
-                    const timestamps = uptimeData.map(item => 
-                        new Date(item.timestamp).toLocaleTimeString());
-                    
-                    // Convert status to binary (1 for running, 0 for any other status)
-                    const statusData = uptimeData.map(item => 
-                        item.status === 'running' ? 1 : 0);
-                    
-                    uptimeChart.data.labels = timestamps;
-                    uptimeChart.data.datasets[0].data = statusData;
-                    uptimeChart.update();
-                });
+                uptimeRows.push({timestamp: sample.timestamp, value: sample.uptime, status: sample.stats.status});
+                latencyRows.push({timestamp: sample.timestamp, value: sample.stats.response_time});
+                uptimeRows = uptimeRows.slice(-sampleCapacity);
+                latencyRows = latencyRows.slice(-sampleCapacity);
+                renderUptime(uptimeRows);
+                renderLatency(latencyRows);
                 
-            // Update latency chart
-            fetch('/api/latency')
+                if (sample.alerts) {
+                    renderAlerts(sample.alerts);
+                }
+                if (sample.history) {
+                    // Skip rows the snapshot already contained
+                    const last = historyRows.length ? historyRows[historyRows.length - 1].timestamp : '';
+                    const newRows = sample.history.filter(row => row.timestamp > last);
+                    historyRows = historyRows.concat(newRows).slice(-sample.history_window);
+                    renderHistory(historyRows);
+                }
+            });
+        }
+        
+        // Update hourly statistics table from the 1h rollups
+        function updateHourlyStats() {
+            const now = Date.now() / 1000;
+            fetch(`/api/history?${containerQuery}&from=${now - 86400}&to=${now}&step=3600`)
                 .then(response => response.json())
-                .then(latencyData => {
-                    const timestamps = latencyData.map(item => 
-                        new Date(item.timestamp).toLocaleTimeString());
-                    const values = latencyData.map(item => parseFloat(item.value));
-                    
-                    latencyChart.data.labels = timestamps;
-                    latencyChart.data.datasets[0].data = values;
-                    latencyChart.update();
+                .then(history => {
+                    const body = document.getElementById('hourly-stats-body');
+                    if (!history.points || history.points.length === 0) {
+                        body.innerHTML = '<tr><td colspan="6">No data yet</td></tr>';
+                        return;
+                    }
+                    body.innerHTML = history.points.slice().reverse().map(point => `
+                        <tr>
+                            <td>${new Date(point.timestamp * 1000).toLocaleString()}</td>
+                            <td>${point.cpu.avg.toFixed(1)}%</td>
+                            <td>${point.cpu.max.toFixed(1)}%</td>
+                            <td>${point.memory_percent.avg.toFixed(1)}%</td>
+                            <td>${Math.round(point.latency.p95)} ms</td>
+                            <td>
+                                <div class="uptime-indicator">
+                                    <div class="uptime-fill" style="width: ${point.uptime * 100}%"></div>
+                                </div>
+                            </td>
+                        </tr>`).join('');
                 });
         }
         
         // Initial update interval
         let updateInterval = ''' + str(DEFAULT_COLLECTION_FREQUENCY * 1000) + ''';
         
-        // Update dashboard initially and set interval
-        updateDashboard();
-        let dashboardInterval = setInterval(updateDashboard, updateInterval);
+        // Prefer the push stream, fall back to polling
+        let dashboardInterval = null;
+        if (window.EventSource) {
+            startStream();
+        } else {
+            updateDashboard();
+            dashboardInterval = setInterval(updateDashboard, updateInterval);
+        }
+        
+        loadContainers();
+        
+        // Hourly rollups change slowly, refresh them once a minute
+        updateHourlyStats();
+        setInterval(updateHourlyStats, 60000);
     </script>
 </body>
 </html>
 '''
 
+@app.route('/api/containers')
+def api_containers():
+    """Every monitored container with its latest stats"""
+    return jsonify([dict(get_container_stats(container), name=container)
+                    for container in monitored_containers()])
+
 @app.route('/api/stats')
 def api_stats():
-    return jsonify(get_container_stats())
+    container = resolve_container()
+    if container is None:
+        return unknown_container()
+    return jsonify(get_container_stats(container))
 
 @app.route('/api/alerts')
 def api_alerts():
@@ -700,15 +941,53 @@ def api_alerts():
 
 @app.route('/api/history')
 def api_history():
-    return jsonify(get_metrics_history())
+    container = resolve_container()
+    if container is None:
+        return unknown_container()
+
+    # Without a range keep returning the latest raw rows from the CSV
+    if not any(arg in request.args for arg in ('from', 'to', 'step')):
+        return jsonify(get_metrics_history(container))
+
+    if history_store is None:
+        return jsonify({'status': 'error', 'message': 'History store is not running'}), 503
+    try:
+        end = float(request.args.get('to', time.time()))
+        start = float(request.args.get('from', end - 3600))
+        step = request.args.get('step')
+        step = float(step) if step else None
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'from, to and step must be numbers (epoch seconds)'}), 400
+    if start >= end:
+        return jsonify({'status': 'error', 'message': 'from must be before to'}), 400
+
+    return jsonify(history_store.query(container, start, end, step))
 
 @app.route('/api/uptime')
 def api_uptime():
-    return jsonify(uptime_data)
+    container = resolve_container()
+    if container is None:
+        return unknown_container()
+    return jsonify(get_uptime_data(container))
 
 @app.route('/api/latency')
 def api_latency():
-    return jsonify(latency_data)
+    container = resolve_container()
+    if container is None:
+        return unknown_container()
+    return jsonify(get_latency_data(container))
+
+@app.route('/api/stream')
+def api_stream():
+    """Server-Sent Events: a snapshot on connect, then one delta per sample"""
+    container = resolve_container()
+    if container is None:
+        return unknown_container()
+    broadcaster = get_broadcaster(container)
+    subscriber = broadcaster.subscribe(lambda: build_snapshot(container))
+    return Response(broadcaster.stream(subscriber),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/api/settings', methods=['POST'])
 def api_settings():
@@ -729,34 +1008,11 @@ def api_settings():
     return jsonify({'status': 'error', 'message': 'Missing required parameters'}), 400
 
 if __name__ == '__main__':
-    # Initialize with varied uptime data to demonstrate proper tracking
-    now = datetime.now()
-    
-    # Initialize with some recent uptime and latency data points
-    for i in range(10):
-        timestamp = (now - timedelta(minutes=10-i)).strftime('%Y-%m-%d %H:%M:%S')
-        # Create more realistic initial data with variations
-        if i < 3:
-            uptime_data.append({
-                'timestamp': timestamp, 
-                'value': 0, 
-                'status': 'stopped'
-            })  # Show downtime at start
-        elif i < 7:
-            uptime_data.append({
-                'timestamp': timestamp, 
-                'value': 70, 
-                'status': 'running'
-            })  # Show restart/partial uptime
-        else:
-            uptime_data.append({
-                'timestamp': timestamp, 
-                'value': 100, 
-                'status': 'running'
-            })  # Show full uptime
-            
-        # Add varied latency data
-        latency_value = 20 + (i * 5) % 30  # Vary between 20-50ms
-        latency_data.append({'timestamp': timestamp, 'value': latency_value})
-    
-    app.run(host='0.0.0.0', port=8001, debug=True)
\ No newline at end of file
+    history_store = HistoryStore(HISTORY_DB)
+
+    # Start background collection; the reloader is disabled so these threads
+    # are not started twice
+    stats_collector.start()
+    threading.Thread(target=sampler_loop, daemon=True).start()
+
+    app.run(host='0.0.0.0', port=8001, debug=True, use_reloader=False)
\ No newline at end of file
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Docker Engine API stats collector.
+
+Keeps one long-lived streaming connection to /containers/<name>/stats per
+container over the Docker unix socket and turns the raw cgroup counters into
+the same CPU and memory figures `docker stats` prints. All streams fan in to
+one shared table of latest snapshots, which the dashboard reads from memory
+instead of shelling out to the docker CLI. Containers can be added and
+removed while the collector runs, e.g. from a label selector. Stopped
+containers are re-inspected with a growing delay, and the Docker events
+stream wakes their thread as soon as one starts again.
+"""
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+from urllib.parse import quote
+
+DOCKER_SOCKET = os.getenv('DOCKER_SOCKET', '/var/run/docker.sock')
+# The stats stream emits roughly one sample per second, so a silent socket
+# for this long means the daemon or connection is gone
+STREAM_TIMEOUT = 30
+RECONNECT_DELAY = 2
+# Stopped (or unreachable) containers are checked at most this rarely; a
+# start event still wakes them right away
+MAX_RECONNECT_DELAY = 60
+# Events that mean a container may be running again
+WAKE_EVENTS = ['start', 'restart', 'unpause']
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTPConnection that talks to the Docker daemon over its unix socket"""
+
+    def __init__(self, socket_path=DOCKER_SOCKET, timeout=STREAM_TIMEOUT):
+        super().__init__('localhost', timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+def calculate_cpu_percent(sample):
+    """CPU percentage from a stats sample, same formula as the docker CLI"""
+    cpu_stats = sample.get('cpu_stats') or {}
+    precpu_stats = sample.get('precpu_stats') or {}
+
+    cpu_delta = ((cpu_stats.get('cpu_usage') or {}).get('total_usage', 0)
+                 - (precpu_stats.get('cpu_usage') or {}).get('total_usage', 0))
+    system_delta = (cpu_stats.get('system_cpu_usage', 0)
+                    - precpu_stats.get('system_cpu_usage', 0))
+
+    # online_cpus is missing on old daemons, fall back to the per-cpu list
+    online_cpus = cpu_stats.get('online_cpus') or \
+        len((cpu_stats.get('cpu_usage') or {}).get('percpu_usage') or []) or 1
+
+    if cpu_delta > 0 and system_delta > 0:
+        return (cpu_delta / system_delta) * online_cpus * 100.0
+    return 0.0
+
+
+def calculate_memory(sample):
+    """Return (used_mb, limit_mb, percent) from a stats sample"""
+    memory_stats = sample.get('memory_stats') or {}
+    usage = memory_stats.get('usage', 0)
+    limit = memory_stats.get('limit', 0)
+    detail = memory_stats.get('stats') or {}
+
+    # Page cache is not counted as used memory: cgroup v1 reports it as
+    # total_inactive_file, cgroup v2 as inactive_file
+    inactive = detail.get('total_inactive_file', detail.get('inactive_file', 0))
+    if inactive < usage:
+        usage -= inactive
+
+    used_mb = usage / (1024 * 1024)
+    limit_mb = limit / (1024 * 1024)
+    percent = (used_mb / limit_mb) * 100 if limit_mb > 0 else 0
+    return used_mb, limit_mb, percent
+
+
+def parse_docker_time(value):
+    """Parse a Docker RFC 3339 timestamp (nanosecond precision) to datetime"""
+    try:
+        return datetime.strptime(value[:19], '%Y-%m-%dT%H:%M:%S')
+    except (TypeError, ValueError):
+        return None
+
+
+def list_containers(label=None, socket_path=DOCKER_SOCKET):
+    """Names of all containers (running or not), optionally matching a label
+
+    `label` is a Docker label filter such as "monitor=true" or "monitor".
+    """
+    path = '/containers/json?all=1'
+    if label:
+        path += '&filters=' + quote(json.dumps({'label': [label]}))
+    conn = UnixHTTPConnection(socket_path)
+    try:
+        conn.request('GET', path)
+        response = conn.getresponse()
+        body = response.read()
+        if response.status != 200:
+            raise http.client.HTTPException(f'container list returned {response.status}')
+        return sorted(container['Names'][0].lstrip('/')
+                      for container in json.loads(body) if container.get('Names'))
+    finally:
+        conn.close()
+
+
+def empty_stats():
+    return {
+        'cpu': 0.0,
+        'memory_used_mb': 0.0,
+        'memory_limit_mb': 0.0,
+        'memory_percent': 0.0,
+        'status': 'unknown',
+        'started_at': None,
+        'updated_at': None,
+    }
+
+
+class DockerStatsCollector:
+    """Follows the stats stream of each watched container in a background thread"""
+
+    def __init__(self, container_names, socket_path=DOCKER_SOCKET):
+        self.socket_path = socket_path
+        self._lock = threading.Lock()
+        self._initial = list(container_names)
+        self._latest = {}
+        # Per-container stop flags, so a single container can be dropped
+        self._stops = {}
+        # Per-container wake-ups, set by start events (and on stop)
+        self._wakes = {}
+        self._stopped = False
+
+    def start(self):
+        threading.Thread(target=self._follow_events, name='docker-events',
+                         daemon=True).start()
+        for name in self._initial:
+            self.watch(name)
+
+    def stop(self):
+        with self._lock:
+            self._stopped = True
+            for stop in self._stops.values():
+                stop.set()
+            for wake in self._wakes.values():
+                wake.set()
+
+    def names(self):
+        with self._lock:
+            return list(self._latest)
+
+    def watch(self, name):
+        """Start following a container (no-op if it is already watched)"""
+        with self._lock:
+            if self._stopped or name in self._stops:
+                return
+            stop = threading.Event()
+            wake = threading.Event()
+            self._stops[name] = stop
+            self._wakes[name] = wake
+            self._latest[name] = empty_stats()
+        threading.Thread(target=self._follow, args=(name, stop, wake),
+                         name=f'stats-{name}', daemon=True).start()
+
+    def unwatch(self, name):
+        """Stop following a container and forget its stats"""
+        with self._lock:
+            stop = self._stops.pop(name, None)
+            wake = self._wakes.pop(name, None)
+            self._latest.pop(name, None)
+        if stop is not None:
+            stop.set()
+            wake.set()
+
+    def sync(self, names):
+        """Watch exactly `names`: start new containers, drop missing ones"""
+        wanted = set(names)
+        for name in set(self.names()) - wanted:
+            self.unwatch(name)
+        for name in sorted(wanted):
+            self.watch(name)
+
+    def get(self, name):
+        """Latest snapshot for a container (a copy, safe to hand out)"""
+        with self._lock:
+            return dict(self._latest.get(name) or empty_stats())
+
+    def _update(self, name, **fields):
+        with self._lock:
+            if name in self._latest:
+                self._latest[name].update(fields, updated_at=datetime.now())
+
+    def _inspect(self, name):
+        conn = UnixHTTPConnection(self.socket_path)
+        try:
+            conn.request('GET', f'/containers/{quote(name)}/json')
+            response = conn.getresponse()
+            body = response.read()
+            if response.status == 404:
+                return {'Status': 'not_found'}
+            if response.status != 200:
+                raise http.client.HTTPException(f'inspect returned {response.status}')
+            return json.loads(body).get('State', {})
+        finally:
+            conn.close()
+
+    def _follow_events(self):
+        """Wake the thread of a watched container when it (re)starts"""
+        filters = quote(json.dumps({'type': ['container'], 'event': WAKE_EVENTS}))
+        while not self._stopped:
+            # No timeout: the events stream is silent until something happens
+            conn = UnixHTTPConnection(self.socket_path, timeout=None)
+            try:
+                conn.request('GET', f'/events?filters={filters}')
+                response = conn.getresponse()
+                if response.status != 200:
+                    raise http.client.HTTPException(f'events returned {response.status}')
+                for line in response:
+                    event = json.loads(line)
+                    name = ((event.get('Actor') or {}).get('Attributes') or {}).get('name')
+                    with self._lock:
+                        wake = self._wakes.get(name)
+                    if wake is not None:
+                        wake.set()
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                print(f"Error following docker events: {e}")
+            finally:
+                conn.close()
+            time.sleep(RECONNECT_DELAY)
+
+    def _follow(self, name, stop, wake):
+        delay = RECONNECT_DELAY
+        while not stop.is_set():
+            # Cleared before inspecting, so a start event that comes in
+            # meanwhile cuts the wait below short
+            wake.clear()
+            conn = None
+            try:
+                state = self._inspect(name)
+                status = 'running' if state.get('Status') == 'running' else 'stopped'
+                self._update(name, status=status,
+                             started_at=parse_docker_time(state.get('StartedAt')))
+
+                if status != 'running':
+                    self._update(name, cpu=0.0, memory_used_mb=0.0, memory_percent=0.0)
+                    delay = min(delay * 2, MAX_RECONNECT_DELAY)
+                else:
+                    delay = RECONNECT_DELAY
+                    conn = UnixHTTPConnection(self.socket_path)
+                    conn.request('GET', f'/containers/{quote(name)}/stats?stream=true')
+                    response = conn.getresponse()
+                    if response.status != 200:
+                        raise http.client.HTTPException(f'stats returned {response.status}')
+
+                    # One JSON document per line until the container stops
+                    for line in response:
+                        if stop.is_set():
+                            break
+                        sample = json.loads(line)
+                        # A zero read time means the container went away
+                        if sample.get('read', '').startswith('0001-'):
+                            break
+                        used_mb, limit_mb, mem_percent = calculate_memory(sample)
+                        self._update(name,
+                                     cpu=calculate_cpu_percent(sample),
+                                     memory_used_mb=used_mb,
+                                     memory_limit_mb=limit_mb,
+                                     memory_percent=mem_percent)
+            except (OSError, ValueError, http.client.HTTPException) as e:
+                print(f"Error streaming stats for {name}: {e}")
+                self._update(name, status='error')
+                delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+            wake.wait(delay)
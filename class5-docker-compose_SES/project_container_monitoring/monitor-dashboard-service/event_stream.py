@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events fan-out for the dashboard.
+
+The sampler serializes each message once and the same bytes are queued to
+every subscriber, so the cost per sample does not grow with the number of
+open dashboards. A subscriber that stops reading is dropped; its browser
+reconnects and gets a fresh snapshot.
+"""
+import json
+import queue
+import threading
+
+KEEPALIVE_INTERVAL = 15
+SUBSCRIBER_QUEUE_SIZE = 16
+
+
+def format_event(event, data):
+    """Encode one SSE message with compact JSON data"""
+    payload = json.dumps(data, separators=(',', ':'))
+    return f"event: {event}\ndata: {payload}\n\n".encode('utf-8')
+
+
+class Broadcaster:
+    """Delivers pre-encoded SSE messages to all current subscribers"""
+
+    def __init__(self):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        # Full state as of the last message, sent to new subscribers before
+        # any deltas; built on demand by the first subscriber that needs it
+        self._snapshot = None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, message):
+        """Queue `message` to every subscriber and drop the cached snapshot
+
+        Both happen under one lock, so a new subscriber gets either the old
+        snapshot followed by this message or a new snapshot alone.
+        """
+        with self._lock:
+            self._snapshot = None
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(message)
+            except queue.Full:
+                # Too far behind to catch up with deltas, let it reconnect
+                self.unsubscribe(subscriber)
+
+    def clear_snapshot(self):
+        with self._lock:
+            self._snapshot = None
+
+    def subscribe(self, snapshot_factory=None):
+        """Register a subscriber, queueing the current snapshot first
+
+        If nothing has been published yet (or the snapshot was cleared while
+        nobody was listening), `snapshot_factory()` builds one.
+        """
+        subscriber = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        with self._lock:
+            if self._snapshot is None and snapshot_factory is not None:
+                self._snapshot = snapshot_factory()
+            if self._snapshot is not None:
+                subscriber.put_nowait(self._snapshot)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def stream(self, subscriber):
+        """Generator of SSE bytes for one subscriber, for a streaming response"""
+        try:
+            while True:
+                with self._lock:
+                    if subscriber not in self._subscribers and subscriber.empty():
+                        return
+                try:
+                    yield subscriber.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield b": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Persistent metrics history with precomputed rollups.
+
+Every sample of every container goes into a raw table in a SQLite file.
+When a 1 minute, 5 minute or 1 hour bucket closes, its min/max/avg/p95 are
+computed once and stored in that tier's table. A range query picks the coarsest tier that
+still gives the requested resolution, so it reads at most MAX_POINTS rows
+whatever the range.
+"""
+import math
+import sqlite3
+import threading
+from itertools import groupby
+
+METRICS = ('cpu', 'memory_percent', 'latency')
+
+# Smallest sampling period the dashboard allows, used as the raw "step"
+RAW_STEP = 5
+# Rollup step in seconds -> retention in seconds
+ROLLUP_TIERS = {
+    60: 14 * 86400,
+    300: 90 * 86400,
+    3600: 730 * 86400,
+}
+RAW_RETENTION = 2 * 86400
+# Upper bound on the points returned by a single query
+MAX_POINTS = 1000
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'min': values[0],
+        'max': values[-1],
+        'avg': sum(values) / len(values),
+        'p95': percentile(values, 0.95),
+    }
+
+
+def pick_step(span, step=None):
+    """Coarsest available step that honours `step` and MAX_POINTS over `span`"""
+    wanted = max(step or 0, span / MAX_POINTS)
+    for tier in (RAW_STEP,) + tuple(sorted(ROLLUP_TIERS)):
+        if tier >= wanted:
+            return tier
+    return max(ROLLUP_TIERS)
+
+
+class HistoryStore:
+    """SQLite-backed raw samples plus 1m/5m/1h rollup tables, per container"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+        # Start of the newest bucket already rolled up, per tier
+        self._rolled_up = {step: self._last_bucket(step) for step in ROLLUP_TIERS}
+
+    def _create_tables(self):
+        with self._conn:
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS samples ('
+                'container TEXT NOT NULL, ts REAL NOT NULL, cpu REAL, '
+                'memory_percent REAL, latency REAL, up INTEGER)')
+            self._conn.execute('CREATE INDEX IF NOT EXISTS samples_ts ON samples(ts)')
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS samples_container_ts ON samples(container, ts)')
+            stat_columns = ', '.join(f'{metric}_{stat} REAL'
+                                     for metric in METRICS
+                                     for stat in ('min', 'max', 'avg', 'p95'))
+            for step in ROLLUP_TIERS:
+                self._conn.execute(
+                    f'CREATE TABLE IF NOT EXISTS rollup_{step} ('
+                    f'container TEXT NOT NULL, bucket INTEGER NOT NULL, '
+                    f'count INTEGER, up_count INTEGER, {stat_columns}, '
+                    f'PRIMARY KEY (container, bucket))')
+
+    def _last_bucket(self, step):
+        row = self._conn.execute(f'SELECT MAX(bucket) FROM rollup_{step}').fetchone()
+        return row[0]
+
+    def record(self, timestamp, rows):
+        """Store one sampling round and roll up any buckets it closed
+
+        `rows` holds (container, cpu, memory_percent, latency, status) tuples.
+        All containers share the round's timestamp, so a bucket is complete
+        for every container once the first sample past it arrives.
+        """
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    'INSERT INTO samples (container, ts, cpu, memory_percent, latency, up) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    [(container, timestamp, cpu, memory_percent, latency,
+                      1 if status == 'running' else 0)
+                     for container, cpu, memory_percent, latency, status in rows])
+                for step in ROLLUP_TIERS:
+                    self._roll_up(step, timestamp)
+
+    def _roll_up(self, step, now):
+        """Aggregate every complete bucket of `step` seconds not yet stored"""
+        current = int(now // step) * step
+        last = self._rolled_up[step]
+        start = last + step if last is not None else 0
+        if start >= current:
+            return
+
+        rows = self._conn.execute(
+            'SELECT container, ts, cpu, memory_percent, latency, up FROM samples '
+            'WHERE ts >= ? AND ts < ? ORDER BY container, ts', (start, current)).fetchall()
+
+        def bucket_key(row):
+            return row[0], int(row[1] // step) * step
+
+        for (container, bucket), bucket_rows in groupby(rows, key=bucket_key):
+            bucket_rows = list(bucket_rows)
+            values = [container, bucket, len(bucket_rows), sum(row[5] for row in bucket_rows)]
+            for index, metric in enumerate(METRICS, start=2):
+                stats = summarize([row[index] for row in bucket_rows])
+                values.extend(stats[stat] for stat in ('min', 'max', 'avg', 'p95'))
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO rollup_{step} VALUES '
+                f'({", ".join("?" * len(values))})', values)
+
+        self._rolled_up[step] = current - step
+
+        # Hourly rollups close rarely, a good moment to apply retention
+        if step == max(ROLLUP_TIERS):
+            self._prune(now)
+
+    def _prune(self, now):
+        self._conn.execute('DELETE FROM samples WHERE ts < ?', (now - RAW_RETENTION,))
+        for step, retention in ROLLUP_TIERS.items():
+            self._conn.execute(f'DELETE FROM rollup_{step} WHERE bucket < ?',
+                               (now - retention,))
+
+    def query(self, container, start, end, step=None):
+        """Points for `container` between `start` and `end` (epoch seconds)"""
+        step = pick_step(end - start, step)
+        with self._lock:
+            if step == RAW_STEP:
+                rows = self._conn.execute(
+                    'SELECT ts, cpu, memory_percent, latency, up FROM samples '
+                    'WHERE container = ? AND ts >= ? AND ts < ? ORDER BY ts LIMIT ?',
+                    (container, start, end, MAX_POINTS)).fetchall()
+                points = [self._raw_point(row) for row in rows]
+            else:
+                rows = self._conn.execute(
+                    f'SELECT * FROM rollup_{step} '
+                    f'WHERE container = ? AND bucket >= ? AND bucket < ? '
+                    f'ORDER BY bucket LIMIT ?',
+                    (container, int(start // step) * step, end, MAX_POINTS)).fetchall()
+                points = [self._rollup_point(row[1:]) for row in rows]
+        return {'container': container, 'from': start, 'to': end,
+                'step': step, 'points': points}
+
+    @staticmethod
+    def _raw_point(row):
+        point = {'timestamp': row[0], 'count': 1, 'uptime': row[4]}
+        for index, metric in enumerate(METRICS, start=1):
+            point[metric] = {stat: row[index] for stat in ('min', 'max', 'avg', 'p95')}
+        return point
+
+    @staticmethod
+    def _rollup_point(row):
+        point = {'timestamp': row[0], 'count': row[1],
+                 'uptime': row[2] / row[1] if row[1] else 0}
+        for index, metric in enumerate(METRICS):
+            offset = 3 + index * 4
+            point[metric] = dict(zip(('min', 'max', 'avg', 'p95'), row[offset:offset + 4]))
+        return point
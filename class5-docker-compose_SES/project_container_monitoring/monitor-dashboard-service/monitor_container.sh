@@ -21,6 +21,15 @@
 # Example: CONTAINER_NAME="nginx-server" ./monitor.sh
 CONTAINER_NAME="${CONTAINER_NAME:-flask-app}"
 
+# Monitor several containers in one process (comma-separated names) and/or
+# every container carrying a Docker label, e.g. CONTAINER_LABEL="monitor=true"
+# Example: CONTAINER_NAMES="flask-app,db" ./monitor.sh continuous
+CONTAINER_NAMES="${CONTAINER_NAMES:-$CONTAINER_NAME}"
+CONTAINER_LABEL="${CONTAINER_LABEL:-}"
+
+# Number of monitored containers, counted once per pass by monitor_all_containers
+CONTAINER_COUNT=1
+
 # Log file paths - adjust these based on your system requirements
 LOG_FILE="/var/log/container_monitor.log"         # General monitoring logs
 ALERT_LOG="/var/log/container_alerts.log"         # Alert-specific logs
@@ -44,7 +53,7 @@ initialize_logs() {
     
     # If metrics file is empty, add CSV header
     if [ ! -s "$METRICS_FILE" ]; then
-        echo "timestamp,cpu_percent,memory_usage_mb,memory_percent,response_time_ms,status" > "$METRICS_FILE"
+        echo "timestamp,cpu_percent,memory_usage_mb,memory_percent,response_time_ms,status,container" > "$METRICS_FILE"
     fi
 }
 
@@ -74,6 +83,11 @@ send_alert() {
     local message="$2"
     local timestamp=$(date '+%Y-%m-%d %H:%M:%S')
     
+    # Say which container it is about when more than one is monitored
+    if [ "$CONTAINER_COUNT" -gt 1 ]; then
+        message="[$CONTAINER_NAME] $message"
+    fi
+    
     # Log alert to both alert log and console
     echo "[$timestamp] ALERT: $alert_type - $message" | tee -a "$ALERT_LOG"
     
@@ -87,6 +101,17 @@ send_alert() {
 # CONTAINER STATUS FUNCTIONS
 # ========================================
 
+# List the containers to monitor, one per line
+# Combines CONTAINER_NAMES with containers matching CONTAINER_LABEL
+list_containers() {
+    {
+        echo "$CONTAINER_NAMES" | tr ',' '\n'
+        if [ -n "$CONTAINER_LABEL" ]; then
+            docker ps -a --filter "label=$CONTAINER_LABEL" --format '{{.Names}}'
+        fi
+    } | sed 's/^ *//;s/ *$//' | grep -v '^$' | sort -u
+}
+
 # Check if the container is currently running
 # Returns: "running" if container is active, "stopped" otherwise
 check_container_status() {
@@ -192,7 +217,7 @@ monitor_container() {
     
     # Record metrics to CSV file
     local timestamp=$(date '+%Y-%m-%d %H:%M:%S')
-    echo "$timestamp,$cpu,$mem_usage_mb,$mem_percent,$response_time,$app_status" >> "$METRICS_FILE"
+    echo "$timestamp,$cpu,$mem_usage_mb,$mem_percent,$response_time,$app_status,$CONTAINER_NAME" >> "$METRICS_FILE"
     
     # Log current status
     log_message "INFO" "CPU: ${cpu}%, Memory: ${mem_usage_mb}MB (${mem_percent}%), Response Time: ${response_time}ms, Status: $app_status"
@@ -219,6 +244,19 @@ monitor_container() {
     fi
 }
 
+# Run monitor_container once for every monitored container
+monitor_all_containers() {
+    local primary="$CONTAINER_NAME"
+    local containers=$(list_containers)
+    local name
+    CONTAINER_COUNT=$(echo "$containers" | grep -c .)
+    for name in $containers; do
+        CONTAINER_NAME="$name"
+        monitor_container
+    done
+    CONTAINER_NAME="$primary"
+}
+
 # ========================================
 # REPORTING FUNCTIONS
 # ========================================
@@ -403,8 +441,8 @@ live_monitor() {
         echo ""
         echo "Press Ctrl+C to exit"
         
-        # Perform monitoring (logs metrics)
-        monitor_container
+        # Perform monitoring (logs metrics) for every monitored container
+        monitor_all_containers
         
         # Refresh interval
         sleep 2
@@ -422,7 +460,7 @@ main() {
         monitor)
             # Single monitoring check
             initialize_logs
-            monitor_container
+            monitor_all_containers
             ;;
         report)
             # Generate monitoring report
@@ -433,7 +471,7 @@ main() {
             initialize_logs
             log_message "INFO" "Starting continuous monitoring (Ctrl+C to stop)"
             while true; do
-                monitor_container
+                monitor_all_containers
                 sleep 60  # Check every minute
             done
             ;;
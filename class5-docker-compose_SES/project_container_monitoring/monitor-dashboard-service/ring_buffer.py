@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Fixed-capacity time-series store for dashboard samples.
+
+Each column lives in its own preallocated `array`, and a write just
+overwrites the oldest slot. Appending never allocates or re-slices, and
+memory stays the same however long the dashboard runs.
+"""
+import threading
+from array import array
+
+# Status strings are stored as small integer codes
+STATUSES = ('unknown', 'running', 'stopped', 'error')
+STATUS_CODES = {name: code for code, name in enumerate(STATUSES)}
+
+# Column name -> array typecode
+COLUMNS = {
+    'timestamp': 'd',       # epoch seconds
+    'cpu': 'd',             # percent
+    'memory_percent': 'd',
+    'memory_used': 'd',     # MB
+    'memory_limit': 'd',    # MB
+    'latency': 'd',         # ms
+    'uptime': 'd',          # uptime value shown on the dashboard (0-100)
+    'status': 'b',          # index into STATUSES
+}
+
+
+class MetricsRingBuffer:
+    """Array-backed ring buffer holding the last `capacity` samples"""
+
+    def __init__(self, capacity=100):
+        self.capacity = capacity
+        self._columns = {name: array(code, [0] * capacity)
+                         for name, code in COLUMNS.items()}
+        self._next = 0      # slot the next sample is written to
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def append(self, timestamp, cpu, memory_percent, memory_used, memory_limit,
+               latency, uptime, status):
+        with self._lock:
+            slot = self._next
+            columns = self._columns
+            columns['timestamp'][slot] = timestamp
+            columns['cpu'][slot] = cpu
+            columns['memory_percent'][slot] = memory_percent
+            columns['memory_used'][slot] = memory_used
+            columns['memory_limit'][slot] = memory_limit
+            columns['latency'][slot] = latency
+            columns['uptime'][slot] = uptime
+            columns['status'][slot] = STATUS_CODES.get(status, 0)
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def latest(self):
+        """Most recent sample as a dict, or None if nothing was recorded yet"""
+        rows = self.rows(1)
+        return rows[0] if rows else None
+
+    def rows(self, limit=None):
+        """Up to `limit` most recent samples as dicts, oldest first"""
+        with self._lock:
+            count = self._size if limit is None else min(limit, self._size)
+            first = (self._next - count) % self.capacity
+            slots = [(first + i) % self.capacity for i in range(count)]
+            columns = self._columns
+            return [{
+                'timestamp': columns['timestamp'][slot],
+                'cpu': columns['cpu'][slot],
+                'memory_percent': columns['memory_percent'][slot],
+                'memory_used': columns['memory_used'][slot],
+                'memory_limit': columns['memory_limit'][slot],
+                'latency': columns['latency'][slot],
+                'uptime': columns['uptime'][slot],
+                'status': STATUSES[columns['status'][slot]],
+            } for slot in slots]
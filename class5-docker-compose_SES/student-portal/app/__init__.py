@@ -1,17 +1,15 @@
-from flask import Flask, request
+from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from config import Config
-from prometheus_client import make_wsgi_app
 from werkzeug.middleware.dispatcher import DispatcherMiddleware
 from werkzeug.middleware.proxy_fix import ProxyFix
-import time
 from app.logging_config import setup_logging
-from app.metrics import http_requests_total, request_duration_seconds
+from app import metrics
 
 db = SQLAlchemy()
 login_manager = LoginManager()
-logger = setup_logging()
+logger = setup_logging(Config.LOG_ASYNC)
 
 
 def create_app():
@@ -24,36 +22,12 @@ def create_app():
     login_manager.login_view = "auth.login"
 
     # Add Prometheus middleware
-    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/metrics": make_wsgi_app()})
+    app.wsgi_app = DispatcherMiddleware(app.wsgi_app, {"/metrics": metrics.metrics_wsgi_app()})
     app.wsgi_app = ProxyFix(app.wsgi_app)
 
-    @app.before_request
-    def before_request():
-        request.start_time = time.time()
-
-    @app.after_request
-    def after_request(response):
-        if request.path != "/metrics":
-            duration = time.time() - request.start_time
-            endpoint = request.endpoint or "unknown"
-
-            http_requests_total.labels(
-                method=request.method, endpoint=endpoint, status=response.status_code
-            ).inc()
-
-            request_duration_seconds.labels(endpoint=endpoint).observe(duration)
-
-            logger.info(
-                "Request processed",
-                extra={
-                    "method": request.method,
-                    "path": request.path,
-                    "status": response.status_code,
-                    "duration": duration,
-                },
-            )
-
-        return response
+    metrics.init_app(app, logger)
+    with app.app_context():
+        metrics.instrument_engine(db.engine)
 
     with app.app_context():
         from app.routes import routes, auth
@@ -0,0 +1,181 @@
+import csv
+import io
+from datetime import date
+from itertools import islice
+from sqlalchemy.dialects.postgresql import insert
+from app import db
+from app.models.models import Attendance, Student
+
+STATUSES = ("Present", "Absent")
+
+# Rows per INSERT statement (3 parameters each, well under PostgreSQL's limit)
+UPSERT_CHUNK_SIZE = 1000
+
+# Changes to the present/total counters made by one statement on attendance,
+# read from the trigger's transition tables
+SUMMARY_DELTAS = {
+    "insert": "SELECT student_id, date, (status = 'Present')::int AS present, 1 AS total FROM new_rows",
+    "delete": "SELECT student_id, date, -(status = 'Present')::int AS present, -1 AS total FROM old_rows",
+    "update": "SELECT student_id, date, (status = 'Present')::int AS present, 1 AS total FROM new_rows "
+    "UNION ALL "
+    "SELECT student_id, date, -(status = 'Present')::int AS present, -1 AS total FROM old_rows",
+}
+
+# Statement-level, so a roster save or an import updates each summary row
+# once instead of once per attendance row. Rows are locked in key order so
+# concurrent saves can't deadlock.
+SUMMARY_FUNCTION_SQL = """
+CREATE OR REPLACE FUNCTION attendance_summary_{op}() RETURNS trigger AS $$
+BEGIN
+    WITH deltas AS ({deltas}),
+    by_student AS (
+        INSERT INTO student_attendance_summary AS s (student_id, present, total)
+        SELECT student_id, sum(present), sum(total) FROM deltas
+        GROUP BY student_id HAVING sum(present) <> 0 OR sum(total) <> 0
+        ORDER BY student_id
+        ON CONFLICT (student_id) DO UPDATE
+        SET present = s.present + excluded.present, total = s.total + excluded.total
+    )
+    INSERT INTO daily_attendance_summary AS d (date, present, total)
+    SELECT date, sum(present), sum(total) FROM deltas
+    GROUP BY date HAVING sum(present) <> 0 OR sum(total) <> 0
+    ORDER BY date
+    ON CONFLICT (date) DO UPDATE
+    SET present = d.present + excluded.present, total = d.total + excluded.total;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql
+"""
+
+SUMMARY_TRIGGER_SQL = """
+CREATE TRIGGER attendance_summary_{op} AFTER {op} ON attendance
+REFERENCING {tables}
+FOR EACH STATEMENT EXECUTE FUNCTION attendance_summary_{op}()
+"""
+
+SUMMARY_TRANSITION_TABLES = {
+    "insert": "NEW TABLE AS new_rows",
+    "delete": "OLD TABLE AS old_rows",
+    "update": "OLD TABLE AS old_rows NEW TABLE AS new_rows",
+}
+
+
+def upsert_attendance(records):
+    """Insert or update many {student_id, date, status} records.
+
+    One multi-row INSERT ... ON CONFLICT (student_id, date) DO UPDATE per
+    chunk instead of a SELECT and an INSERT/UPDATE per record. Does not
+    commit. Returns the number of rows inserted or changed.
+    """
+    records = iter(records)
+    written = 0
+    while True:
+        # A key can only be written once per statement, the last one wins
+        chunk = {}
+        for record in islice(records, UPSERT_CHUNK_SIZE):
+            chunk[(record["student_id"], record["date"])] = record
+        if not chunk:
+            return written
+
+        stmt = insert(Attendance).values(list(chunk.values()))
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_attendance_student_id_date",
+            set_={"status": stmt.excluded.status},
+            # Re-saving an unchanged roster doesn't rewrite the rows
+            where=Attendance.status != stmt.excluded.status,
+        )
+        written += db.session.execute(stmt).rowcount
+
+
+def parse_record(raw):
+    """Validate one imported record, raises ValueError"""
+    if not isinstance(raw, dict):
+        raise ValueError("expected an object with student_id, date and status")
+    try:
+        student_id = int(raw["student_id"])
+        day = date.fromisoformat(str(raw["date"]).strip())
+        status = str(raw["status"]).strip().capitalize()
+    except KeyError as e:
+        raise ValueError(f"missing {e.args[0]}")
+    except (TypeError, ValueError):
+        raise ValueError("student_id must be a number and date YYYY-MM-DD")
+    if status not in STATUSES:
+        raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+    return {"student_id": student_id, "date": day, "status": status}
+
+
+def read_import(request):
+    """Raw records from a JSON list or a CSV (student_id,date,status) body or upload"""
+    if request.is_json:
+        data = request.get_json()
+        if not isinstance(data, list):
+            raise ValueError("Expected a JSON list of records")
+        return data
+
+    upload = request.files.get("file")
+    stream = upload.stream if upload else request.stream
+    # Read the CSV as it arrives instead of loading the whole body
+    return csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+
+
+def import_batches(raw_records, errors):
+    """Valid records, in batches of UPSERT_CHUNK_SIZE for existing students.
+
+    Invalid records are skipped and described in `errors`.
+    """
+    numbered = enumerate(raw_records, start=1)
+    while True:
+        items = list(islice(numbered, UPSERT_CHUNK_SIZE))
+        if not items:
+            return
+
+        batch = []
+        for number, raw in items:
+            try:
+                batch.append((number, parse_record(raw)))
+            except ValueError as e:
+                errors.append(f"Record {number}: {e}")
+
+        ids = {record["student_id"] for _, record in batch}
+        known = {id for (id,) in db.session.query(Student.id).filter(Student.id.in_(ids))}
+        valid = []
+        for number, record in batch:
+            if record["student_id"] in known:
+                valid.append(record)
+            else:
+                errors.append(f"Record {number}: unknown student {record['student_id']}")
+        yield valid
+
+
+def summary_triggers_installed():
+    return db.session.execute(db.text(
+        "SELECT count(*) FROM pg_trigger WHERE tgname LIKE 'attendance_summary_%'"
+    )).scalar() == len(SUMMARY_DELTAS)
+
+
+def install_summary_triggers():
+    """(Re)create the triggers that maintain the attendance summaries"""
+    for op, deltas in SUMMARY_DELTAS.items():
+        db.session.execute(db.text(SUMMARY_FUNCTION_SQL.format(op=op, deltas=deltas)))
+        db.session.execute(db.text(f"DROP TRIGGER IF EXISTS attendance_summary_{op} ON attendance"))
+        db.session.execute(db.text(SUMMARY_TRIGGER_SQL.format(
+            op=op, tables=SUMMARY_TRANSITION_TABLES[op])))
+    db.session.commit()
+
+
+def rebuild_summaries():
+    """Recompute the attendance summaries from every attendance record"""
+    # Holds off attendance writes (not reads) until the summaries are rebuilt
+    db.session.execute(db.text("LOCK TABLE attendance IN SHARE MODE"))
+    db.session.execute(db.text("TRUNCATE student_attendance_summary, daily_attendance_summary"))
+    db.session.execute(db.text("""
+        INSERT INTO student_attendance_summary (student_id, present, total)
+        SELECT student_id, count(*) FILTER (WHERE status = 'Present'), count(*)
+        FROM attendance GROUP BY student_id
+    """))
+    db.session.execute(db.text("""
+        INSERT INTO daily_attendance_summary (date, present, total)
+        SELECT date, count(*) FILTER (WHERE status = 'Present'), count(*)
+        FROM attendance GROUP BY date
+    """))
+    db.session.commit()
@@ -1,16 +1,37 @@
+import atexit
 import logging
+import queue
 import sys
+from logging.handlers import QueueHandler, QueueListener
 from pythonjsonlogger import jsonlogger
 
 
-def setup_logging():
-    logger = logging.getLogger()
-    handler = logging.StreamHandler(sys.stdout)
+def json_handler(stream=sys.stdout):
+    handler = logging.StreamHandler(stream)
     formatter = jsonlogger.JsonFormatter(
         fmt="%(asctime)s %(levelname)s %(name)s %(message)s",
         datefmt="%Y-%m-%d %H:%M:%S",
     )
     handler.setFormatter(formatter)
+    return handler
+
+
+def queue_handler(handler):
+    """Wrap `handler` so logging only puts the record on a queue; a background
+    thread formats and writes it"""
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    # Flush what is still queued on exit
+    atexit.register(listener.stop)
+    return QueueHandler(log_queue)
+
+
+def setup_logging(async_logging=False):
+    logger = logging.getLogger()
+    handler = json_handler()
+    if async_logging:
+        handler = queue_handler(handler)
     logger.addHandler(handler)
     logger.setLevel(logging.INFO)
     return logger
@@ -1,5 +1,22 @@
-from prometheus_client import Counter, Histogram, Info
+import os
+import random
 import time
+from flask import request
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    Info,
+    make_wsgi_app,
+    multiprocess,
+)
+from sqlalchemy import event
+
+# Set PROMETHEUS_MULTIPROC_DIR when running several worker processes
+# (gunicorn): each worker writes its samples to files there and /metrics
+# adds them all up, instead of showing whichever worker answered
+MULTIPROCESS = bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
 
 # Metrics
 http_requests_total = Counter(
@@ -14,5 +31,116 @@ student_attendance_marked = Counter(
     "student_attendance_marked_total", "Total number of attendance records marked"
 )
 
-app_info = Info("flask_app_info", "Application information")
-app_info.info({"version": "1.0.0"})
+db_query_duration_seconds = Histogram(
+    "db_query_duration_seconds",
+    "Database query duration in seconds",
+    ["operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+
+db_pool_checked_out = Gauge(
+    "db_pool_connections_checked_out",
+    "Database connections currently in use",
+    multiprocess_mode="livesum",
+)
+
+db_pool_connections_opened = Counter(
+    "db_pool_connections_opened_total", "Database connections opened by the pool"
+)
+
+if MULTIPROCESS:
+    # Info metrics aren't collected across processes, a labelled gauge is
+    app_info = Gauge(
+        "flask_app_info", "Application information", ["version"], multiprocess_mode="max"
+    )
+    app_info.labels(version="1.0.0").set(1)
+else:
+    app_info = Info("flask_app_info", "Application information")
+    app_info.info({"version": "1.0.0"})
+
+QUERY_OPERATIONS = {"select", "insert", "update", "delete"}
+
+
+def metrics_wsgi_app():
+    """WSGI app serving /metrics, aggregated over all workers in multiprocess mode"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return make_wsgi_app(registry)
+    return make_wsgi_app()
+
+
+def init_app(app, logger):
+    """Record request metrics and an access log line for every request.
+
+    ACCESS_LOG_SAMPLE_RATE (0-1) logs only that share of requests; server
+    errors are always logged. Metrics are always recorded.
+    """
+    sample_rate = app.config.get("ACCESS_LOG_SAMPLE_RATE", 1.0)
+    # Labelled metrics by (method, endpoint, status), so labels() isn't
+    # looked up again on every request
+    children = {}
+
+    @app.before_request
+    def before_request():
+        request.start_time = time.perf_counter()
+
+    @app.after_request
+    def after_request(response):
+        duration = time.perf_counter() - request.start_time
+        endpoint = request.endpoint or "unknown"
+        status = response.status_code
+
+        key = (request.method, endpoint, status)
+        metrics = children.get(key)
+        if metrics is None:
+            metrics = children[key] = (
+                http_requests_total.labels(method=request.method, endpoint=endpoint, status=status),
+                request_duration_seconds.labels(endpoint=endpoint),
+            )
+        metrics[0].inc()
+        metrics[1].observe(duration)
+
+        if status >= 500 or sample_rate >= 1 or random.random() < sample_rate:
+            logger.info(
+                "Request processed",
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": status,
+                    "duration": duration,
+                    "sample_rate": sample_rate,
+                },
+            )
+
+        return response
+
+
+def instrument_engine(engine):
+    """Time every query and track pool usage with SQLAlchemy events"""
+    query_duration = {
+        operation: db_query_duration_seconds.labels(operation=operation)
+        for operation in QUERY_OPERATIONS | {"other"}
+    }
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context.query_start = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - context.query_start
+        histogram = query_duration.get(statement.lstrip()[:6].lower(), query_duration["other"])
+        histogram.observe(duration)
+
+    @event.listens_for(engine, "connect")
+    def connect(dbapi_connection, connection_record):
+        db_pool_connections_opened.inc()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        db_pool_checked_out.inc()
+
+    @event.listens_for(engine, "checkin")
+    def checkin(dbapi_connection, connection_record):
+        db_pool_checked_out.dec()
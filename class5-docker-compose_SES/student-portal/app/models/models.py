@@ -37,6 +37,28 @@ class Attendance(db.Model):
     status = db.Column(db.String(10), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey("student.id"), nullable=False)
 
+    # One mark per student per day; its index also serves a student's records
+    # and the attendance page's join. date, status: the dashboard's counts
+    __table_args__ = (
+        db.UniqueConstraint("student_id", "date", name="uq_attendance_student_id_date"),
+        db.Index("ix_attendance_date_status", "date", "status"),
+    )
+
+
+# Present/total counters kept up to date by triggers on attendance
+# (see app/attendance.py), so the dashboard and students page read one row
+# per day or per student instead of every attendance record
+class StudentAttendanceSummary(db.Model):
+    student_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+class DailyAttendanceSummary(db.Model):
+    date = db.Column(db.Date, primary_key=True)
+    present = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
 
 class Class(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -1,6 +1,15 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+import csv
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from app.models.models import Student, Attendance, db, Class
+from app.models.models import (
+    Student,
+    Attendance,
+    db,
+    Class,
+    StudentAttendanceSummary,
+    DailyAttendanceSummary,
+)
+from app.attendance import STATUSES, upsert_attendance, read_import, import_batches
 from datetime import datetime, date
 
 bp = Blueprint("main", __name__)
@@ -11,25 +20,25 @@ bp = Blueprint("main", __name__)
 def dashboard():
     today = date.today()
 
-    # Get total students
-    total_students = Student.query.count()
-
-    # Get today's attendance
-    today_attendance = Attendance.query.filter_by(date=today, status="Present").count()
-
-    # Calculate total attendance rate
-    total_marked_days = Attendance.query.distinct(Attendance.date).count()
-    total_present = Attendance.query.filter_by(status="Present").count()
-    total_records = Attendance.query.count()
-
+    # All the counts in one query, from the per-day summary (one row per day)
+    # rather than every attendance record
+    day = DailyAttendanceSummary
+    stats = db.session.query(
+        db.select(db.func.count(Student.id)).scalar_subquery().label("total_students"),
+        db.func.coalesce(db.func.sum(day.present).filter(day.date == today), 0).label("today_present"),
+        db.func.coalesce(db.func.sum(day.present), 0).label("total_present"),
+        db.func.coalesce(db.func.sum(day.total), 0).label("total_records"),
+    ).one()
+
+    total_students = stats.total_students
     attendance_rate = round(
-        (total_present / total_records * 100) if total_records > 0 else 0, 1
+        (stats.total_present / stats.total_records * 100) if stats.total_records > 0 else 0, 1
     )
 
     return render_template(
         "dashboard.html",
         total_students=total_students,
-        today_attendance=f"{today_attendance}/{total_students}",
+        today_attendance=f"{stats.today_present}/{total_students}",
         attendance_rate=attendance_rate,
     )
 
@@ -37,16 +46,24 @@ def dashboard():
 @bp.route("/students")
 @login_required
 def students():
-    students = Student.query.all()
-    for student in students:
-        total_days = Attendance.query.filter_by(student_id=student.id).count()
-        if total_days > 0:
-            present_days = Attendance.query.filter_by(
-                student_id=student.id, status="Present"
-            ).count()
-            student.attendance_rate = round(present_days / total_days * 100, 1)
+    # Each student with their attendance summary, in one query
+    rows = (
+        db.session.query(Student, StudentAttendanceSummary)
+        .outerjoin(
+            StudentAttendanceSummary,
+            StudentAttendanceSummary.student_id == Student.id,
+        )
+        .order_by(Student.id)
+        .all()
+    )
+
+    students = []
+    for student, summary in rows:
+        if summary and summary.total > 0:
+            student.attendance_rate = round(summary.present / summary.total * 100, 1)
         else:
             student.attendance_rate = 0
+        students.append(student)
     return render_template("students.html", students=students)
 
 
@@ -54,12 +71,22 @@ def students():
 @login_required
 def attendance():
     selected_date = request.args.get("date", date.today().isoformat())
-    students = Student.query.all()
 
-    for student in students:
-        student.today_attendance = Attendance.query.filter_by(
-            student_id=student.id, date=selected_date
-        ).first()
+    # Every student with their record for the day (if any) in one query
+    rows = (
+        db.session.query(Student, Attendance)
+        .outerjoin(
+            Attendance,
+            db.and_(Attendance.student_id == Student.id, Attendance.date == selected_date),
+        )
+        .order_by(Student.id)
+        .all()
+    )
+
+    students = []
+    for student, record in rows:
+        student.today_attendance = record
+        students.append(student)
 
     return render_template(
         "attendance.html", students=students, selected_date=selected_date
@@ -83,24 +110,20 @@ def add_student():
 def mark_attendance():
     try:
         attendance_date = request.form.get("date", date.today().isoformat())
-        students = Student.query.all()
-
-        for student in students:
-            status = request.form.get(f"status_{student.id}")
-            if status:
-                # Update existing or create new attendance record
-                attendance = Attendance.query.filter_by(
-                    student_id=student.id, date=attendance_date
-                ).first()
-
-                if attendance:
-                    attendance.status = status
-                else:
-                    attendance = Attendance(
-                        student_id=student.id, date=attendance_date, status=status
-                    )
-                    db.session.add(attendance)
-
+        marked_date = date.fromisoformat(attendance_date)
+
+        # status_<student id> fields that were set
+        marks = {}
+        for field, status in request.form.items():
+            if field.startswith("status_") and status in STATUSES:
+                marks[int(field[len("status_"):])] = status
+        student_ids = db.session.query(Student.id).filter(Student.id.in_(marks))
+
+        # Update existing or create new attendance records, in one statement
+        upsert_attendance(
+            {"student_id": student_id, "date": marked_date, "status": marks[student_id]}
+            for (student_id,) in student_ids
+        )
         db.session.commit()
         flash("Attendance marked successfully", "success")
         return redirect(url_for("main.attendance", date=attendance_date))
@@ -109,6 +132,23 @@ def mark_attendance():
         return redirect(url_for("main.attendance"))
 
 
+@bp.route("/import_attendance", methods=["POST"])
+@login_required
+def import_attendance():
+    """Backfill attendance from a JSON list or a CSV with student_id,date,status"""
+    errors = []
+    written = 0
+    try:
+        for batch in import_batches(read_import(request), errors):
+            written += upsert_attendance(batch)
+        db.session.commit()
+    except (ValueError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({"error": f"Could not read import: {e}"}), 400
+
+    return jsonify({"written": written, "error_count": len(errors), "errors": errors[:100]})
+
+
 @bp.route("/edit_student/<int:id>", methods=["POST"])
 @login_required
 def edit_student(id):
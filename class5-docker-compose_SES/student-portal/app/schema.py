@@ -0,0 +1,41 @@
+from app import db
+from app.models.models import Attendance
+from app.attendance import install_summary_triggers, rebuild_summaries, summary_triggers_installed
+
+
+def init_db(rebuild=False):
+    """Create the tables and bring an existing database up to date
+
+    Safe to run on every deploy (see migrate_db.py). Needs an app context.
+    """
+    db.create_all()
+    upgrade_attendance()
+
+    # New summary tables start empty: fill them from the existing marks
+    if not summary_triggers_installed():
+        install_summary_triggers()
+        rebuild = True
+    if rebuild:
+        rebuild_summaries()
+
+
+def upgrade_attendance():
+    """create_all() skips tables that already exist, so bring an older
+    attendance table up to date here"""
+    constraints = db.inspect(db.engine).get_unique_constraints("attendance")
+    if "uq_attendance_student_id_date" not in {c["name"] for c in constraints}:
+        # Where a day was marked twice keep the first mark, the one the pages showed
+        db.session.execute(db.text(
+            "DELETE FROM attendance a USING attendance b "
+            "WHERE a.student_id = b.student_id AND a.date = b.date AND a.id > b.id"
+        ))
+        db.session.execute(db.text(
+            "ALTER TABLE attendance ADD CONSTRAINT uq_attendance_student_id_date "
+            "UNIQUE (student_id, date)"
+        ))
+        # Replaced by the constraint's index
+        db.session.execute(db.text("DROP INDEX IF EXISTS ix_attendance_student_id_date"))
+        db.session.commit()
+
+    for index in Attendance.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
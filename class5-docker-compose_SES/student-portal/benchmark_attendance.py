@@ -0,0 +1,174 @@
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+from flask import render_template, request
+from app import create_app, db
+from app.models.models import Student, Attendance
+from app.schema import init_db
+
+STUDENTS = 5000
+DAYS = 365
+RUNS = 5
+
+
+def seed():
+    """Generate STUDENTS students with DAYS days of attendance each, in SQL"""
+    if Student.query.filter(Student.name.like("Bench Student %")).first():
+        return
+    print(f"Generating {STUDENTS} students x {DAYS} days of attendance...")
+    db.session.execute(db.text(
+        "INSERT INTO student (name) "
+        "SELECT 'Bench Student ' || n FROM generate_series(1, :students) AS n"
+    ), {"students": STUDENTS})
+    db.session.execute(db.text("""
+        INSERT INTO attendance (date, status, student_id)
+        SELECT CURRENT_DATE - d,
+               CASE WHEN random() < 0.9 THEN 'Present' ELSE 'Absent' END,
+               s.id
+        FROM student s, generate_series(0, :days - 1) AS d
+        WHERE s.name LIKE 'Bench Student %'
+    """), {"days": DAYS})
+    db.session.commit()
+    db.session.execute(db.text("ANALYZE student"))
+    db.session.execute(db.text("ANALYZE attendance"))
+    db.session.commit()
+
+
+def drop():
+    bench = "SELECT id FROM student WHERE name LIKE 'Bench Student %'"
+    db.session.execute(db.text(f"DELETE FROM attendance WHERE student_id IN ({bench})"))
+    db.session.execute(db.text("DELETE FROM student WHERE name LIKE 'Bench Student %'"))
+    db.session.commit()
+
+
+# The views as they were: separate COUNTs on the dashboard, one or two
+# queries per student on the other pages
+def old_dashboard():
+    today = date.today()
+    total_students = Student.query.count()
+    today_attendance = Attendance.query.filter_by(date=today, status="Present").count()
+    total_marked_days = Attendance.query.distinct(Attendance.date).count()
+    total_present = Attendance.query.filter_by(status="Present").count()
+    total_records = Attendance.query.count()
+    attendance_rate = round(
+        (total_present / total_records * 100) if total_records > 0 else 0, 1
+    )
+    return render_template(
+        "dashboard.html",
+        total_students=total_students,
+        today_attendance=f"{today_attendance}/{total_students}",
+        attendance_rate=attendance_rate,
+    )
+
+
+def old_students():
+    students = Student.query.all()
+    for student in students:
+        total_days = Attendance.query.filter_by(student_id=student.id).count()
+        if total_days > 0:
+            present_days = Attendance.query.filter_by(
+                student_id=student.id, status="Present"
+            ).count()
+            student.attendance_rate = round(present_days / total_days * 100, 1)
+        else:
+            student.attendance_rate = 0
+    return render_template("students.html", students=students)
+
+
+def old_attendance():
+    selected_date = date.today().isoformat()
+    students = Student.query.all()
+    for student in students:
+        student.today_attendance = Attendance.query.filter_by(
+            student_id=student.id, date=selected_date
+        ).first()
+    return render_template(
+        "attendance.html", students=students, selected_date=selected_date
+    )
+
+
+def old_mark_attendance():
+    attendance_date = request.form.get("date", date.today().isoformat())
+    students = Student.query.all()
+    for student in students:
+        status = request.form.get(f"status_{student.id}")
+        if status:
+            attendance = Attendance.query.filter_by(
+                student_id=student.id, date=attendance_date
+            ).first()
+            if attendance:
+                attendance.status = status
+            else:
+                attendance = Attendance(
+                    student_id=student.id, date=attendance_date, status=status
+                )
+                db.session.add(attendance)
+    db.session.commit()
+
+
+def time_it(fn, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    keep = "--keep" in sys.argv
+    app = create_app()
+    app.config["LOGIN_DISABLED"] = True
+    client = app.test_client()
+
+    with app.app_context():
+        init_db()
+        seed()
+
+    pages = [("/", old_dashboard), ("/students", old_students), ("/attendance", old_attendance)]
+    print(f"\n{'page':<14} {'before':>12} {'after':>12}")
+    for path, old_view in pages:
+        def before():
+            with app.test_request_context(path):
+                old_view()
+                db.session.remove()
+
+        def after():
+            response = client.get(path)
+            assert response.status_code == 200, response.status_code
+
+        # The old pages make thousands of queries, so fewer runs for them
+        print(f"{path:<14} {time_it(before, 1 if path != '/' else RUNS):>9.1f} ms "
+              f"{time_it(after, RUNS):>9.1f} ms")
+
+    # Saving the whole roster for a new day, then again with changes
+    with app.app_context():
+        roster = [student_id for (student_id,) in db.session.query(Student.id)]
+    print(f"\nsaving a roster of {len(roster)} students")
+    for days_ahead, label in ((1, "before"), (2, "after")):
+        day = (date.today() + timedelta(days=days_ahead)).isoformat()
+        timings = []
+        for status in ("Present", "Absent"):
+            form = {f"status_{student_id}": status for student_id in roster}
+            form["date"] = day
+            start = time.perf_counter()
+            if label == "before":
+                with app.test_request_context("/mark_attendance", method="POST", data=form):
+                    old_mark_attendance()
+                    db.session.remove()
+            else:
+                client.post("/mark_attendance", data=form)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"{label:<14} insert {timings[0]:>9.1f} ms   update {timings[1]:>9.1f} ms")
+        with app.app_context():
+            Attendance.query.filter_by(date=day).delete()
+            db.session.commit()
+
+    if not keep:
+        with app.app_context():
+            drop()
+
+
+if __name__ == "__main__":
+    main()
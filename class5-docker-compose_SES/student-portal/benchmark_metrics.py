@@ -0,0 +1,122 @@
+import logging
+import os
+import time
+from flask import Flask, request
+from sqlalchemy import create_engine, text
+from app import metrics
+from app.logging_config import json_handler, queue_handler
+
+REQUESTS = 20000
+QUERIES = 20000
+ROUNDS = 5
+
+devnull = open(os.devnull, "w")
+
+
+def make_logger(name, async_logging=False):
+    logger = logging.getLogger(f"benchmark.{name}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = json_handler(devnull)
+    logger.addHandler(queue_handler(handler) if async_logging else handler)
+    return logger
+
+
+def make_app():
+    app = Flask(__name__)
+
+    @app.route("/ping")
+    def ping():
+        return "ok"
+
+    return app
+
+
+# The instrumentation as it was: labels() and a synchronous JSON log line
+# on every request
+def old_instrumentation(app, logger):
+    @app.before_request
+    def before_request():
+        request.start_time = time.time()
+
+    @app.after_request
+    def after_request(response):
+        if request.path != "/metrics":
+            duration = time.time() - request.start_time
+            endpoint = request.endpoint or "unknown"
+            metrics.http_requests_total.labels(
+                method=request.method, endpoint=endpoint, status=response.status_code
+            ).inc()
+            metrics.request_duration_seconds.labels(endpoint=endpoint).observe(duration)
+            logger.info(
+                "Request processed",
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration": duration,
+                },
+            )
+        return response
+
+
+def new_instrumentation(sample_rate, async_logging=False):
+    def setup(app, logger):
+        app.config["ACCESS_LOG_SAMPLE_RATE"] = sample_rate
+        metrics.init_app(app, make_logger(f"{sample_rate}-{async_logging}", async_logging))
+    return setup
+
+
+def time_requests(setup):
+    """Time of the before/after request hooks alone, per request"""
+    app = make_app()
+    if setup:
+        setup(app, make_logger("old"))
+    timings = []
+    with app.test_request_context("/ping"):
+        request.url_rule, request.view_args = app.url_map.bind("").match("/ping", return_rule=True)
+        response = app.make_response("ok")
+        for _ in range(ROUNDS):
+            start = time.perf_counter()
+            for _ in range(REQUESTS):
+                app.preprocess_request()
+                app.process_response(response)
+            timings.append((time.perf_counter() - start) / REQUESTS * 1e6)
+    return min(timings)
+
+
+def time_queries(instrumented):
+    engine = create_engine("sqlite://")
+    if instrumented:
+        metrics.instrument_engine(engine)
+    with engine.connect() as conn:
+        start = time.perf_counter()
+        for _ in range(QUERIES):
+            conn.execute(text("SELECT 1"))
+        return (time.perf_counter() - start) / QUERIES * 1e6
+
+
+def main():
+    print(f"Instrumentation per request, best of {ROUNDS} x {REQUESTS}")
+    baseline = time_requests(None)
+    print(f"{'no hooks':<36} {baseline:>7.1f} us")
+    variants = [
+        ("before (sync log every request)", old_instrumentation),
+        ("after, log every request", new_instrumentation(1.0)),
+        ("after, log 10% of requests", new_instrumentation(0.1)),
+        ("after, async log every request", new_instrumentation(1.0, async_logging=True)),
+        ("after, metrics only (log 0%)", new_instrumentation(0.0)),
+    ]
+    for name, setup in variants:
+        per_request = time_requests(setup)
+        print(f"{name:<36} {per_request:>7.1f} us  (+{per_request - baseline:.1f} us)")
+
+    print(f"\nPer query, {QUERIES} x SELECT 1 on SQLite")
+    plain = time_queries(False)
+    timed = time_queries(True)
+    print(f"{'no instrumentation':<36} {plain:>7.1f} us")
+    print(f"{'query timing and pool events':<36} {timed:>7.1f} us  (+{timed - plain:.1f} us)")
+
+
+if __name__ == "__main__":
+    main()
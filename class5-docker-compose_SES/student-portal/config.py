@@ -6,3 +6,7 @@ variable_which_i_wont_use = "this is a variable which i wont use"
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DB_LINK")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Share of requests written to the access log (errors are always logged)
+    ACCESS_LOG_SAMPLE_RATE = float(os.getenv("ACCESS_LOG_SAMPLE_RATE", "1.0"))
+    # Format and write log lines in a background thread
+    LOG_ASYNC = os.getenv("LOG_ASYNC", "false").lower() == "true"
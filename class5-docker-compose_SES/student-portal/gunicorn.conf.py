@@ -0,0 +1,41 @@
+import os
+import shutil
+import subprocess
+import sys
+from prometheus_client import multiprocess
+
+# gunicorn -c gunicorn.conf.py run:app
+# (runs migrate_db.py first, set MIGRATE_ON_START=false to skip it)
+bind = "0.0.0.0:8000"
+workers = int(os.getenv("GUNICORN_WORKERS", "4"))
+
+# Every worker writes its metrics to PROMETHEUS_MULTIPROC_DIR so /metrics
+# can add them up (see app/metrics.py)
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+
+def on_starting(server):
+    # Samples from a previous run would be added to this one's
+    if MULTIPROC_DIR:
+        shutil.rmtree(MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(MULTIPROC_DIR, exist_ok=True)
+
+    # Tables, constraints, attendance summary triggers and summaries (see
+    # migrate_db.py), once before the workers start. In its own process so the
+    # workers don't inherit its db connections or log thread, and without
+    # PROMETHEUS_MULTIPROC_DIR so its DDL isn't counted as app queries.
+    if os.getenv("MIGRATE_ON_START", "true").lower() == "true":
+        env = dict(os.environ)
+        env.pop("PROMETHEUS_MULTIPROC_DIR", None)
+        subprocess.run(
+            [sys.executable, "migrate_db.py"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=env,
+            check=True,
+        )
+
+
+def child_exit(server, worker):
+    # Drop the live gauges of a worker that exited
+    if MULTIPROC_DIR:
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,15 @@
+import argparse
+from run import app
+from app.schema import init_db
+
+# Creates the tables, constraints, indexes and the attendance summary
+# triggers, and fills the summaries when the triggers are new. Run it before
+# starting the app on every deploy; it only changes what is missing.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create or upgrade the student portal database")
+    parser.add_argument("--rebuild-summaries", action="store_true",
+                        help="recompute the attendance summaries even if the triggers exist")
+    args = parser.parse_args()
+    with app.app_context():
+        init_db(rebuild=args.rebuild_summaries)
+    print("Database is up to date")
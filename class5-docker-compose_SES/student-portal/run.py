@@ -1,13 +1,10 @@
-from app import create_app, db
+from app import create_app
+from app.schema import init_db
 
 app = create_app()
 
 
-def init_db():
-    with app.app_context():
-        db.create_all()
-
-
 if __name__ == "__main__":
-    init_db()
+    with app.app_context():
+        init_db()
     app.run(debug=True, host="0.0.0.0", port=8000)